@@ -0,0 +1,149 @@
+"""Times each stage of the markdown pipeline over the synthetic corpus and compares the results with an earlier run.
+
+Run from the repository root with: ./bench.sh [--output results.json] [--compare baseline.json]
+Exits with status 1 when a stage got slower than --threshold times its baseline.
+"""
+
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+from md_to_html import (
+    block_to_block_type,
+    markdown_to_blocks,
+    markdown_to_html_node,
+    text_to_textnodes,
+)
+
+from bench.corpus import SIZES, corpus
+
+
+def best_time(function, repeat):
+    """Returns the fastest (wall, cpu) seconds out of several runs of function()"""
+    best_wall = best_cpu = None
+    for _ in range(repeat):
+        wall, cpu = time.perf_counter(), time.process_time()
+        function()
+        wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+        if best_wall is None or wall < best_wall:
+            best_wall, best_cpu = wall, cpu
+    return best_wall, best_cpu
+
+
+def stages(documents):
+    """Returns {stage name: function} for every pipeline stage, each working on inputs prepared ahead of time so only that stage is timed"""
+    blocks = [block for markdown in documents for block in markdown_to_blocks(markdown)]
+    texts = [block.replace("\n", " ") for block in blocks]
+    trees = [markdown_to_html_node(markdown) for markdown in documents]
+    return {
+        "markdown_to_blocks": lambda: [markdown_to_blocks(md) for md in documents],
+        "block_to_block_type": lambda: [block_to_block_type(b) for b in blocks],
+        "text_to_textnodes": lambda: [text_to_textnodes(text) for text in texts],
+        "markdown_to_html_node": lambda: [
+            markdown_to_html_node(md) for md in documents
+        ],
+        "to_html": lambda: [tree.to_html() for tree in trees],
+    }
+
+
+def peak_memory(documents):
+    """Returns the peak bytes allocated while parsing and rendering the corpus one document at a time"""
+    tracemalloc.start()
+    for markdown in documents:
+        markdown_to_html_node(markdown).to_html()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def run(sizes, repeat):
+    results = {}
+    for size in sizes:
+        documents = corpus(size)
+        result = {
+            "documents": len(documents),
+            "bytes": sum(len(markdown) for markdown in documents),
+            "stages": {},
+        }
+        for name, function in stages(documents).items():
+            wall, cpu = best_time(function, repeat)
+            result["stages"][name] = {"wall": wall, "cpu": cpu}
+        result["peak_memory"] = peak_memory(documents)
+        results[size] = result
+    return {"python": platform.python_version(), "results": results}
+
+
+def report(run_results):
+    print(f"{'size':<8} {'stage':<24} {'wall':>10} {'cpu':>10} {'MB/s':>8}")
+    for size, result in run_results["results"].items():
+        megabytes = result["bytes"] / 1e6
+        for name, timing in result["stages"].items():
+            print(
+                f"{size:<8} {name:<24} {timing['wall'] * 1000:7.1f} ms "
+                f"{timing['cpu'] * 1000:7.1f} ms {megabytes / timing['wall']:8.2f}"
+            )
+        print(f"{size:<8} {'peak memory':<24} {result['peak_memory'] / 1e6:7.2f} MB")
+
+
+def regressions(run_results, baseline, threshold):
+    """Returns a description of every stage whose wall time grew by more than threshold times its baseline, and of peak memory doing the same"""
+    found = []
+    for size, result in run_results["results"].items():
+        old = baseline["results"].get(size)
+        if old is None:
+            continue
+        for name, timing in result["stages"].items():
+            if name not in old["stages"]:
+                continue
+            ratio = timing["wall"] / old["stages"][name]["wall"]
+            if ratio > threshold:
+                found.append(f"{size} {name}: {ratio:.2f}x slower")
+        ratio = result["peak_memory"] / old["peak_memory"]
+        if ratio > threshold:
+            found.append(f"{size} peak memory: {ratio:.2f}x larger")
+    return found
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog="bench", description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes",
+        default="small,medium",
+        help=f"comma separated corpus sizes out of {', '.join(SIZES)}",
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="runs per stage")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON file from an earlier run")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.25,
+        help="fail when a stage takes more than this many times its baseline",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv):
+    args = parse_args(argv)
+    run_results = run(args.sizes.split(","), args.repeat)
+    report(run_results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(run_results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        found = regressions(run_results, baseline, args.threshold)
+        for regression in found:
+            print(f"Regression: {regression}")
+        if found:
+            return 1
+        print(f"No stage regressed by more than {args.threshold}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
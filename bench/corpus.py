@@ -0,0 +1,73 @@
+"""Deterministic synthetic markdown for the benchmarks. The same size and seed always produce the same documents, so results can be compared across commits."""
+
+import random
+
+# Documents per corpus size, and blocks per document
+SIZES = {
+    "small": (20, 30),
+    "medium": (100, 60),
+    "large": (400, 120),
+}
+# Inline spans, including the dense link, emphasis and image runs real posts have
+SPANS = [
+    "**bold** ",
+    "_italic_ ",
+    "`code` ",
+    "[a link](/blog/tom) ",
+    "![an image](/images/tom.png) ",
+    "plain words ",
+]
+WORDS = "the quick brown fox jumps over a lazy dog while elves sing in rivendell"
+WORDS = WORDS.split()
+
+
+def paragraph(spans):
+    """Returns a single line of markdown with the given number of inline spans"""
+    return "".join(SPANS[i % len(SPANS)] for i in range(spans))
+
+
+def sentence(rng, words=12):
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def inline_text(rng, spans):
+    """Plain sentences with a random mix of inline spans between them"""
+    return " ".join(
+        rng.choice(SPANS).strip() if rng.random() < 0.4 else sentence(rng, 4)
+        for _ in range(spans)
+    )
+
+
+def block(rng):
+    """Returns one random block of any type"""
+    kind = rng.randrange(8)
+    if kind == 0:
+        return f"{'#' * rng.randint(2, 6)} {sentence(rng, 5)}"
+    if kind == 1:
+        return "\n".join(f"- {inline_text(rng, 3)}" for _ in range(rng.randint(2, 8)))
+    if kind == 2:
+        items = rng.randint(2, 9)
+        return "\n".join(f"{i}. {inline_text(rng, 3)}" for i in range(1, items + 1))
+    if kind == 3:
+        return "\n".join(f"> {sentence(rng)}" for _ in range(rng.randint(1, 4)))
+    if kind == 4:
+        lines = "\n".join(f"    {sentence(rng, 6)}" for _ in range(rng.randint(2, 10)))
+        return f"```\n{lines}\n```"
+    if kind == 5:
+        # Dense runs of inline markup
+        return paragraph(rng.randint(20, 80))
+    return "\n".join(inline_text(rng, rng.randint(4, 12)) for _ in range(3))
+
+
+def document(number, blocks=30, seed=0):
+    """Returns a deterministic markdown document that starts with a title and mixes every block type"""
+    rng = random.Random(seed * 1_000_003 + number)
+    parts = [f"# Document {number}"]
+    parts.extend(block(rng) for _ in range(blocks))
+    return "\n\n".join(parts)
+
+
+def corpus(size="small", seed=0):
+    """Returns the list of documents for one of the SIZES"""
+    documents, blocks = SIZES[size]
+    return [document(number, blocks, seed) for number in range(documents)]
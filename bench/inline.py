@@ -0,0 +1,56 @@
+"""Compares text_to_textnodes with the recursive split_nodes_* chain it replaced on paragraphs with more and more inline spans.
+
+Run from the repository root with: PYTHONPATH=src python3 -m bench.inline
+"""
+
+import time
+
+from md_to_html import (
+    split_nodes_delimiter,
+    split_nodes_image,
+    split_nodes_link,
+    text_to_textnodes,
+)
+from textnode import TextNode, TextType
+
+from bench.corpus import paragraph
+
+SPAN_COUNTS = [100, 300, 1000, 3000, 10000, 30000]
+
+
+def split_nodes_chain(text):
+    """The text_to_textnodes implementation from before the single pass scanner"""
+    nodes = [TextNode(text, TextType.TEXT)]
+    nodes = split_nodes_delimiter(nodes, "**", TextType.BOLD)
+    nodes = split_nodes_delimiter(nodes, "_", TextType.ITALIC)
+    nodes = split_nodes_delimiter(nodes, "`", TextType.CODE)
+    nodes = split_nodes_link(split_nodes_image(nodes))
+    return [node for node in nodes if len(node.text) > 0]
+
+
+def best_time(function, text, repeat=3):
+    """Returns the fastest of several runs in seconds"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(text)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    print(f"{'spans':>8} {'scanner':>12} {'per span':>10} {'split chain':>14}")
+    for spans in SPAN_COUNTS:
+        text = paragraph(spans)
+        scanner = best_time(text_to_textnodes, text)
+        try:
+            chain = f"{best_time(split_nodes_chain, text, repeat=1) * 1000:11.2f} ms"
+        except RecursionError:
+            chain = "RecursionError"
+        per_span = scanner / spans * 1e6
+        print(f"{spans:>8} {scanner * 1000:9.2f} ms {per_span:7.2f} us {chain:>14}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""Measures how much memory the node classes take over a large synthetic corpus, compared with the dict-backed layout they had before __slots__, and the peak memory of rendering one huge document whole or streamed.
+
+Run from the repository root with: PYTHONPATH=src python3 -m bench.memory
+"""
+
+import os
+import tempfile
+import time
+import tracemalloc
+
+from leafnode import LeafNode
+from md_to_html import markdown_to_html_node, text_to_textnodes
+from parentnode import ParentNode
+from pipeline import stream_page
+from template import Template
+
+from bench.corpus import document, paragraph
+
+DOCUMENTS = 200
+HUGE_DOCUMENT_BLOCKS = 40000  # Around 10 MB of markdown
+
+
+class DictNode:
+    """A node with the same attributes as HTMLNode, stored in a per-instance __dict__ like the classes used to be"""
+
+    def __init__(self, tag, value, children, props):
+        self.tag = tag
+        self.value = value
+        self.children = children
+        self.props = props
+
+
+class DictTextNode:
+    """A TextNode stored in a per-instance __dict__"""
+
+    def __init__(self, text, text_type, url):
+        self.text = text
+        self.text_type = text_type
+        self.url = url
+
+
+def copy_tree(root, make_parent, make_leaf):
+    """Rebuilds a node tree with other node classes, sharing every string and props dict"""
+    copies = {}
+    order = []
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        order.append(node)
+        if isinstance(node, ParentNode):
+            stack.extend(node.children)
+    # Children are copied before their parents
+    for node in reversed(order):
+        if isinstance(node, ParentNode):
+            children = [copies[id(child)] for child in node.children]
+            copies[id(node)] = make_parent(node.tag, children, node.props)
+        else:
+            copies[id(node)] = make_leaf(node.tag, node.value, node.props)
+    return copies[id(root)]
+
+
+def count_nodes(root):
+    """Returns the number of nodes in a tree"""
+    count = 0
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        count += 1
+        if isinstance(node, ParentNode):
+            stack.extend(node.children)
+    return count
+
+
+def measure(build):
+    """Returns (retained bytes, peak bytes, seconds) for building and keeping the result of build()"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return current, peak, elapsed
+
+
+def report(name, measured, baseline=None):
+    """Prints one row of the results table, comparing retained memory with baseline if given"""
+    current, peak, elapsed = measured
+    line = f"{name:<28} {current / 1e6:9.2f} MB {peak / 1e6:9.2f} MB {elapsed:8.3f} s"
+    if baseline is not None:
+        line += f"   {100 * (1 - current / baseline[0]):5.1f}% smaller"
+    print(line)
+
+
+def render_whole(source, template, destination):
+    """Renders a page the way generate_page() does for sources small enough to read whole"""
+    with open(source) as f:
+        markdown = f.read()
+    with open(destination, "w") as d:
+        template.write(d, Title="Huge", Content=markdown_to_html_node(markdown))
+
+
+def huge_document():
+    """Prints the peak memory of rendering one huge document whole and streamed"""
+    template = Template("<title>{{ Title }}</title>{{ Content }}")
+    with tempfile.TemporaryDirectory() as root:
+        source = os.path.join(root, "huge.md")
+        with open(source, "w") as f:
+            f.write("# Huge\n\n")
+            f.write(document(0, blocks=HUGE_DOCUMENT_BLOCKS))
+        print(f"One document, {os.path.getsize(source) / 1e6:.1f} MB of markdown")
+        for name, render in [("whole", render_whole), ("streamed", stream_page)]:
+            measured = measure(lambda: render(source, template, os.devnull))
+            report(f"render {name}", measured)
+
+
+def main():
+    corpus = [document(number) for number in range(DOCUMENTS)]
+    trees = [markdown_to_html_node(markdown) for markdown in corpus]
+    nodes = sum(count_nodes(tree) for tree in trees)
+    print(f"{DOCUMENTS} documents, {sum(map(len, corpus)) / 1e6:.1f} MB of markdown")
+    print(f"{'':<28} {'retained':>12} {'peak':>12} {'time':>10}")
+
+    parsed = measure(lambda: [markdown_to_html_node(md) for md in corpus])
+    report("markdown_to_html_node", parsed)
+
+    # The same trees in both layouts, sharing all strings, so only the node objects differ
+    dict_nodes = measure(
+        lambda: [
+            copy_tree(
+                tree,
+                lambda tag, children, props: DictNode(tag, None, children, props),
+                lambda tag, value, props: DictNode(tag, value, [], props),
+            )
+            for tree in trees
+        ]
+    )
+    slot_nodes = measure(
+        lambda: [copy_tree(tree, ParentNode, LeafNode) for tree in trees]
+    )
+    report(f"HTML nodes, __dict__ ({nodes})", dict_nodes)
+    report("HTML nodes, __slots__", slot_nodes, dict_nodes)
+
+    text = "\n".join(paragraph(50) for _ in range(DOCUMENTS * 10))
+    spans = text_to_textnodes(text)
+    dict_text = measure(
+        lambda: [DictTextNode(n.text, n.text_type, n.url) for n in spans]
+    )
+    slot_text = measure(lambda: [type(n)(n.text, n.text_type, n.url) for n in spans])
+    report(f"TextNodes, __dict__ ({len(spans)})", dict_text)
+    report("TextNodes, __slots__", slot_text, dict_text)
+    huge_document()
+
+
+if __name__ == "__main__":
+    main()
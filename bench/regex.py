@@ -0,0 +1,122 @@
+"""Compares the precompiled, single scan image/link extraction and block classification with the per-call regex versions they replaced.
+
+Run from the repository root with: PYTHONPATH=src python3 -m bench.regex
+"""
+
+import re
+import time
+
+from md_to_html import (
+    block_to_block_type,
+    extract_markdown_images,
+    extract_markdown_links,
+    markdown_to_blocks,
+)
+
+from bench.corpus import corpus, paragraph
+
+SPAN_COUNTS = [1000, 10000, 100000]
+LIST_LENGTHS = [10, 100, 1000]
+
+
+def old_extract_markdown_images(text):
+    """extract_markdown_images from before: two findall scans with uncompiled patterns"""
+    full_image_md = re.findall(r"(!\[[^\[\]]*\]\([^\(\)]*\))", text)
+    extracted = re.findall(r"!\[([^\[\]]*)\]\(([^\(\)]*)\)", text)
+    return extracted, full_image_md
+
+
+def old_extract_markdown_links(text):
+    """extract_markdown_links from before: two findall scans with uncompiled patterns"""
+    full_link_md = re.findall(r"((?<!!)\[[^\[\]]*\]\([^\(\)]*\))", text)
+    extracted = re.findall(r"(?<!!)\[([^\[\]]*)\]\(([^\(\)]*)\)", text)
+    return extracted, full_link_md
+
+
+def old_block_to_block_type(block):
+    """block_to_block_type from before, returning the type's value"""
+    if block.startswith("#"):
+        num_hashtags = re.findall(r"(^\#+ )", block)
+        if len(num_hashtags[0]) < 7:
+            return "heading"
+    if block.startswith("```") and block.endswith("```"):
+        return "code"
+    if block.startswith(">"):
+        lines = block.splitlines()
+        count = 0
+        for line in lines:
+            if line.startswith(">"):
+                count += 1
+        if count == len(lines):
+            return "quote"
+    if block.startswith("- "):
+        lines = block.splitlines()
+        count = 0
+        for line in lines:
+            if line.startswith("- "):
+                count += 1
+        if count == len(lines):
+            return "ul"
+    if block[0].isdigit():
+        last_number = int(block[0]) - 1
+        lines = block.splitlines()
+        for line in lines:
+            if int(line[0]) == last_number + 1 and line[1:3] == ". ":
+                return "ol"
+    return "paragraph"
+
+
+def best_time(function, repeat=5):
+    """Returns the fastest of several runs of function() in seconds"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def row(name, old, new):
+    print(f"{name:<28} {old * 1000:9.2f} ms {new * 1000:9.2f} ms {old / new:7.2f}x")
+
+
+def main():
+    print(f"{'':<28} {'before':>12} {'after':>12} {'speedup':>8}")
+    for spans in SPAN_COUNTS:
+        text = paragraph(spans)
+        assert old_extract_markdown_images(text) == extract_markdown_images(text)
+        row(
+            f"images, {spans} spans",
+            best_time(lambda: old_extract_markdown_images(text)),
+            best_time(lambda: extract_markdown_images(text)),
+        )
+        row(
+            f"links, {spans} spans",
+            best_time(lambda: old_extract_markdown_links(text)),
+            best_time(lambda: extract_markdown_links(text)),
+        )
+
+    blocks = [
+        block for markdown in corpus("large") for block in markdown_to_blocks(markdown)
+    ]
+    assert [old_block_to_block_type(block) for block in blocks] == [
+        block_to_block_type(block).value for block in blocks
+    ]
+    row(
+        f"block types, {len(blocks)} blocks",
+        best_time(lambda: [old_block_to_block_type(block) for block in blocks]),
+        best_time(lambda: [block_to_block_type(block) for block in blocks]),
+    )
+    for length in LIST_LENGTHS:
+        items = "\n".join(f"- item {i}" for i in range(length))
+        quote = "\n".join(f"> line {i}" for i in range(length))
+        row(
+            f"list and quote, {length} lines",
+            best_time(lambda: [old_block_to_block_type(b) for b in (items, quote)]),
+            best_time(lambda: [block_to_block_type(b) for b in (items, quote)]),
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+import os
+
+from cachefile import save_versioned
+
+ASSET_MAP_VERSION = 1
+FINGERPRINT_LENGTH = 8  # Hex digits of the content hash put into fingerprinted names
+# Assets that pages reference and that browsers can cache for good once their name changes with their contents
+FINGERPRINTED_EXTENSIONS = (
+    ".css",
+    ".js",
+    ".png",
+    ".jpg",
+    ".jpeg",
+    ".gif",
+    ".webp",
+    ".avif",
+    ".svg",
+    ".ico",
+    ".woff",
+    ".woff2",
+)
+
+
+def fingerprinted_name(path, digest):
+    """Puts the start of a content hash between a path's name and its extension: index.css becomes index.3f2a9c1b.css"""
+    stem, extension = os.path.splitext(path)
+    return f"{stem}.{digest[:FINGERPRINT_LENGTH]}{extension}"
+
+
+class AssetMap:
+    def __init__(self, path, fingerprints=None):
+        self.path = path  # Where the map is written for deploy tools
+        self.fingerprints = fingerprints or {}  # Fingerprinted url of every asset, keyed by its plain url ("/index.css")
+
+    def add(self, url, digest):
+        """Records the fingerprinted url of the asset at url, if it is one that gets fingerprinted, and returns it. Returns None for any other file"""
+        if not url.lower().endswith(FINGERPRINTED_EXTENSIONS):
+            return None
+        self.fingerprints[url] = fingerprinted_name(url, digest)
+        return self.fingerprints[url]
+
+    def save(self):
+        """Writes the map to disk, replacing the previous one atomically"""
+        save_versioned(
+            self.path, ASSET_MAP_VERSION, {"assets": self.fingerprints}, sort_keys=True
+        )
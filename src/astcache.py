@@ -0,0 +1,75 @@
+import hashlib
+import os
+import pickle
+
+from md_to_html import PARSER_VERSION, block_parsers_signature, markdown_to_html_node
+
+
+class AstCache:
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024):
+        self.directory = directory  # Where parsed trees are stored, one file per document
+        self.max_bytes = max_bytes  # prune() evicts the least recently used trees beyond this size
+
+    def key(self, markdown):
+        """Returns the cache key for a document: a hash of its markdown, the parser version that parses it and the block parsers registered with it"""
+        parser = f"{PARSER_VERSION}\0{block_parsers_signature()}\0"
+        digest = hashlib.sha256(parser.encode())
+        digest.update(markdown.encode())
+        return digest.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.pickle")
+
+    def parse(self, markdown):
+        """Returns markdown_to_html_node(markdown), loading the tree from the cache when this exact document was parsed before and storing it otherwise"""
+        path = self.path(self.key(markdown))
+        try:
+            with open(path, "rb") as f:
+                node = pickle.load(f)
+            # Bumping the mtime marks the tree as recently used for prune()
+            os.utime(path)
+            return node
+        except Exception:
+            # A missing, corrupt or unreadable entry is just a cache miss; it gets (over)written below
+            pass
+        node = markdown_to_html_node(markdown)
+        self.store(path, node)
+        return node
+
+    def store(self, path, node):
+        """Writes a tree to the cache. The write goes through a temporary file so that concurrent builds never see half an entry"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, "wb") as f:
+                pickle.dump(node, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, path)
+        except (OSError, RecursionError, pickle.PicklingError):
+            # Failing to cache a tree only costs a re-parse next time
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def prune(self):
+        """Deletes the least recently used trees until the cache fits in max_bytes. Returns how many were deleted"""
+        entries = []
+        total = 0
+        if not os.path.isdir(self.directory):
+            return 0
+        with os.scandir(self.directory) as buckets:
+            for bucket in buckets:
+                if not bucket.is_dir():
+                    continue
+                with os.scandir(bucket.path) as files:
+                    for entry in files:
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+                        total += stat.st_size
+        removed = 0
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+            removed += 1
+        return removed
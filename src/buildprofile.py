@@ -0,0 +1,142 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+class Profiler:
+    def __init__(self):
+        self.phases = {}  # Aggregate [wall, cpu, calls] for every phase name
+        self.pages = {}  # {source path: {phase name: [wall, cpu]}} for every page
+        self.events = []  # Chrome trace "complete" events, one per timed phase
+        self.page = None  # Source path of the page being rendered, if any
+
+    @contextmanager
+    def phase(self, name):
+        """Times the code inside the with block as one run of the named phase, counting it towards the current page if there is one"""
+        start = time.perf_counter_ns()
+        cpu_start = time.process_time_ns()
+        try:
+            yield
+        finally:
+            wall = (time.perf_counter_ns() - start) / 1e9
+            cpu = (time.process_time_ns() - cpu_start) / 1e9
+            self.add(name, wall, cpu)
+            self.events.append(
+                {
+                    "name": name,
+                    "cat": "page" if self.page is not None else "build",
+                    "ph": "X",
+                    "ts": start / 1000,
+                    "dur": wall * 1e6,
+                    "pid": os.getpid(),
+                    "tid": threading.get_ident(),
+                    "args": {"page": self.page} if self.page is not None else {},
+                }
+            )
+
+    def add(self, name, wall, cpu):
+        totals = self.phases.setdefault(name, [0.0, 0.0, 0])
+        totals[0] += wall
+        totals[1] += cpu
+        totals[2] += 1
+        if self.page is not None:
+            page = self.pages.setdefault(self.page, {})
+            page_totals = page.setdefault(name, [0.0, 0.0])
+            page_totals[0] += wall
+            page_totals[1] += cpu
+
+    @contextmanager
+    def page_phase(self, source):
+        """Times everything inside the with block as the "page" phase of source, with the phases inside it counted towards that page"""
+        self.page = source
+        try:
+            with self.phase("page"):
+                yield
+        finally:
+            self.page = None
+
+    @contextmanager
+    def instrument(self, module, name, phase):
+        """Temporarily replaces module.name with a wrapper that times every call as phase. Lets the parser be profiled without it knowing"""
+        original = getattr(module, name)
+
+        def timed(*args, **kwargs):
+            with self.phase(phase):
+                return original(*args, **kwargs)
+
+        setattr(module, name, timed)
+        try:
+            yield
+        finally:
+            setattr(module, name, original)
+
+    def merge(self, other):
+        """Adds the timings recorded by another Profiler, such as one from a worker process"""
+        for name, (wall, cpu, calls) in other.phases.items():
+            totals = self.phases.setdefault(name, [0.0, 0.0, 0])
+            totals[0] += wall
+            totals[1] += cpu
+            totals[2] += calls
+        for source, phases in other.pages.items():
+            page = self.pages.setdefault(source, {})
+            for name, (wall, cpu) in phases.items():
+                page_totals = page.setdefault(name, [0.0, 0.0])
+                page_totals[0] += wall
+                page_totals[1] += cpu
+        self.events.extend(other.events)
+
+    def slowest(self, count=10):
+        """Returns the (source, wall seconds) of the slowest pages, slowest first"""
+        totals = [(source, phases["page"][0]) for source, phases in self.pages.items()]
+        return sorted(totals, key=lambda total: total[1], reverse=True)[:count]
+
+    def to_json(self, slowest=10):
+        return {
+            "phases": {
+                name: {"wall": wall, "cpu": cpu, "calls": calls}
+                for name, (wall, cpu, calls) in self.phases.items()
+            },
+            "pages": {
+                source: {
+                    name: {"wall": wall, "cpu": cpu}
+                    for name, (wall, cpu) in phases.items()
+                }
+                for source, phases in self.pages.items()
+            },
+            "slowest": [
+                {"page": source, "wall": wall}
+                for source, wall in self.slowest(slowest)
+            ],
+        }
+
+    def to_chrome_trace(self):
+        """Returns the events in the Trace Event Format that chrome://tracing and Perfetto open"""
+        return {"traceEvents": self.events, "displayTimeUnit": "ms"}
+
+    def save(self, directory, slowest=10):
+        """Writes profile.json and trace.json into directory and returns their paths"""
+        os.makedirs(directory, exist_ok=True)
+        paths = (
+            os.path.join(directory, "profile.json"),
+            os.path.join(directory, "trace.json"),
+        )
+        with open(paths[0], "w") as f:
+            json.dump(self.to_json(slowest), f, indent=2)
+        with open(paths[1], "w") as f:
+            json.dump(self.to_chrome_trace(), f)
+        return paths
+
+    def report(self, slowest=10):
+        """Returns a printable table of the phases and the slowest pages"""
+        lines = [f"{'phase':<24} {'wall':>10} {'cpu':>10} {'calls':>8}"]
+        for name, (wall, cpu, calls) in self.phases.items():
+            lines.append(
+                f"{name:<24} {wall * 1000:7.1f} ms {cpu * 1000:7.1f} ms {calls:>8}"
+            )
+        if self.pages:
+            lines.append(f"Slowest {min(slowest, len(self.pages))} pages:")
+            for source, wall in self.slowest(slowest):
+                lines.append(f"  {wall * 1000:7.1f} ms  {source}")
+        return "\n".join(lines)
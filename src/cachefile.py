@@ -0,0 +1,27 @@
+import json
+import os
+
+
+def load_versioned(path, version):
+    """Reads a JSON file written by save_versioned(). Returns its data, or None if the file is missing, unreadable or was written in another version of its format, in which case the caller starts from scratch"""
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(data, dict) or data.get("version") != version:
+        return None
+    return data
+
+
+def save_versioned(path, version, data, sort_keys=False):
+    """Writes a dict to a JSON file along with the version of its format, creating the file's directory if needed and replacing the previous file atomically"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temp_path = f"{path}.tmp"
+    # dumps() encodes in one go with the C encoder, several times faster than dump() streaming through the Python one
+    text = json.dumps({"version": version, **data}, sort_keys=sort_keys)
+    with open(temp_path, "w") as f:
+        f.write(text)
+    os.replace(temp_path, path)
@@ -0,0 +1,114 @@
+import re
+
+try:
+    import yaml
+except ImportError:  # Optional; without PyYAML only flat "key: value" front matter is understood
+    yaml = None
+try:
+    import tomllib
+except ImportError:  # Python < 3.11, where TOML front matter isn't supported
+    tomllib = None
+
+from md_to_html import extract_title
+
+FENCES = ("---", "+++")  # Lines that open and close YAML and TOML front matter respectively
+SIMPLE_YAML_PATTERN = re.compile(r"([\w-]+):\s*(.*)")  # Matches "tags: [a, b]", capturing "tags" and "[a, b]"
+
+
+def parse_simple_yaml(text):
+    """Parses front matter made of "key: value" lines when PyYAML isn't installed. Values can be strings (quoted or not), integers, true/false or [a, b] lists of strings"""
+    metadata = {}
+    for line in text.splitlines():
+        if not line.strip() or line.lstrip().startswith("#"):
+            continue
+        match = SIMPLE_YAML_PATTERN.fullmatch(line.rstrip())
+        if match is None:
+            raise ValueError(f"can't parse {line!r} without PyYAML")
+        metadata[match[1]] = parse_simple_value(match[2])
+    return metadata
+
+
+def parse_simple_value(value):
+    if value.startswith("[") and value.endswith("]"):
+        items = [item.strip() for item in value[1:-1].split(",")]
+        return [parse_simple_value(item) for item in items if item]
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in "\"'":
+        return value[1:-1]
+    if value in ("true", "false"):
+        return value == "true"
+    if re.fullmatch(r"-?\d+", value):
+        return int(value)
+    return value
+
+
+def parse_front_matter(text, fence):
+    """Parses the text between two fences: YAML between "---" lines, TOML between "+++" lines. Raises ValueError if it isn't a valid mapping"""
+    try:
+        if fence == "+++":
+            if tomllib is None:
+                raise ValueError("TOML front matter needs Python 3.11 or newer")
+            metadata = tomllib.loads(text)
+        elif yaml is not None:
+            metadata = yaml.safe_load(text)
+        else:
+            metadata = parse_simple_yaml(text)
+    except ValueError:
+        raise
+    except Exception as e:
+        # YAML errors aren't ValueErrors
+        raise ValueError(f"invalid front matter: {e}") from e
+    if metadata is None:
+        return {}
+    if not isinstance(metadata, dict):
+        raise ValueError("front matter must be a mapping of keys to values")
+    return metadata
+
+
+def split_front_matter(markdown):
+    """Returns (metadata, body) for a document: the parsed front matter it starts with, if any, and the markdown after it. A fence that is never closed isn't front matter, so the document is returned as it is"""
+    first_line, _, rest = markdown.partition("\n")
+    fence = first_line.rstrip()
+    if fence not in FENCES:
+        return {}, markdown
+    closing = re.search(rf"^{re.escape(fence)}[ \t\r]*$", rest, re.MULTILINE)
+    if closing is None:
+        return {}, markdown
+    metadata = parse_front_matter(rest[: closing.start()], fence)
+    return metadata, rest[closing.end() :].lstrip("\r\n")
+
+
+def read_header(f):
+    """Reads the front matter of an open markdown file and the first line of its body, and stops there without reading the rest. Leaves f at the start of the body, as split_front_matter() would. Returns (metadata, first line of the body)"""
+    start = f.tell()
+    fence = f.readline().rstrip()
+    metadata = None
+    if fence in FENCES:
+        lines = []
+        for line in iter(f.readline, ""):
+            if line.rstrip() == fence:
+                metadata = parse_front_matter("".join(lines), fence)
+                break
+            lines.append(line)
+    if metadata is None:
+        # No front matter, or a fence that was never closed
+        f.seek(start)
+        metadata = {}
+    else:
+        # Blank lines between the front matter and the body belong to neither
+        while True:
+            start = f.tell()
+            line = f.readline()
+            if line not in ("\n", "\r\n"):
+                break
+        f.seek(start)
+    first_line = f.readline()
+    f.seek(start)
+    return metadata, first_line
+
+
+def document_title(metadata, body):
+    """Returns the title of a document: the title of its front matter, or else its "# " heading (see extract_title())"""
+    title = metadata.get("title")
+    if title is not None:
+        return str(title)
+    return extract_title(body)
@@ -1,18 +1,39 @@
+URL_PROPS = ("href", "src")  # Attributes whose values are urls
+
+
 class HTMLNode:
+    # Documents are made of huge numbers of nodes, so they get fixed slots instead of a __dict__ each
+    __slots__ = ("tag", "value", "children", "props")
+
     def __init__(self, tag=None, value=None, children=None, props=None):
         self.tag = tag  # HTML tag name ("p", "a", "h1", etc.)
         self.value = value  # The actual text
         self.children = children  # A list of nodes that are children of this node
         self.props = props  # A dictionary of key-value pairs representing the attributes of the HTML tag
 
-    def to_html(self):
+    def to_html(self, resolve_url=None):
         """Not implemented. To be overwritten by child classes."""
         raise NotImplementedError
 
-    def props_to_html(self):
-        """Returns element 1 = ' "element 2"' for each item in the properties list. Each string intentionally starts with a space."""
+    def iter_html(self, resolve_url=None):
+        """Yields the node's HTML in chunks. Child classes that can produce their HTML piece by piece overwrite this."""
+        yield self.to_html(resolve_url)
+
+    def write_html(self, fp, resolve_url=None):
+        """Writes the node's HTML straight into a file object chunk by chunk, without ever holding the whole string."""
+        write = fp.write
+        for chunk in self.iter_html(resolve_url):
+            write(chunk)
+
+    def props_to_html(self, resolve_url=None):
+        """Returns element 1 = ' "element 2"' for each item in the properties list. Each string intentionally starts with a space. If resolve_url is given, href and src values are passed through it as they are emitted."""
         if self.props is not None:
-            return "".join(map(lambda x: f' {x[0]}="{x[1]}"', self.props.items()))
+            if resolve_url is None:
+                return "".join(map(lambda x: f' {x[0]}="{x[1]}"', self.props.items()))
+            return "".join(
+                f' {key}="{resolve_url(value) if key in URL_PROPS else value}"'
+                for key, value in self.props.items()
+            )
         return ""
 
     def __repr__(self):
@@ -0,0 +1,104 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from PIL import Image
+except ImportError:  # Optional; without Pillow pages keep linking to the full-size images only
+    Image = None
+
+IMAGE_CACHE_VERSION = 1
+RESIZABLE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp")
+IMAGE_QUALITY = 82  # Encoder quality of lossy derivatives (jpeg, webp)
+
+
+def available():
+    """True if Pillow is installed, so derivatives can be made"""
+    return Image is not None
+
+
+def variant_name(path, width):
+    """Returns the name of a derivative of the image at path: rivendell.png at 480 pixels wide is rivendell-480w.png"""
+    stem, extension = os.path.splitext(path)
+    return f"{stem}-{width}w{extension}"
+
+
+def resize_image(source, directory, widths, quality=IMAGE_QUALITY):
+    """Writes a re-encoded copy of the image at source into directory for every width narrower than the image itself, then the image's metadata as meta.json, which marks the entry as complete. Runs in worker processes. Returns the metadata: {"width": ..., "height": ..., "variants": [[width, height], ...]}"""
+    os.makedirs(directory, exist_ok=True)
+    extension = os.path.splitext(source)[1]
+    with Image.open(source) as image:
+        width, height = image.size
+        if image.mode == "P":
+            # Palette images can only be resized pixel by pixel; convert them so they are filtered properly
+            image = image.convert("RGBA")
+        variants = []
+        for target in sorted(set(widths)):
+            if target >= width:
+                continue
+            target_height = max(1, round(height * target / width))
+            resized = image.resize((target, target_height), Image.LANCZOS)
+            resized.save(
+                os.path.join(directory, f"{target}w{extension}"),
+                optimize=True,
+                quality=quality,
+            )
+            variants.append([target, target_height])
+    meta = {"width": width, "height": height, "variants": variants}
+    temp_path = os.path.join(directory, f"meta.json.{os.getpid()}.tmp")
+    with open(temp_path, "w") as f:
+        json.dump(meta, f)
+    os.replace(temp_path, os.path.join(directory, "meta.json"))
+    return meta
+
+
+class ImageCache:
+    def __init__(self, directory, widths, quality=IMAGE_QUALITY):
+        self.directory = directory  # Where derivatives are kept between builds, one directory per image and settings
+        self.widths = sorted(set(widths))  # Widths to make derivatives at, in pixels
+        self.quality = quality  # Encoder quality of lossy derivatives
+
+    def key(self, digest, extension):
+        """Returns the cache key for an image: a hash of its content hash and every setting that changes its derivatives"""
+        settings = f"{IMAGE_CACHE_VERSION}\0{self.widths}\0{self.quality}\0{extension}"
+        return hashlib.sha256(f"{settings}\0{digest}".encode()).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def variant_path(self, key, extension, width):
+        """Returns where the derivative of an image at width is cached"""
+        return os.path.join(self.path(key), f"{width}w{extension}")
+
+    def load(self, key):
+        """Returns the metadata of a cached image, or None if it was never resized with these settings"""
+        try:
+            with open(os.path.join(self.path(key), "meta.json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def resize(self, images, jobs=1):
+        """Makes the derivatives of every image in images, a {url: (source, content hash)} dict, unless they are cached already. Misses are re-encoded on a process pool with more than one job. Returns the metadata of every image, keyed by url, and the number of images that had to be re-encoded"""
+        metadata = {}
+        misses = {}
+        for url, (source, digest) in images.items():
+            key = self.key(digest, os.path.splitext(source)[1])
+            meta = self.load(key)
+            if meta is None:
+                misses[url] = (source, self.path(key), self.widths, self.quality)
+            else:
+                metadata[url] = meta
+        if jobs <= 1 or len(misses) <= 1:
+            for url, arguments in misses.items():
+                metadata[url] = resize_image(*arguments)
+        else:
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                futures = {
+                    url: pool.submit(resize_image, *arguments)
+                    for url, arguments in misses.items()
+                }
+                for url, future in futures.items():
+                    metadata[url] = future.result()
+        return metadata, len(misses)
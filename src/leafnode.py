@@ -2,15 +2,14 @@ from htmlnode import HTMLNode
 
 
 class LeafNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self, tag=None, value=None, props=None):
-        super().__init__(tag, value, props)
-        self.tag = tag
-        self.value = value
-        self.props = props
-        self.children = []
+        # Leaves never have children; the shared empty tuple saves allocating a list per leaf
+        super().__init__(tag, value, (), props)
 
-    def to_html(self):
-        """Returns an HTML formatted string from the LeafNode. Usually <tag>value</tag>; special cases for images(tag='img') and link(tag='a') LeafNodes. Requires a value and does not accept children."""
+    def to_html(self, resolve_url=None):
+        """Returns an HTML formatted string from the LeafNode. Usually <tag>value</tag>; special cases for images(tag='img') and link(tag='a') LeafNodes. Requires a value and does not accept children. Image and link urls are passed through resolve_url if one is given, and images get the width, height and srcset attributes from the resolver's image_attributes(), if it has one."""
         if self.value is None:
             raise ValueError
         if self.tag is None:
@@ -19,12 +18,19 @@ class LeafNode(HTMLNode):
             if self.props is None:
                 raise ValueError("image props may not be None")
             url = self.props.get("src")
+            attributes = ""
+            if resolve_url is not None:
+                # Resolvers that know the image's size and derivatives describe it as well
+                image_attributes = getattr(resolve_url, "image_attributes", None)
+                if image_attributes is not None:
+                    attributes = image_attributes(url)
+                url = resolve_url(url)
             alt = self.props.get("alt")
-            return f'<{self.tag} src="{url}" alt="{alt}" />'
+            return f'<{self.tag} src="{url}" alt="{alt}"{attributes} />'
         if self.tag == "a":
             if self.props is None:
                 raise ValueError("link props may not be None")
-            html_props = self.props_to_html()
+            html_props = self.props_to_html(resolve_url)
             return f"<{self.tag}{html_props}>{self.value}</{self.tag}>"
         # If it's not an image or a link, it can be tagged normally.
         return f"<{self.tag}>{self.value}</{self.tag}>"
@@ -0,0 +1,154 @@
+import mimetypes
+import os
+from urllib.parse import unquote, urljoin, urlsplit
+
+from cachefile import load_versioned, save_versioned
+
+LINK_GRAPH_VERSION = 2
+
+
+class LinkRecorder:
+    def __init__(self, resolve_url=None):
+        self.resolve_url = resolve_url  # The resolver urls are passed on to once recorded
+        self.links = []  # Every url emitted, in document order
+
+    def __call__(self, url):
+        """Records url as it is emitted, then resolves it like the wrapped resolver would. Rendering already passes every href and src through here, so links are collected without looking at the HTML again"""
+        if url is not None:
+            self.links.append(url)
+        if self.resolve_url is None:
+            return url
+        return self.resolve_url(url)
+
+    def image_attributes(self, url):
+        """Describes the image at url like the wrapped resolver does, if it can"""
+        image_attributes = getattr(self.resolve_url, "image_attributes", None)
+        return image_attributes(url) if image_attributes is not None else ""
+
+
+class BrokenLink:
+    def __init__(self, source, url):
+        self.source = source  # Page or template the url appears in
+        self.url = url  # The url as it was written
+
+    def is_image(self):
+        type, _ = mimetypes.guess_type(urlsplit(self.url).path)
+        return type is not None and type.startswith("image/")
+
+    def __repr__(self):
+        kind = "Missing image" if self.is_image() else "Broken link"
+        return f"{kind} in {self.source}: {self.url}"
+
+    def __eq__(self, other):
+        return (self.source, self.url) == (other.source, other.url)
+
+
+def internal_path(url, base="/"):
+    """Returns the root-relative path a url points to inside the site, resolving relative urls against base, or None for external urls and bare fragments"""
+    parts = urlsplit(url)
+    if parts.scheme or parts.netloc or not parts.path:
+        return None
+    return unquote(urlsplit(urljoin(base, parts.path)).path)
+
+
+def target_key(path):
+    """Returns the form of a root-relative path that every url of the same target shares: "/blog/tom", "/blog/tom/" and "/blog/tom/index.html" are all "/blog/tom" """
+    if path.endswith("/index.html"):
+        path = path[: -len("index.html")]
+    return path.rstrip("/") or "/"
+
+
+class LinkGraph:
+    def __init__(self, path, links=None, broken=None):
+        self.path = path  # Where the graph is persisted between builds
+        self.links = links or {}  # [url, root-relative path it points to] of every internal link of every page or template, keyed by source path
+        self.broken = broken or {}  # Urls of every source that were broken when it was last checked
+        self.unchecked = set()  # Sources whose links were recorded since the last check()
+        self.referenced = None  # {target_key(): set of sources}, built the first time it is needed
+        self.modified = False  # Whether anything changed since the graph was loaded
+
+    @classmethod
+    def load(cls, path):
+        """Reads a graph from disk. A missing, unreadable or outdated graph yields an empty one"""
+        data = load_versioned(path, LINK_GRAPH_VERSION)
+        if data is None:
+            return cls(path)
+        return cls(path, data.get("links", {}), data.get("broken", {}))
+
+    def save(self):
+        """Writes the graph to disk, replacing the previous one atomically. Does nothing if the graph is the same as when it was loaded"""
+        if not self.modified:
+            return
+        self.modified = False
+        save_versioned(
+            self.path, LINK_GRAPH_VERSION, {"links": self.links, "broken": self.broken}
+        )
+
+    def record(self, source, links, base="/"):
+        """Replaces what source links to with the urls it was just rendered with, resolving relative ones against base, the url of the page. Urls are resolved once here rather than on every check. Returns True if the links changed, in which case source is checked again by the next check()"""
+        internal = []
+        for url in links:
+            target = internal_path(url, base)
+            if target is not None:
+                internal.append([url, target])
+        if self.links.get(source) == internal:
+            return False
+        self.links[source] = internal
+        self.unchecked.add(source)
+        self.referenced = None
+        self.modified = True
+        return True
+
+    def retain(self, sources):
+        """Forgets every source not in sources, such as pages that were deleted"""
+        for source in self.links.keys() - set(sources):
+            del self.links[source]
+            self.broken.pop(source, None)
+            self.unchecked.discard(source)
+            self.referenced = None
+            self.modified = True
+
+    def referrers(self, path):
+        """Returns the sorted sources that link to the root-relative path, e.g. every page showing "/images/tom.png". "/blog/tom", "/blog/tom/" and "/blog/tom/index.html" are the same target"""
+        if self.referenced is None:
+            self.referenced = {}
+            for source, links in self.links.items():
+                for _, target in links:
+                    self.referenced.setdefault(target_key(target), set()).add(source)
+        return sorted(self.referenced.get(target_key(path), ()))
+
+    def check(self, index, output_root, changed_outputs=None):
+        """Returns a BrokenLink for every internal link or image that is neither a page in the PageIndex nor a file under output_root. Only the sources recorded since the last check are looked at again, along with the sources linking to changed_outputs, the outputs this build added or removed; the rest keep the broken links found when they were last checked. Without changed_outputs every source is checked. Each distinct target is only looked up once"""
+        if changed_outputs is None:
+            sources = set(self.links)
+        else:
+            sources = set(self.unchecked)
+            for output in changed_outputs:
+                target = os.path.relpath(output, output_root).replace(os.sep, "/")
+                sources.update(self.referrers(f"/{target}"))
+        exists = {}
+        for source in sources:
+            broken = []
+            for url, target in self.links.get(source, ()):
+                if target not in exists:
+                    output = os.path.join(output_root, target.lstrip("/"))
+                    exists[target] = (
+                        index.find(target) is not None
+                        or os.path.isfile(output)
+                        # Generated pages, such as list pages, are served as their directory's index
+                        or os.path.isfile(os.path.join(output, "index.html"))
+                    )
+                if not exists[target]:
+                    broken.append(url)
+            if self.broken.get(source, []) != broken:
+                self.modified = True
+                if broken:
+                    self.broken[source] = broken
+                else:
+                    del self.broken[source]
+        self.unchecked = set()
+        return [
+            BrokenLink(source, url)
+            for source, urls in sorted(self.broken.items())
+            for url in urls
+        ]
@@ -0,0 +1,132 @@
+import datetime
+import logging
+import os
+import re
+
+from leafnode import LeafNode
+from parentnode import ParentNode
+
+PAGE_SIZE = 10  # Pages listed on each list page
+SLUG_PATTERN = re.compile(r"[^\w]+")
+
+logger = logging.getLogger(__name__)
+
+
+def slugify(text):
+    """Turns a tag into the part of a url that names it: "Middle Earth" becomes "middle-earth" """
+    return SLUG_PATTERN.sub("-", text.lower()).strip("-")
+
+
+def page_date(page):
+    """Returns the date of a page's front matter as an ISO string ("2024-01-05"), or None if it has none"""
+    date = page.metadata.get("date")
+    if date is None:
+        return None
+    if isinstance(date, (datetime.date, datetime.datetime)):
+        return date.isoformat()
+    return str(date)
+
+
+def page_tags(page):
+    """Returns the tags of a page's front matter, which may be a list or a comma separated string"""
+    tags = page.metadata.get("tags") or []
+    if isinstance(tags, str):
+        tags = tags.split(",")
+    return [str(tag).strip() for tag in tags if str(tag).strip()]
+
+
+def section_url(url):
+    """Returns the url of the section a page's url is in: "/blog/tom/" and "/blog/tom.html" are in "/blog/". Returns None for pages at the top of the site, which belong to no section"""
+    parent = url.rstrip("/").rsplit("/", 1)[0]
+    return f"{parent}/" if parent else None
+
+
+class Collection:
+    def __init__(self, url, title, directory=None):
+        self.url = url  # Url of the first list page, always ending in "/"
+        self.title = title  # Heading of every list page
+        self.directory = directory  # Content directory whose template renders the list pages, None for the site's template
+        self.pages = []  # Member pages, newest first
+
+    def page_url(self, number):
+        """Returns the url of list page number, counting from 1"""
+        if number == 1:
+            return self.url
+        return f"{self.url}page/{number}/"
+
+    def paginate(self, page_size=PAGE_SIZE):
+        """Yields (number, url, members) for every list page of the collection. An empty collection has no list pages"""
+        for start in range(0, len(self.pages), page_size):
+            number = start // page_size + 1
+            yield number, self.page_url(number), self.pages[start : start + page_size]
+
+    def page_count(self, page_size=PAGE_SIZE):
+        return -(-len(self.pages) // page_size)
+
+    def __repr__(self):
+        return f"Collection({self.url}, {self.title}, {len(self.pages)} pages)"
+
+
+def group_pages(index):
+    """Groups the pages of a PageIndex into collections: one per section (the pages under a content directory, such as every post under blog/), one per tag and one per year. Pages are sorted newest first once, then handed out in a single pass, so every collection comes out sorted; pages without a date come last, in index order. Drafts are left out. Tags with the same slug share a collection, titled after the first of them; a page is listed there once, and tags that differ by more than case are warned about. Returns the collections keyed by url"""
+    dated = []
+    undated = []
+    for page in index:
+        if page.metadata.get("draft"):
+            continue
+        (dated if page_date(page) is not None else undated).append(page)
+    # sort() is stable, so pages from the same date stay in index order
+    dated.sort(key=page_date, reverse=True)
+    collections = {}
+    tag_names = {}  # The first tag seen for every slug
+    collisions = set()  # Pairs of tags already warned about
+
+    def add(url, title, page, directory=None):
+        collection = collections.get(url)
+        if collection is None:
+            collection = collections[url] = Collection(url, title, directory)
+        collection.pages.append(page)
+
+    for page in dated + undated:
+        section = section_url(page.url)
+        if section is not None:
+            directory = os.path.join(index.root, section.strip("/"))
+            add(section, os.path.basename(directory).title(), page, directory)
+        slugs = set()
+        for tag in page_tags(page):
+            slug = slugify(tag)
+            name = tag_names.setdefault(slug, tag)
+            if name.casefold() != tag.casefold() and (name, tag) not in collisions:
+                collisions.add((name, tag))
+                logger.warning(
+                    "Tags %r and %r are both listed at /tags/%s/", name, tag, slug
+                )
+            if slug not in slugs:
+                slugs.add(slug)
+                add(f"/tags/{slug}/", f"Tagged {name}", page)
+        date = page_date(page)
+        if date is not None:
+            add(f"/archive/{date[:4]}/", f"Posts from {date[:4]}", page)
+    return collections
+
+
+def listing_node(collection, number, members, page_size=PAGE_SIZE):
+    """Returns the content of one list page: the collection's title, a list linking to each member with its date, and links to the newer and older list pages"""
+    items = []
+    for page in members:
+        item = [LeafNode("a", page.title or page.url, {"href": page.url})]
+        date = page_date(page)
+        if date is not None:
+            item += [LeafNode(None, " "), LeafNode("time", date)]
+        items.append(ParentNode("li", item))
+    children = [LeafNode("h1", collection.title), ParentNode("ul", items)]
+    navigation = []
+    if number > 1:
+        url = collection.page_url(number - 1)
+        navigation.append(LeafNode("a", "Newer", {"href": url}))
+    if number < collection.page_count(page_size):
+        url = collection.page_url(number + 1)
+        navigation.append(LeafNode("a", "Older", {"href": url}))
+    if navigation:
+        children.append(ParentNode("nav", navigation))
+    return ParentNode("div", children)
@@ -1,69 +1,465 @@
+import argparse
+import hashlib
+import logging
 import os
 import shutil
 import sys
-from md_to_html import extract_title, markdown_to_html_node
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from contextlib import ExitStack, nullcontext
+import imagevariants
+import md_to_html
+from assetmap import AssetMap, fingerprinted_name
+from astcache import AstCache
+from buildprofile import Profiler
+from frontmatter import document_title, split_front_matter
+from imagevariants import RESIZABLE_EXTENSIONS, ImageCache, variant_name
+from linkgraph import LinkGraph, LinkRecorder, internal_path
+from listings import PAGE_SIZE, group_pages, listing_node, page_date
+from manifest import BuildManifest, hash_file
+from pageindex import HeaderCache, PageIndex, read_metadata
+from pipeline import read_source, render_pages_pipelined, stream_page
+from precompress import precompress_outputs
+from searchindex import SearchIndex
+from sitemap import SiteFiles
+from staticsync import SYNC_MODES, SyncReport, same_file_stat, sync_file
+from md_to_html import markdown_to_html_node
+from template import Template
+from urlresolver import UrlResolver
 
+MANIFEST_PATH = ".ssg-cache/manifest.json"
+AST_CACHE_PATH = ".ssg-cache/ast"
+AST_CACHE_MAX_BYTES = 256 * 1024 * 1024
+PROFILE_PATH = ".ssg-cache/profile"
+IMAGE_CACHE_PATH = ".ssg-cache/images"
+LINK_GRAPH_PATH = ".ssg-cache/links.json"
+ASSET_MAP_PATH = ".ssg-cache/assets.json"
+SEARCH_INDEX_PATH = ".ssg-cache/search.json"
+HEADER_CACHE_PATH = ".ssg-cache/headers.json"
+# Parser functions that --profile times as phases of their own: (function name, phase)
+PROFILED_PARSER_PHASES = [
+    ("block_to_html_node", "block parsing"),
+    ("find_block_parser", "block typing"),
+    ("text_to_textnodes", "inline parsing"),
+]
 
-def copy_static(source, destination):
-    """Copies all contents of one directory into another. Accepts two filepaths as inputs"""
+logger = logging.getLogger(__name__)
+
+
+def copy_static(
+    source,
+    destination,
+    manifest=None,
+    mode="copy",
+    threads=8,
+    settings=None,
+    assets=None,
+):
+    """Copies all contents of one directory into another. Accepts two filepaths as inputs. Files that are already up to date are skipped: when a BuildManifest is passed, those whose contents and settings (build options that change the copies, like minifying) haven't changed since the last build, otherwise those whose copy has the same size and mtime. mode picks how files are copied (see staticsync.SYNC_MODES), and copies run on a pool of threads. When an AssetMap is passed, assets are also copied under a fingerprinted name, which is recorded in the map. Returns a SyncReport"""
     if not os.path.exists(source):
         raise ValueError("Source does not exist")
-    source_contents = os.listdir(source)  # Returns a list of directory and file names
-    for f in source_contents:
-        # Make some similar filepaths
-        path = f"{os.path.join(source)}/{f}"
-        mirror = f"{os.path.join(destination)}/{f}"
-        # If the path is a directory, make an identical directory in destination and recur
-        if os.path.isdir(path):
-            os.mkdir(mirror)
-            copy_static(path, mirror)
-        # If the path is a file, copy it into destination
-        if os.path.isfile(path):
-            shutil.copy(path, mirror)
-
-
-def generate_page(from_path, template_path, dest_path, basepath):
-    """Takes data from a .md file at from_path and converts it into a .html page (assuming that template_path points to a .html) at dest_path."""
-    print(f"Generating page from {from_path} to {dest_path} using {template_path}")
-    with open(from_path) as f:
-        markdown = f.read()
-    with open(template_path) as t:
-        template = t.read()
+    report = SyncReport()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        copies = []
+        pending = [(source, destination, "/")]
+        while pending:
+            directory, mirror_directory, url_directory = pending.pop()
+            # scandir hands back the type of every entry along with its name, so there is no separate isdir()/isfile() call per entry
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    mirror = os.path.join(mirror_directory, entry.name)
+                    # If the entry is a directory, make an identical directory in destination and walk it later
+                    if entry.is_dir():
+                        os.makedirs(mirror, exist_ok=True)
+                        pending.append(
+                            (entry.path, mirror, f"{url_directory}{entry.name}/")
+                        )
+                    # If the entry is a file, copy it into destination unless it's up to date
+                    elif entry.is_file():
+                        stat = entry.stat()
+                        outputs = [mirror]
+                        if assets is not None:
+                            if manifest is not None:
+                                digest = manifest.fingerprint(entry.path, stat)
+                            else:
+                                digest = hash_file(entry.path)
+                            url = f"{url_directory}{entry.name}"
+                            if assets.add(url, digest) is not None:
+                                outputs.append(fingerprinted_name(mirror, digest))
+                        if manifest is not None:
+                            up_to_date = manifest.unchanged(
+                                entry.path,
+                                outputs if len(outputs) > 1 else mirror,
+                                stat=stat,
+                                **(settings or {}),
+                            )
+                        else:
+                            up_to_date = all(
+                                same_file_stat(output, stat) for output in outputs
+                            )
+                        if up_to_date:
+                            report.skipped(stat.st_size)
+                            continue
+                        for output in outputs:
+                            copies.append(
+                                pool.submit(sync_file, entry.path, output, mode)
+                            )
+                        report.copied(stat.st_size)
+        # Surface the first failed copy, if any
+        for copy in copies:
+            copy.result()
+    return report
+
+
+def generate_image_variants(
+    static_dir, dest_dir, manifest, cache, jobs=1, mode="copy", assets=None
+):
+    """Makes resized derivatives of every image the static copy recorded in the manifest, reusing the ones an ImageCache already holds, and puts those into dest_dir next to their image (see imagevariants.variant_name()). Derivatives that are already up to date there are skipped. When an AssetMap is passed, derivatives are also put there under a fingerprinted name, which is recorded in the map, like copy_static() does for the images themselves. Returns the size and derivatives of every image, keyed by url, and the number of images that were re-encoded"""
+    images = {}
+    prefix = os.path.join(static_dir, "")
+    for source in sorted(manifest.current):
+        if source.startswith(prefix) and source.lower().endswith(RESIZABLE_EXTENSIONS):
+            url = "/" + os.path.relpath(source, static_dir).replace(os.sep, "/")
+            images[url] = (source, manifest.fingerprint(source))
+    metadata, resized = cache.resize(images, jobs)
+    for url, (source, digest) in images.items():
+        extension = os.path.splitext(source)[1]
+        key = cache.key(digest, extension)
+        for width, _ in metadata[url]["variants"]:
+            derivative = cache.variant_path(key, extension, width)
+            variant_url = variant_name(url, width)
+            outputs = [os.path.join(dest_dir, variant_url[1:])]
+            if assets is not None:
+                digest = manifest.fingerprint(derivative)
+                fingerprinted = assets.add(variant_url, digest)
+                if fingerprinted is not None:
+                    outputs.append(os.path.join(dest_dir, fingerprinted[1:]))
+            if not manifest.unchanged(
+                derivative, outputs if len(outputs) > 1 else outputs[0]
+            ):
+                for output in outputs:
+                    sync_file(derivative, output, mode)
+    return metadata, resized
+
+
+def generate_page(from_path, template, dest_path, ast_cache=None):
+    """Takes data from a .md file at from_path and converts it into a .html page at dest_path using a compiled Template. With an AstCache, documents that were parsed before aren't parsed again. Huge files are streamed through block by block instead (see stream_page()). Returns the urls of every link and image on the page."""
+    logger.info(
+        "Generating page from %s to %s using %s", from_path, dest_path, template.path
+    )
+    markdown = read_source(from_path)
+    if markdown is None:
+        return stream_page(from_path, template, dest_path)
+    # Front matter is metadata rather than part of the page
+    metadata, markdown = split_front_matter(markdown)
     # Convert the file's markdown data into a single ParentNode object
-    md = markdown_to_html_node(markdown)
-    # Translate the parent node into a string of HTML formatted text
-    html = md.to_html()
-    title = extract_title(markdown)
-    # Copy a template file (a .html in this case) and replace its filler content with our html data
-    page = template.replace("{{ Title }}", title).replace("{{ Content }}", html)
-    formatted_page = page.replace('href="/', f'href="{basepath}').replace(
-        'src="/', f'src="{basepath}'
-    )
-    # Write it to destination
+    if ast_cache is not None:
+        md = ast_cache.parse(markdown)
+    else:
+        md = markdown_to_html_node(markdown)
+    title = document_title(metadata, markdown)
+    # Fill the template's slots and stream the page to its destination; the node's HTML is written as it's produced, with urls recorded and resolved against the basepath
+    recorder = LinkRecorder(template.resolve_url)
     with open(dest_path, "w") as d:
-        d.write(formatted_page)
-
-
-def generate_pages_recursive(dir_path, template_path, dest_dir_path, basepath):
-    """Crawls through a parent directory to generate pages for all files inside using generate_page()"""
-    contents = os.listdir(dir_path)
-    for f in contents:
-        # Paths to keep track of where we are in each directory
-        path = f"{os.path.join(dir_path)}/{f}"
-        mirror = f"{os.path.join(dest_dir_path)}/{f}"
-        # If the path is a director, make sure mirror has the same directory, then recur
-        if os.path.isdir(path):
-            os.makedirs(mirror, exist_ok=True)
-            generate_pages_recursive(path, template_path, mirror, basepath)
-        if os.path.isfile(path):
-            # If the path is a file, step back into the directory and point to a file called index.html, then generate_page()
-            # Because of the hardcoded nature of where the path points towards, you cannot have more than one file in each dir_path directory
-            goal = f"{os.path.join(dest_dir_path)}/index.html"
-            generate_page(path, template_path, goal, basepath)
-
-
-def main(basepath="/"):
-    # Removes the contents of the docs folder for regeneration
+        template.bind(recorder).write(d, Title=title, Content=md)
+    return recorder.links
+
+
+def generate_page_profiled(from_path, template, dest_path, ast_cache=None):
+    """Does the same as generate_page(), but one stage at a time so that each can be timed, and returns the page's links along with the Profiler holding the timings. Huge files are streamed like generate_page() does, timed as a single stage."""
+    logger.info(
+        "Generating page from %s to %s using %s", from_path, dest_path, template.path
+    )
+    profiler = Profiler()
+    recorder = LinkRecorder(template.resolve_url)
+    with ExitStack() as stack:
+        stack.enter_context(profiler.page_phase(from_path))
+        for name, phase in PROFILED_PARSER_PHASES:
+            stack.enter_context(profiler.instrument(md_to_html, name, phase))
+        with profiler.phase("read"):
+            markdown = read_source(from_path)
+        if markdown is None:
+            # Reading, parsing and writing are interleaved block by block, so they can only be timed together
+            with profiler.phase("stream"):
+                links = stream_page(from_path, template, dest_path)
+            return links, profiler
+        with profiler.phase("parse"):
+            metadata, markdown = split_front_matter(markdown)
+            if ast_cache is not None:
+                md = ast_cache.parse(markdown)
+            else:
+                md = md_to_html.markdown_to_html_node(markdown)
+            title = document_title(metadata, markdown)
+        with profiler.phase("to_html"):
+            html = md.to_html(recorder)
+        with profiler.phase("template fill"):
+            page = template.render(Title=title, Content=html)
+        with profiler.phase("write"):
+            with open(dest_path, "w") as d:
+                d.write(page)
+    return recorder.links, profiler
+
+
+def make_output_directories(pages):
+    """Creates the directory of every (source, destination) pair, once per directory"""
+    for directory in {os.path.dirname(destination) for _, destination in pages}:
+        os.makedirs(directory, exist_ok=True)
+
+
+def render_pages(pages, template, jobs=1, ast_cache=None, profiler=None):
+    """Calls generate_page() for each (source, destination) pair. With more than one job the pages are spread across a process pool; every failing page is reported before the build is aborted. When a Profiler is passed, pages are rendered with generate_page_profiled() and their timings are merged into it. Returns the links of every page, keyed by source"""
+    generate = generate_page if profiler is None else generate_page_profiled
+    links = {}
+
+    def collect(source, result):
+        if profiler is not None:
+            result, timings = result
+            profiler.merge(timings)
+        links[source] = result
+
+    if jobs <= 1 or len(pages) <= 1:
+        for source, destination in pages:
+            collect(source, generate(source, template, destination, ast_cache))
+        return links
+
+    failures = []
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {
+            pool.submit(generate, source, template, destination, ast_cache): source
+            for source, destination in pages
+        }
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                failures.append(futures[future])
+                logger.error("Failed to generate page from %s: %r", futures[future], e)
+                continue
+            collect(futures[future], result)
+    if failures:
+        raise RuntimeError(f"{len(failures)} of {len(pages)} pages failed to generate")
+    return links
+
+
+def generate_pages_recursive(
+    options,
+    state,
+    template_path="template.html",
+    static_dir="static",
+    ast_cache=None,
+    profiler=None,
+    sources=None,
+):
+    """Renders every page of the BuildState's index whose inputs (its template, the partials that includes and the files from static_dir it links to) or build options changed since the last build, or only those at sources, with the closest template.html above it or the one at template_path. Returns the compiled Template of every page looked at, keyed by path"""
+    index, manifest, assets = state.index, state.manifest, state.assets
+    resolve_url = UrlResolver(
+        options.basepath, assets.fingerprints if assets else None, state.images
+    )
+    # Build options that change every page
+    settings = {
+        "minify": options.minify,
+        "image_widths": list(options.image_widths) if state.images is not None else [],
+        "fingerprint": options.fingerprint,
+    }
+    templates = {}  # Every template used, compiled once for the whole build
+
+    def template_for(page):
+        path = index.template_for(page.source, template_path)
+        if path not in templates:
+            templates[path] = Template.load(path, resolve_url)
+        return templates[path]
+
+    static_prefix = os.path.join(static_dir, "")
+
+    def static_inputs(page, template, urls):
+        """Returns the files from static_dir that a page rendered with urls links to, whether they exist or not, so that adding one also counts as a change. Links to pages aren't static files"""
+        if assets is not None:
+            # The fingerprinted names of the template's assets end up in the page too
+            urls = [*urls, *template.links]
+        inputs = set()
+        for url in urls:
+            target = internal_path(url, page.url)
+            if target is not None and index.find(target) is None:
+                inputs.add(os.path.join(static_dir, target.lstrip("/")))
+        return sorted(inputs)
+
+    def dependencies(page, template, static=None):
+        """Returns the deps of a page as recorded in the manifest. The static files it links to are only worked out from its links when it is rendered (see static_inputs()); until then they are the ones the last build recorded"""
+        inputs = {
+            path: manifest.fingerprint(path)
+            for path in [template.path, *template.includes]
+        }
+        if static is None:
+            old = manifest.previous.get(page.source)
+            old_inputs = old["deps"].get("inputs", {}) if old else {}
+            static = [path for path in old_inputs if path.startswith(static_prefix)]
+        for path in static:
+            # Static files were hashed by the static copy, so looking them up costs nothing; files that are gone have no hash
+            entry = manifest.current.get(path)
+            inputs[path] = entry["hash"] if entry is not None else None
+        return {"inputs": inputs, "basepath": options.basepath, **settings}
+
+    # Pages are grouped by the template they are rendered with
+    groups = {}
+    for page in index:
+        if sources is not None and page.source not in sources:
+            continue
+        template = template_for(page)
+        if manifest is not None and manifest.unchanged(
+            page.source, page.output, **dependencies(page, template)
+        ):
+            continue
+        groups.setdefault(template.path, []).append((page.source, page.output))
+    links = {}
+    for path, pages in groups.items():
+        # Only the directories of pages that are about to be written need to exist
+        make_output_directories(pages)
+        if options.io_threads > 0 and profiler is None:
+            links.update(
+                render_pages_pipelined(
+                    pages, templates[path], options.jobs, ast_cache, options.io_threads
+                )
+            )
+        else:
+            links.update(
+                render_pages(pages, templates[path], options.jobs, ast_cache, profiler)
+            )
+    link_graph = state.link_graph
+    if link_graph is not None:
+        # Pages that weren't rendered keep the links recorded by the build that last rendered them. Looking at some sources only, no page came or went
+        if sources is None:
+            link_graph.retain([page.source for page in index] + list(templates))
+        for path, template in templates.items():
+            link_graph.record(path, template.links)
+        for source, page_links in links.items():
+            link_graph.record(source, page_links, index.by_source[source].url)
+    if manifest is not None:
+        # The static files a rendered page depends on are only known once it has been rendered
+        for source, page_links in links.items():
+            page = index.by_source[source]
+            template = template_for(page)
+            static = static_inputs(page, template, page_links)
+            manifest.record(
+                source, page.output, **dependencies(page, template, static)
+            )
+    return templates
+
+
+def generate_listings(
+    index,
+    template_path,
+    dest_dir_path,
+    basepath,
+    manifest=None,
+    page_size=PAGE_SIZE,
+    settings=None,
+    assets=None,
+):
+    """Renders the paginated list pages of every collection of the PageIndex (see listings.group_pages()): sections, tags and years. Each is rendered with the template its section's pages use, or the one at template_path. When a BuildManifest is passed, a list page is only rendered again when its members, their order, titles or dates, its place among the collection's pages, its template, the basepath or the settings changed. Collections whose url is taken by a content page are skipped. Returns how many list pages were rendered and how many were skipped"""
+    resolve_url = UrlResolver(basepath, assets.fingerprints if assets else None)
+    templates = {}  # Every template used, with a hash of its resolved text
+    rendered = skipped = 0
+    for url, collection in sorted(group_pages(index).items()):
+        if index.find(url) is not None:
+            logger.warning("Not listing %s, %s is a content page", collection, url)
+            continue
+        source = os.path.join(collection.directory or index.root, "index.md")
+        path = index.template_for(source, template_path)
+        if path not in templates:
+            template = Template.load(path, resolve_url)
+            # The resolved text covers the template, its partials and fingerprinted assets
+            digest = hashlib.sha256("".join(template.segments).encode()).hexdigest()
+            templates[path] = (template, digest)
+        template, digest = templates[path]
+        page_count = collection.page_count(page_size)
+        for number, page_url, members in collection.paginate(page_size):
+            output = os.path.join(dest_dir_path, page_url.lstrip("/"), "index.html")
+            if manifest is not None and manifest.generated(
+                f"listing:{page_url}",
+                output,
+                members=[[page.url, page.title, page_date(page)] for page in members],
+                # Only whether there are older pages shows, not how many
+                page=[number, number < page_count],
+                template=digest,
+                # Member links are resolved against it, whether the template has any url or not
+                basepath=basepath,
+                **(settings or {}),
+            ):
+                skipped += 1
+                continue
+            logger.info("Generating list page %s using %s", output, path)
+            os.makedirs(os.path.dirname(output), exist_ok=True)
+            with open(output, "w") as f:
+                template.write(
+                    f,
+                    Title=collection.title,
+                    Content=listing_node(collection, number, members, page_size),
+                )
+            rendered += 1
+    return rendered, skipped
+
+
+def generate_derived_outputs(
+    options, index, manifest, ast_cache=None, assets=None, phase=nullcontext
+):
+    """Writes what the options ask for that is made from the PageIndex and the rendered pages rather than from a source of its own: list pages, the search index, sitemaps and feeds. Then minifies and precompresses the outputs that changed. Each step runs in the context phase(name) returns, which times it when profiling"""
+    # Lists the pages of every section, tag and year from the index, without parsing any of them
+    if options.listings:
+        with phase("listings"):
+            rendered, skipped = generate_listings(
+                index,
+                "template.html",
+                "docs",
+                options.basepath,
+                manifest,
+                options.page_size,
+                settings={"minify": options.minify},
+                assets=assets,
+            )
+        logger.info("List pages: rendered %d, skipped %d unchanged", rendered, skipped)
+
+    # Indexes the text of every page for search, tokenizing only the pages that changed
+    if options.search:
+        with phase("search"):
+            search_index = SearchIndex.load(SEARCH_INDEX_PATH)
+            tokenized = search_index.update(index, manifest, ast_cache)
+            written, skipped = search_index.write(
+                os.path.join("docs", "search"), UrlResolver(options.basepath), manifest
+            )
+            search_index.save()
+        logger.info(
+            "Search index: tokenized %d pages, wrote %d files, skipped %d unchanged",
+            tokenized,
+            written,
+            skipped,
+        )
+
+    # Points crawlers and feed readers at every page; files that come out byte for byte the same aren't replaced
+    if options.site_url:
+        with phase("sitemap"):
+            site_files = SiteFiles(
+                "docs", options.site_url, UrlResolver(options.basepath), manifest
+            )
+            # A robots.txt among the static files wins over the generated one
+            written, skipped = site_files.write_all(
+                index, robots=not os.path.exists(os.path.join("static", "robots.txt"))
+            )
+        logger.info(
+            "Sitemaps and feeds: wrote %d files, skipped %d unchanged", written, skipped
+        )
+
+    # Minifies and precompresses the outputs that changed, so the server doesn't have to compress on the fly
+    if options.minify or options.precompress:
+        with phase("precompress"):
+            processed, skipped = precompress_outputs(
+                manifest.outputs(), manifest, options.minify, options.precompress
+            )
+        logger.info(
+            "Post-processed %d outputs, skipped %d unchanged", processed, skipped
+        )
+
+
+def clean_docs():
+    """Removes the contents of the docs folder for regeneration"""
     for f in os.listdir("docs"):
         filepath = os.path.join("docs", f)
         if os.path.isfile(filepath):
@@ -71,24 +467,338 @@ def main(basepath="/"):
         if os.path.isdir(filepath):
             shutil.rmtree(filepath)
 
+
+class BuildOptions:
+    def __init__(
+        self,
+        basepath="/",
+        jobs=1,
+        static_mode="copy",
+        profile=None,
+        slowest=10,
+        io_threads=0,
+        pretty_urls=True,
+        minify=False,
+        precompress=False,
+        fingerprint=False,
+        image_widths=(),
+        listings=False,
+        page_size=PAGE_SIZE,
+        search=False,
+        site_url=None,
+    ):
+        self.basepath = basepath  # Prefix the site is served under
+        self.jobs = jobs  # Number of processes to render pages with
+        self.static_mode = static_mode  # How static files are put into docs, one of staticsync.SYNC_MODES
+        self.profile = profile  # Directory to write a build profile into, or None to not profile
+        self.slowest = slowest  # Number of slowest pages the profile lists
+        self.io_threads = io_threads  # Threads per I/O stage of a pipelined build, 0 to not pipeline
+        self.pretty_urls = pretty_urls  # Write foo.md to foo/index.html rather than foo.html
+        self.minify = minify  # Collapse the whitespace in HTML and CSS outputs
+        self.precompress = precompress  # Write .gz (and .br) siblings next to text outputs
+        self.fingerprint = fingerprint  # Copy assets under content-hashed names and link pages to those
+        self.image_widths = image_widths  # Widths to make resized derivatives of images at, none to not resize
+        self.listings = listings  # Generate paginated list pages for sections, tags and years
+        self.page_size = page_size  # Pages listed on each list page
+        self.search = search  # Write a full-text search index into docs/search
+        self.site_url = site_url  # Scheme and host the site is served from; with one, sitemaps, feeds and robots.txt are written
+
+    @classmethod
+    def from_args(cls, args):
+        """Picks the build options out of parsed cli arguments"""
+        return cls(**{name: getattr(args, name) for name in vars(cls())})
+
+
+class BuildState:
+    def __init__(
+        self, manifest, index, link_graph, assets=None, images=None, templates=None
+    ):
+        self.manifest = manifest  # BuildManifest of the build
+        self.index = index  # PageIndex of the content directory
+        self.link_graph = link_graph  # LinkGraph of every page and template
+        self.assets = assets  # AssetMap of the fingerprinted assets, with --fingerprint
+        self.images = images  # Size and derivatives of every image keyed by url, when images are resized
+        self.templates = templates or {}  # Compiled Template of every page, keyed by path
+
+    def includes(self):
+        """Returns the sorted paths of every partial the templates include"""
+        return sorted(
+            {path for template in self.templates.values() for path in template.includes}
+        )
+
+
+def build(options, manifest=None):
+    """Brings docs up to date with content, static and the template, rebuilding only what changed since the build described by manifest (loaded from disk if not given). Returns the BuildState of this build, which rebuild() can start from"""
+    # With --profile every phase of the build is timed; otherwise phases cost nothing
+    profiler = Profiler() if options.profile else None
+
+    def phase(name):
+        return profiler.phase(name) if profiler is not None else nullcontext()
+
+    with phase("clean"):
+        # The manifest remembers what the last build produced so that only changed files are rebuilt
+        if manifest is None:
+            manifest = BuildManifest.load(MANIFEST_PATH)
+        link_graph = LinkGraph.load(LINK_GRAPH_PATH)
+        assets = AssetMap(ASSET_MAP_PATH) if options.fingerprint else None
+        # Without a previous build to compare against, start from a clean docs folder
+        if manifest.is_empty():
+            clean_docs()
+
     # Copies all of the static data into docs
-    copy_static(
-        "static",
-        "docs",
+    with phase("copy_static"):
+        report = copy_static(
+            "static",
+            "docs",
+            manifest,
+            options.static_mode,
+            settings={"minify": options.minify},
+            assets=assets,
+        )
+    logger.info("Static files: %s", report)
+
+    # Resizes images for smaller screens, re-encoding only images (or settings) that weren't resized before
+    image_widths = list(options.image_widths)
+    images = None
+    if image_widths and not imagevariants.available():
+        logger.warning("Pillow is not installed, so images will not be resized")
+        image_widths = []
+    if image_widths:
+        with phase("images"):
+            images, resized = generate_image_variants(
+                "static",
+                "docs",
+                manifest,
+                ImageCache(IMAGE_CACHE_PATH, image_widths),
+                options.jobs,
+                options.static_mode,
+                assets,
+            )
+        logger.info("Images: resized %d, reused %d", resized, len(images) - resized)
+
+    # Indexes every page of the content directory in one walk; later stages work from the index instead of walking it again. Only headers that changed are read
+    with phase("index"):
+        header_cache = HeaderCache.load(HEADER_CACHE_PATH)
+        index = PageIndex.scan(
+            "content", "docs", options.pretty_urls, cache=header_cache
+        )
+        header_cache.save()
+    logger.info("Indexed %d pages", len(index))
+
+    # Generates pages for each file in the content directory and writes them into docs, reusing parsed documents whose markdown hasn't changed
+    with phase("pages"):
+        ast_cache = AstCache(AST_CACHE_PATH, AST_CACHE_MAX_BYTES)
+        state = BuildState(manifest, index, link_graph, assets, images)
+        state.templates = generate_pages_recursive(
+            options, state, ast_cache=ast_cache, profiler=profiler
+        )
+        # Forgets the least recently used parsed documents once the cache grows too big
+        ast_cache.prune()
+
+    # List pages, the search index, sitemaps and feeds, then minifying and precompressing
+    generate_derived_outputs(options, index, manifest, ast_cache, assets, phase)
+
+    # Deletes anything the last build produced whose source no longer exists
+    with phase("finish"):
+        manifest.remove_orphans("docs")
+        manifest.save()
+        if assets is not None:
+            assets.save()
+
+    # Checks the internal links and images of the pages that were rendered, and of those linking to outputs that were added or removed, against the pages and the files in docs
+    with phase("links"):
+        broken = link_graph.check(index, "docs", manifest.changed_outputs())
+        link_graph.save()
+    for link in broken:
+        logger.warning("%s", link)
+
+    if profiler is not None:
+        print(profiler.report(options.slowest))
+        paths = profiler.save(options.profile, options.slowest)
+        print(f"Profile written to {paths[0]}, Chrome trace to {paths[1]}")
+    return state
+
+
+def rebuild(options, state, changed):
+    """Brings docs up to date after the files at the paths in changed were edited, starting from the BuildState of the last build instead of walking content and static again. The pages among them are rendered again, along with the pages the last build recorded as depending on them (through their template, its partials or the static files they link to); changed static files are copied, and the outputs made from the index are brought up to date. Only the links of the rendered pages are checked, and the AstCache isn't pruned. Returns the BuildState of the rebuild, or None if it takes a full build(): when a file was added or deleted, or a static file changed that is fingerprinted or resized"""
+    manifest = state.manifest.successor()
+    index = state.index
+    static_prefix = os.path.join("static", "")
+    pages = set()  # Sources of the pages to render again
+    static = []  # Static files to copy again
+    for path in sorted(changed):
+        # A file the last build didn't use may be a new page, template or static file
+        if not os.path.isfile(path) or path not in manifest.previous:
+            return None
+        if path in index.by_source:
+            pages.add(path)
+        elif path.startswith(static_prefix):
+            if state.assets is not None or (
+                state.images is not None
+                and path.lower().endswith(RESIZABLE_EXTENSIONS)
+            ):
+                return None
+            static.append(path)
+        pages.update(manifest.dependents(path))
+
+    # The front matter of the pages that changed is read again, so that the outputs made from the index see it
+    for path in changed:
+        page = index.by_source.get(path)
+        if page is not None:
+            stat = os.stat(path)
+            page.metadata, page.title = read_metadata(path)
+            page.mtime_ns, page.size = stat.st_mtime_ns, stat.st_size
+
+    # Everything else is as the last build left it
+    manifest.carry_over(skip=pages.union(changed))
+    for path in static:
+        mirror = os.path.join("docs", os.path.relpath(path, "static"))
+        if not manifest.unchanged(path, mirror, minify=options.minify):
+            sync_file(path, mirror, options.static_mode)
+
+    ast_cache = AstCache(AST_CACHE_PATH, AST_CACHE_MAX_BYTES)
+    # Templates of pages that weren't rendered are as the last build compiled them
+    rebuilt = BuildState(
+        manifest,
+        index,
+        state.link_graph,
+        state.assets,
+        state.images,
+        dict(state.templates),
+    )
+    rebuilt.templates.update(
+        generate_pages_recursive(options, rebuilt, ast_cache=ast_cache, sources=pages)
     )
+    generate_derived_outputs(options, index, manifest, ast_cache, state.assets)
+
+    # Only list pages can have gone away
+    manifest.remove_orphans("docs")
+    manifest.save()
+    broken = state.link_graph.check(index, "docs", manifest.changed_outputs())
+    state.link_graph.save()
+    for link in broken:
+        logger.warning("%s", link)
+    return rebuilt
+
+
+def main(basepath="/", **options):
+    build(BuildOptions(basepath, **options))
 
-    # Generates pages for each file in the content directory and writes them into docs
-    generate_pages_recursive(
-        dir_path="content",
-        template_path="template.html",
-        dest_dir_path="docs",
-        basepath=basepath,
+
+def parse_args(argv):
+    """Reads the build options from the cli. The basepath defaults to "/" if none is provided"""
+    parser = argparse.ArgumentParser(description="Builds the site in docs/")
+    parser.add_argument("basepath", nargs="?", default="/")
+    add_build_arguments(parser)
+    return parser.parse_args(argv)
+
+
+def add_build_arguments(parser):
+    """Adds the build options shared by every command. A --jobs of 0 is turned into the number of cores"""
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=lambda value: int(value) or os.cpu_count() or 1,
+        default=1,
+        help="number of processes to render pages with (0 uses every core)",
+    )
+    parser.add_argument(
+        "--io-threads",
+        type=int,
+        default=0,
+        metavar="N",
+        help="pipeline the build: read sources ahead and write pages behind on N threads each",
+    )
+    parser.add_argument(
+        "--no-pretty-urls",
+        dest="pretty_urls",
+        action="store_false",
+        help="write content/foo.md to docs/foo.html instead of docs/foo/index.html",
+    )
+    parser.add_argument(
+        "--listings",
+        action="store_true",
+        help="generate paginated list pages for sections, tags (/tags/) and years (/archive/)",
+    )
+    parser.add_argument(
+        "--page-size",
+        type=int,
+        default=PAGE_SIZE,
+        help="number of pages listed on each list page",
+    )
+    parser.add_argument(
+        "--search",
+        action="store_true",
+        help="write a sharded full-text search index into docs/search",
+    )
+    parser.add_argument(
+        "--site-url",
+        metavar="URL",
+        help="write sitemap.xml, feed.xml, rss.xml and robots.txt for a site served from URL",
+    )
+    parser.add_argument(
+        "--minify",
+        action="store_true",
+        help="collapse the whitespace in HTML and CSS outputs",
     )
+    parser.add_argument(
+        "--precompress",
+        action="store_true",
+        help="write .gz siblings (and .br ones if brotli is installed) next to text outputs",
+    )
+    parser.add_argument(
+        "--fingerprint",
+        action="store_true",
+        help="also copy assets as name.<hash>.ext and link pages to those copies",
+    )
+    parser.add_argument(
+        "--image-widths",
+        type=lambda value: [int(width) for width in value.split(",") if width],
+        default=(),
+        metavar="W,W,...",
+        help="make resized copies of images at these widths and list them in srcset (needs Pillow)",
+    )
+    parser.add_argument(
+        "--static-mode",
+        choices=SYNC_MODES,
+        default="copy",
+        help="how to put static files into docs (hardlink and reflink fall back to copy)",
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const=PROFILE_PATH,
+        metavar="DIR",
+        help=f"time every phase of the build and write it to DIR ({PROFILE_PATH})",
+    )
+    parser.add_argument(
+        "--slowest",
+        type=int,
+        default=10,
+        help="number of slowest pages to list in the profile",
+    )
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        action="count",
+        default=0,
+        help="log every page (-v) or everything (-vv)",
+    )
+
+
+def configure_logging(verbosity):
+    """Only warnings and errors are logged unless -v asks for more"""
+    level = [logging.WARNING, logging.INFO, logging.DEBUG][min(verbosity, 2)]
+    logging.basicConfig(level=level, format="%(message)s")
+
 
+if __name__ == "__main__":
+    # "serve" runs the development server instead of a one-off build
+    if sys.argv[1:2] == ["serve"]:
+        import server
 
-# Tries to take an argument from the cli, defaults to "/" if none is provided
-try:
-    basepath = sys.argv[1]
-except IndexError:
-    basepath = "/"
-main(basepath)
+        server.main(sys.argv[2:])
+    else:
+        args = parse_args(sys.argv[1:])
+        configure_logging(args.verbose)
+        build(BuildOptions.from_args(args))
@@ -0,0 +1,176 @@
+import hashlib
+import os
+
+from cachefile import load_versioned, save_versioned
+
+# Bump along with the formats of the other files in .ssg-cache that only pages rendered again fill in, such as the link graph, so the next build renders everything
+MANIFEST_VERSION = 2
+
+
+def entry_outputs(entry):
+    """Returns the list of outputs an entry records: none, one, or several"""
+    output = entry["output"]
+    if output is None:
+        return []
+    return output if isinstance(output, list) else [output]
+
+
+def hash_file(path):
+    """Returns the sha256 hex digest of a file's contents, read in chunks so large static files are never held in memory whole."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class BuildManifest:
+    def __init__(self, path, entries=None):
+        self.path = path  # Where the manifest is persisted between builds
+        self.previous = entries or {}  # Entries recorded by the last build, keyed by source path
+        self.current = {}  # Entries recorded by this build, keyed by source path
+
+    @classmethod
+    def load(cls, path):
+        """Reads a manifest from disk. A missing, unreadable or outdated manifest yields an empty one, which forces a full build."""
+        data = load_versioned(path, MANIFEST_VERSION)
+        if data is None:
+            return cls(path)
+        return cls(path, data.get("entries", {}))
+
+    def save(self):
+        """Writes this build's entries to disk, replacing the previous manifest atomically."""
+        save_versioned(self.path, MANIFEST_VERSION, {"entries": self.current})
+
+    def successor(self):
+        """Returns a manifest for the next build, which compares against what this build recorded. Lets a long-running process rebuild without reloading the manifest from disk."""
+        return BuildManifest(self.path, self.current)
+
+    def carry_over(self, skip=()):
+        """Records the entries the last build made for its source files again, as they were, for a build that only looks at the files it knows changed. Sources in skip are left to be recorded afresh, as are outputs the last build post-processed and outputs that aren't made from a source file of their own, which have to be generated again."""
+        outputs = self.previous_outputs()
+        for source, entry in self.previous.items():
+            if entry["hash"] is None or source in skip or source in outputs:
+                continue
+            # A copy, so that recording the source again can't change what the last build recorded
+            self.current[source] = dict(entry)
+
+    def is_empty(self):
+        """True when there is no previous build to compare against."""
+        return not self.previous
+
+    def fingerprint(self, source, stat=None):
+        """Returns the content hash of source. The file is only re-hashed when its size or mtime differs from what the last build saw, so unchanged files cost one stat(), or none if the caller already has one."""
+        if source in self.current:
+            return self.current[source]["hash"]
+        if stat is None:
+            stat = os.stat(source)
+        old = self.previous.get(source)
+        if (
+            old
+            and old["mtime_ns"] == stat.st_mtime_ns
+            and old["size"] == stat.st_size
+        ):
+            digest = old["hash"]
+        else:
+            digest = hash_file(source)
+        self.current[source] = {
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "hash": digest,
+            "output": None,
+            "deps": {},
+        }
+        return digest
+
+    def record(self, source, output, stat=None, **deps):
+        """Records that source produces output (a path, or a list of paths) given deps (the hashes of its other inputs, basepath, ...) and returns its content hash."""
+        digest = self.fingerprint(source, stat)
+        entry = self.current[source]
+        entry["output"] = output
+        entry["deps"] = deps
+        return digest
+
+    def unchanged(self, source, output, stat=None, **deps):
+        """Records that source produces output given deps like record() does, and returns True if the last build recorded exactly the same thing and the output still exists."""
+        digest = self.record(source, output, stat, **deps)
+        old = self.previous.get(source)
+        return (
+            old is not None
+            and old["hash"] == digest
+            and old["output"] == output
+            and old["deps"] == deps
+            and all(map(os.path.exists, entry_outputs(self.current[source])))
+        )
+
+    def generated(self, key, output, **deps):
+        """Records an output that isn't made from a source file of its own, such as a list page, under key. deps must describe everything the output is made from. Returns True if the last build recorded exactly the same output and deps under key and the output still exists."""
+        self.current[key] = {
+            "mtime_ns": None,
+            "size": None,
+            "hash": None,
+            "output": output,
+            "deps": deps,
+        }
+        old = self.previous.get(key)
+        return (
+            old is not None
+            and old["output"] == output
+            and old["deps"] == deps
+            and os.path.exists(output)
+        )
+
+    def refresh(self, source):
+        """Fingerprints source again after this build rewrote it, keeping the output and deps recorded for it."""
+        entry = self.current.pop(source)
+        self.fingerprint(source)
+        self.current[source]["output"] = entry["output"]
+        self.current[source]["deps"] = entry["deps"]
+
+    def outputs(self):
+        """Returns every output recorded by this build so far."""
+        return sorted(
+            output for entry in self.current.values() for output in entry_outputs(entry)
+        )
+
+    def previous_outputs(self):
+        """Returns every output produced by the last build."""
+        return {
+            output
+            for entry in self.previous.values()
+            for output in entry_outputs(entry)
+        }
+
+    def changed_outputs(self):
+        """Returns the outputs that this build produced and the last one didn't, and those the last build produced and this one doesn't, such as pages that were added or deleted."""
+        return sorted(self.previous_outputs().symmetric_difference(self.outputs()))
+
+    def dependents(self, path):
+        """Returns the sorted sources that the last build recorded as depending on the file at path through their "inputs" dep."""
+        return sorted(
+            source
+            for source, entry in self.previous.items()
+            if path in entry["deps"].get("inputs", ())
+        )
+
+    def orphans(self):
+        """Returns outputs produced by the last build that nothing in this build produces anymore."""
+        return sorted(self.previous_outputs().difference(self.outputs()))
+
+    def remove_orphans(self, root):
+        """Deletes orphaned outputs, then any directories under root that were left empty by doing so."""
+        removed = []
+        for output in self.orphans():
+            if os.path.isfile(output):
+                os.remove(output)
+                removed.append(output)
+            # Walk back up towards root, removing directories that are now empty
+            parent = os.path.dirname(output)
+            while (
+                os.path.abspath(parent) != os.path.abspath(root)
+                and os.path.isdir(parent)
+                and not os.listdir(parent)
+            ):
+                os.rmdir(parent)
+                parent = os.path.dirname(parent)
+        return removed
@@ -3,6 +3,14 @@ from parentnode import ParentNode
 from textnode import TextType, TextNode, text_node_to_html_node
 from enum import Enum
 
+# Bump whenever a change to the parser changes the trees it produces, so that cached trees are thrown away
+PARSER_VERSION = 1
+
+# Compiled once at import rather than looked up in re's cache on every call. Images and links capture (alt or anchor text, url)
+IMAGE_PATTERN = re.compile(r"!\[([^\[\]]*)\]\(([^\(\)]*)\)")
+LINK_PATTERN = re.compile(r"(?<!!)\[([^\[\]]*)\]\(([^\(\)]*)\)")
+HEADING_PATTERN = re.compile(r"#+ ")  # The hashtags and space a heading starts with
+
 
 def split_nodes_delimiter(old_nodes, delimiter, text_type):
     """Formats each TextNode object in a list (old_nodes) based on their delimeter and text type. Returns a list of TextNode objects with an altered self.text_type attribute where appropriate"""
@@ -66,26 +74,26 @@ def split_nodes_delimiter(old_nodes, delimiter, text_type):
     return new_nodes
 
 
+def find_markdown_images(text):
+    """Returns a match for every markdown image '![{any text}]({any text})' in text, found in a single scan. Each match holds the span of the whole image and (alt text, URL) as its groups"""
+    return list(IMAGE_PATTERN.finditer(text))
+
+
+def find_markdown_links(text):
+    """Returns a match for every markdown link '[{any text}]({any text})' in text that isn't an image, found in a single scan. Each match holds the span of the whole link and (anchor text, URL) as its groups"""
+    return list(LINK_PATTERN.finditer(text))
+
+
 def extract_markdown_images(text):
-    """Extracts anything that matches markdown image formatting '![{any text}]({any text})' is captured first as-is, then as a list of tuples containing the alt text and URL"""
-    full_image_md = re.findall(
-        r"(!\[[^\[\]]*\]\([^\(\)]*\))", text
-    )  # returns a list of untouched md
-    extracted = re.findall(
-        r"!\[([^\[\]]*)\]\(([^\(\)]*)\)", text
-    )  # returns a list of tuples
-    return extracted, full_image_md
+    """Extracts anything that matches markdown image formatting '![{any text}]({any text})' as a list of tuples containing the alt text and URL, along with a list of the matches as-is"""
+    matches = find_markdown_images(text)
+    return [match.groups() for match in matches], [match[0] for match in matches]
 
 
 def extract_markdown_links(text):
-    """Extracts anything that matches markdown link formatting '[{any text}]({any text})' is captured first as-is, then as a list of tuples containing the anchor text and URL"""
-    full_link_md = re.findall(
-        r"((?<!!)\[[^\[\]]*\]\([^\(\)]*\))", text
-    )  # returns a list of untouched md
-    extracted = re.findall(
-        r"(?<!!)\[([^\[\]]*)\]\(([^\(\)]*)\)", text
-    )  # returns a list of tuples
-    return extracted, full_link_md
+    """Extracts anything that matches markdown link formatting '[{any text}]({any text})' as a list of tuples containing the anchor text and URL, along with a list of the matches as-is"""
+    matches = find_markdown_links(text)
+    return [match.groups() for match in matches], [match[0] for match in matches]
 
 
 def split_nodes_image(old_nodes):
@@ -208,25 +216,131 @@ def split_nodes_link(old_nodes):
     return new_nodes
 
 
+# The inline delimiters in the order they take priority. Each one is only looked for in the plain text left over by the ones before it
+INLINE_DELIMITERS = (
+    ("**", TextType.BOLD),
+    ("_", TextType.ITALIC),
+    ("`", TextType.CODE),
+)
+
+
+def delimited_spans(text, start, end, delimiter):
+    """Yields (start, end, is_delimited) for the stretches of text[start:end], pairing each delimiter with the next one like split_nodes_delimiter does. An unpaired final delimiter is left in the plain text."""
+    size = len(delimiter)
+    position = start
+    opening = text.find(delimiter, position, end)
+    while opening != -1:
+        closing = text.find(delimiter, opening + size, end)
+        if closing == -1:
+            break
+        following = text.find(delimiter, closing + size, end)
+        # When the last pair is all that's left and the text ends with a delimiter, split_nodes_delimiter closes the pair at the very end (this only differs for runs like "*****")
+        if (
+            following == -1
+            and opening != position
+            and text.endswith(delimiter, position, end)
+        ):
+            closing = end - size
+        yield position, opening, False
+        yield opening + size, closing, True
+        position = closing + size
+        opening = following
+    yield position, end, False
+
+
+def append_links(nodes, text, start, end):
+    """Appends the links in text[start:end] and the plain text around them to nodes"""
+    position = start
+    for match in LINK_PATTERN.finditer(text, start, end):
+        if match.start() > position:
+            nodes.append(TextNode(text[position : match.start()], TextType.TEXT))
+        if match[1]:
+            nodes.append(TextNode(match[1], TextType.LINKS, match[2]))
+        position = match.end()
+    if end > position:
+        nodes.append(TextNode(text[position:end], TextType.TEXT))
+
+
+def append_images_and_links(nodes, text, start, end):
+    """Appends the images in text[start:end] to nodes, and whatever links are in the text between them"""
+    position = start
+    for match in IMAGE_PATTERN.finditer(text, start, end):
+        append_links(nodes, text, position, match.start())
+        # Like every other empty node, an image without alt text is dropped
+        if match[1]:
+            nodes.append(TextNode(match[1], TextType.IMAGES, match[2]))
+        position = match.end()
+    append_links(nodes, text, position, end)
+
+
 def text_to_textnodes(text):
-    """Calls split_nodes_delimiter for each of the inline text types, followed by split_nodes_image and split_nodes_link, then cleans out any TextNodes with an empty .text attribute"""
-    node = TextNode(text, TextType.TEXT)
-    bold_formatted = split_nodes_delimiter([node], "**", TextType.BOLD)
-    italic_formatted = split_nodes_delimiter(bold_formatted, "_", TextType.ITALIC)
-    code_formatted = split_nodes_delimiter(italic_formatted, "`", TextType.CODE)
-    image_formatted = split_nodes_image(code_formatted)
-    link_formatted = split_nodes_link(image_formatted)
-    return [node for node in link_formatted if len(node.text) > 0]
+    """Scans the text once from left to right and returns the same TextNodes as running split_nodes_delimiter for each of the inline text types, followed by split_nodes_image and split_nodes_link, without any empty TextNodes. Works on offsets into the original string instead of recursing on copies of it, so it runs in linear time"""
+    nodes = []
+    (bold, bold_type), (italic, italic_type), (code, code_type) = INLINE_DELIMITERS
+    for start, end, is_bold in delimited_spans(text, 0, len(text), bold):
+        if is_bold:
+            if end > start:
+                nodes.append(TextNode(text[start:end], bold_type))
+            continue
+        for start, end, is_italic in delimited_spans(text, start, end, italic):
+            if is_italic:
+                if end > start:
+                    nodes.append(TextNode(text[start:end], italic_type))
+                continue
+            for start, end, is_code in delimited_spans(text, start, end, code):
+                if is_code:
+                    if end > start:
+                        nodes.append(TextNode(text[start:end], code_type))
+                    continue
+                append_images_and_links(nodes, text, start, end)
+    return nodes
 
 
 def markdown_to_blocks(markdown):
     """Splits a string of markdown formatted text (the whole document) into blocks of text. Cleans out any whitespace and trailing new lines, as well as any blocks with no text in them"""
-    formatted_blocks = []
-    blocks = markdown.split("\n\n")
-    for block in blocks:
-        format = block.strip()
-        formatted_blocks.append(format.strip("\n"))
-    return [block for block in formatted_blocks if len(block) > 0]
+    return list(iter_blocks(markdown))
+
+
+def iter_blocks(markdown):
+    """Yields the blocks of a document one at a time, the same ones markdown_to_blocks() returns. Works on offsets into the document, so the only copies made are of each block's own text"""
+    position = 0
+    while True:
+        separator = markdown.find("\n\n", position)
+        end = separator if separator != -1 else len(markdown)
+        block = markdown[position:end].strip()
+        if block:
+            yield block
+        if separator == -1:
+            return
+        position = separator + 2
+
+
+def read_blocks(fp, chunk_size=1 << 20):
+    """Yields the blocks of a markdown file object like iter_blocks() does for a string, reading chunk_size characters at a time. Only the current chunk and the block being read are held in memory, however big the file"""
+    parts = []  # The pieces of the block being read, which can span several chunks
+    for chunk in iter(lambda: fp.read(chunk_size), ""):
+        position = 0
+        # A blank line can be split across two chunks
+        if parts and parts[-1].endswith("\n") and chunk.startswith("\n"):
+            parts[-1] = parts[-1][:-1]
+            block = "".join(parts).strip()
+            parts = []
+            if block:
+                yield block
+            position = 1
+        separator = chunk.find("\n\n", position)
+        while separator != -1:
+            parts.append(chunk[position:separator])
+            block = "".join(parts).strip()
+            parts = []
+            if block:
+                yield block
+            position = separator + 2
+            separator = chunk.find("\n\n", position)
+        parts.append(chunk[position:])
+    block = "".join(parts).strip()
+    if block:
+        yield block
 
 
 class BlockType(Enum):
@@ -238,48 +352,40 @@ class BlockType(Enum):
     ORDERED_LIST = "ol"
 
 
-def block_to_block_type(block):
-    """Assigns a BlockType to each block for easier handling later."""
-    # If the block starts with six or fewer # symbols followed by a space, it is a heading
-    if block.startswith("#"):
-        num_hashtags = re.findall(r"(^\#+ )", block)
-        if len(num_hashtags[0]) < 7:
-            return BlockType.HEADING
-
-    # If the block starts and ends with three graves, it is a code block
-    if block.startswith("```") and block.endswith("```"):
-        return BlockType.CODE
-
-    # If each line in the block starts with a ">", it is a quote
-    if block.startswith(">"):
-        lines = block.splitlines()
-        count = 0
-        for line in lines:
-            if line.startswith(">"):
-                count += 1
-        if count == len(lines):
-            return BlockType.QUOTE
-
-    # If each line of the block starts with a hyphen followed by a space, it is an unordered list
-    if block.startswith("- "):
-        lines = block.splitlines()
-        count = 0
-        for line in lines:
-            if line.startswith("- "):
-                count += 1
-        if count == len(lines):
-            return BlockType.UNORDERED_LIST
-
-    # If each line of the block starts with a number followed by a period and a space, and if that number increases by one for each subsequent line in the block, then the block is an ordered list
-    if block[0].isdigit():
-        last_number = int(block[0]) - 1
-        lines = block.splitlines()
-        for line in lines:
-            if int(line[0]) == last_number + 1 and line[1:3] == ". ":
-                return BlockType.ORDERED_LIST
-
-    # If the block isn't any of the other types, it is a paragraph
-    return BlockType.PARAGRAPH
+def is_heading(block):
+    """If the block starts with six or fewer # symbols followed by a space, it is a heading"""
+    hashtags = HEADING_PATTERN.match(block)
+    return hashtags is not None and len(hashtags[0]) < 7
+
+
+def is_code_block(block):
+    """If the block starts and ends with three graves, it is a code block"""
+    return block.startswith("```") and block.endswith("```")
+
+
+def is_quote(block):
+    """If each line in the block starts with a ">", it is a quote"""
+    for line in block.splitlines():
+        if not line.startswith(">"):
+            return False
+    return True
+
+
+def is_unordered_list(block):
+    """If each line of the block starts with a hyphen followed by a space, it is an unordered list"""
+    for line in block.splitlines():
+        if not line.startswith("- "):
+            return False
+    return True
+
+
+def is_ordered_list(block):
+    """If a line of the block starts with the same number as the first one, followed by a period and a space, then the block is an ordered list"""
+    number = int(block[0])
+    for line in block.splitlines():
+        if int(line[0]) == number and line[1:3] == ". ":
+            return True
+    return False
 
 
 def text_to_children(block):
@@ -294,9 +400,9 @@ def text_to_children(block):
 
 def heading_block_to_html_node(block):
     """Counts the number of hashtags that the heading block starts with to create a tag, then strips the hashtags and converts the cleaned text into child LeafNodes, and finally creates a ParentNode for the heading block, using the created tag"""
-    hashtags = re.findall(r"(^\#+ )", block)
-    tag = f"h{len(hashtags[0]) - 1}"
-    text = block.strip(hashtags[0])
+    hashtags = HEADING_PATTERN.match(block)[0]
+    tag = f"h{len(hashtags) - 1}"
+    text = block.strip(hashtags)
     children = text_to_children(text)
     return ParentNode(tag=tag, children=children)
 
@@ -347,30 +453,87 @@ def paragraph_block_to_html_node(block):
     return ParentNode(tag="p", children=children)
 
 
+class BlockParser:
+    __slots__ = ("block_type", "matches", "to_html_node")
+
+    def __init__(self, block_type, matches, to_html_node):
+        self.block_type = block_type  # What block_to_block_type() returns for the blocks it parses: a BlockType, or any other value for block types added by extensions
+        self.matches = matches  # Tells whether the parser handles a block that starts with one of its triggers
+        self.to_html_node = to_html_node  # Converts a block it handles into an HTMLNode
+
+    def __repr__(self):
+        return f"BlockParser({self.block_type}, {self.to_html_node.__qualname__})"
+
+
+# The parsers a block is tried against, keyed by the first character that can start their blocks, in the order they are tried. Blocks no parser matches are paragraphs
+BLOCK_PARSERS = {}
+PARAGRAPH_PARSER = BlockParser(BlockType.PARAGRAPH, None, paragraph_block_to_html_node)
+
+
+def register_block_parser(triggers, block_type, matches, to_html_node, first=False):
+    """Adds a block type to the parser without editing it: blocks whose first character is one of triggers are handed to matches(block), and converted with to_html_node(block) if it returns True. The parser is tried after those already registered for the same character, or before them with first, which lets an extension take over some of the blocks of a built-in type. Returns the BlockParser"""
+    parser = BlockParser(block_type, matches, to_html_node)
+    for trigger in triggers:
+        parsers = BLOCK_PARSERS.get(trigger, [])
+        # A new list rather than an append, so a registry copied before (as tests do) is left as it was
+        BLOCK_PARSERS[trigger] = [parser] + parsers if first else parsers + [parser]
+    return parser
+
+
+def block_parsers_signature():
+    """Returns a string naming every registered parser in the order it is tried, which changes whenever an extension registers one, so trees parsed without it aren't reused (see AstCache.key())"""
+    return ",".join(
+        f"{trigger}{parser.to_html_node.__module__}.{parser.to_html_node.__qualname__}"
+        for trigger, parsers in sorted(BLOCK_PARSERS.items())
+        for parser in parsers
+    )
+
+
+register_block_parser("#", BlockType.HEADING, is_heading, heading_block_to_html_node)
+register_block_parser("`", BlockType.CODE, is_code_block, code_block_to_html_node)
+register_block_parser(">", BlockType.QUOTE, is_quote, quote_block_to_html_node)
+register_block_parser(
+    "-", BlockType.UNORDERED_LIST, is_unordered_list, unordered_list_to_html_node
+)
+register_block_parser(
+    "0123456789", BlockType.ORDERED_LIST, is_ordered_list, ordered_list_to_html_node
+)
+
+
+def find_block_parser(block):
+    """Returns the BlockParser that handles a block. Only the parsers registered for its first character are tried, so most blocks are settled by a single dict lookup"""
+    for parser in BLOCK_PARSERS.get(block[0], ()):
+        if parser.matches(block):
+            return parser
+    return PARAGRAPH_PARSER
+
+
+def block_to_block_type(block):
+    """Assigns a BlockType to each block for easier handling later"""
+    return find_block_parser(block).block_type
+
+
+def block_to_html_node(block):
+    """Converts a single block into a ParentNode with the parser of its block type"""
+    return find_block_parser(block).to_html_node(block)
+
+
 def markdown_to_html_node(markdown):
-    """Loops through each block of a markdown formatted document and converts each block into an ParentNode, then creates a final ParentNode for the document tagged as 'div'"""
-    blocks = markdown_to_blocks(markdown)
-    children = []
-    for block in blocks:
-        block_type = block_to_block_type(block)
-        if block_type == BlockType.HEADING:
-            children.append(heading_block_to_html_node(block))
-        if block_type == BlockType.CODE:
-            children.append(code_block_to_html_node(block))
-        if block_type == BlockType.QUOTE:
-            children.append(quote_block_to_html_node(block))
-        if block_type == BlockType.UNORDERED_LIST:
-            children.append(unordered_list_to_html_node(block))
-        if block_type == BlockType.ORDERED_LIST:
-            children.append(ordered_list_to_html_node(block))
-        if block_type == BlockType.PARAGRAPH:
-            children.append(paragraph_block_to_html_node(block))
+    """Loops through each block of a markdown formatted document as it is split off and converts each block into an ParentNode, then creates a final ParentNode for the document tagged as 'div'"""
+    children = [block_to_html_node(block) for block in iter_blocks(markdown)]
     return ParentNode(tag="div", children=children)
 
 
+def blocks_to_html_node(blocks):
+    """Returns the 'div' ParentNode of a document whose blocks are only converted as the node is rendered. Given a generator such as read_blocks(), just one block's nodes exist at a time, at the price of the node being renderable only once"""
+    return ParentNode(tag="div", children=map(block_to_html_node, blocks))
+
+
 def extract_title(markdown):
     """Ensures that the document starts with a tilte header and extracts its text"""
     if not markdown.startswith("# "):
         raise Exception("Document must start with an h1 header")
-    lines = markdown.splitlines()
-    return lines[0].strip("# ")
+    # Only the first line is needed, so the rest of the document isn't split up
+    end = markdown.find("\n")
+    first_line = markdown if end == -1 else markdown[:end]
+    return first_line.rstrip("\r").strip("# ")
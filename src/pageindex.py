@@ -0,0 +1,222 @@
+import datetime
+import logging
+import os
+
+import frontmatter
+from cachefile import load_versioned, save_versioned
+from frontmatter import read_header
+
+TEMPLATE_NAME = "template.html"  # A template with this name in a content directory is used for the pages under it
+HEADER_CACHE_VERSION = 1
+# Front matter values JSON has no type for, stored as {tag: ISO string}
+DATE_TYPES = {
+    "$datetime": datetime.datetime,
+    "$date": datetime.date,
+    "$time": datetime.time,
+}
+
+logger = logging.getLogger(__name__)
+
+
+class Page:
+    __slots__ = ("source", "output", "url", "title", "mtime_ns", "size", "metadata")
+
+    def __init__(
+        self, source, output, url, title=None, mtime_ns=0, size=0, metadata=None
+    ):
+        self.source = source  # Path of the markdown file
+        self.output = output  # Path of the .html file it becomes
+        self.url = url  # Root-relative url the page is served at, always ending in "/" for pretty urls
+        self.title = title  # The front matter's title, or the text of the document's "# " heading, if it has either
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.metadata = metadata or {}  # The document's front matter (date, tags, draft, ...)
+
+    def __repr__(self):
+        return f"Page({self.source}, {self.output}, {self.url}, {self.title})"
+
+
+def read_metadata(path):
+    """Returns (front matter, title) of a markdown file from its header alone; the body is never read. The title is None if neither the front matter nor a "# " heading at the start of the body gives one. Raises ValueError, naming the file, if the front matter is invalid"""
+    with open(path) as f:
+        try:
+            metadata, first_line = read_header(f)
+        except ValueError as e:
+            raise ValueError(f"{path}: {e}") from e
+    title = metadata.get("title")
+    if title is not None:
+        return metadata, str(title)
+    if not first_line.startswith("# "):
+        return metadata, None
+    return metadata, first_line.rstrip("\r\n").strip("# ")
+
+
+def encode_value(value):
+    """Turns a front matter value into something JSON stores without losing its type: dates and times become {tag: ISO string}. Raises TypeError for values that can't be stored that way"""
+    if value is None or isinstance(value, (str, bool, int, float)):
+        return value
+    if isinstance(value, list):
+        return [encode_value(item) for item in value]
+    if isinstance(value, dict):
+        if not all(isinstance(key, str) for key in value):
+            raise TypeError("front matter keys must be strings to be cached")
+        return {key: encode_value(item) for key, item in value.items()}
+    # datetime is a subclass of date, so it has to be looked for first
+    for tag, date_type in DATE_TYPES.items():
+        if isinstance(value, date_type):
+            return {tag: value.isoformat()}
+    raise TypeError(f"can't cache front matter value {value!r}")
+
+
+def decode_value(value):
+    """Undoes encode_value()"""
+    if isinstance(value, list):
+        return [decode_value(item) for item in value]
+    if isinstance(value, dict):
+        if len(value) == 1:
+            tag, text = next(iter(value.items()))
+            if tag in DATE_TYPES:
+                return DATE_TYPES[tag].fromisoformat(text)
+        return {key: decode_value(item) for key, item in value.items()}
+    return value
+
+
+class HeaderCache:
+    def __init__(self, path, headers=None):
+        self.path = path  # Where the headers are kept between builds
+        self.previous = headers or {}  # [mtime_ns, size, encoded front matter, title] of every page, keyed by source path, as the last build read them
+        self.current = {}  # The same for the pages indexed by this build
+
+    @classmethod
+    def load(cls, path):
+        """Reads the headers of the last build from disk. A missing, unreadable or outdated file, or one written with a different YAML parser than the one installed now, yields an empty cache, so every header is read again"""
+        data = load_versioned(path, HEADER_CACHE_VERSION)
+        if data is None or data.get("yaml") != (frontmatter.yaml is not None):
+            return cls(path)
+        return cls(path, data.get("headers", {}))
+
+    def save(self):
+        """Writes the headers of the pages indexed by this build to disk, unless they are the same as the last build's"""
+        if self.current == self.previous:
+            return
+        data = {"yaml": frontmatter.yaml is not None, "headers": self.current}
+        save_versioned(self.path, HEADER_CACHE_VERSION, data)
+
+    def read(self, path, stat):
+        """Returns (front matter, title) of a markdown file like read_metadata() does. The file is only read again when its size or mtime differs from what the last build saw, so unchanged files cost nothing beyond the stat() the caller already has"""
+        old = self.previous.get(path)
+        if old is not None and old[0] == stat.st_mtime_ns and old[1] == stat.st_size:
+            self.current[path] = old
+            return decode_value(old[2]), old[3]
+        metadata, title = read_metadata(path)
+        try:
+            encoded = encode_value(metadata)
+        except TypeError:
+            # Read again on every build rather than cached as something it isn't
+            return metadata, title
+        self.current[path] = [stat.st_mtime_ns, stat.st_size, encoded, title]
+        return metadata, title
+
+
+def output_path(relative_source, dest_dir_path, pretty_urls=True):
+    """Returns (output path, url) for a markdown file given relative to the content directory. index.md becomes its directory's index.html; foo.md becomes foo/index.html, or foo.html without pretty urls"""
+    stem = relative_source[: -len(".md")]
+    directory, name = os.path.split(stem)
+    if name == "index":
+        url_path = f"{directory}/" if directory else ""
+        return os.path.join(dest_dir_path, url_path, "index.html"), f"/{url_path}"
+    if pretty_urls:
+        return os.path.join(dest_dir_path, stem, "index.html"), f"/{stem}/"
+    return os.path.join(dest_dir_path, f"{stem}.html"), f"/{stem}.html"
+
+
+class PageIndex:
+    def __init__(self, pages, templates=None, root=None):
+        self.pages = pages  # Every Page, sorted by source path
+        self.templates = templates or {}  # {content directory: path of the TEMPLATE_NAME inside it}
+        self.root = root  # The content directory that was scanned
+        self.by_source = {page.source: page for page in pages}
+        self.by_url = {}
+        for page in pages:
+            # foo.md and foo/index.md both become foo/index.html, and one would overwrite the other
+            other = self.by_url.setdefault(page.url, page)
+            if other is not page:
+                raise ValueError(
+                    f"{other.source} and {page.source} would both be written to {page.output}"
+                )
+
+    @classmethod
+    def scan(cls, dir_path, dest_dir_path, pretty_urls=True, headers=True, cache=None):
+        """Walks the content directory once with os.scandir and returns the index of every .md file in it, noting the section templates it comes across. The front matter and title of each file are read from its header (see read_metadata()) unless headers is False, so listings never need to parse a page. With a HeaderCache, only the headers of files that changed since the last build are read. Every file with invalid front matter is logged before a ValueError is raised, as is one if two files would be written to the same output"""
+        pages = []
+        templates = {}
+        failures = []  # Files whose front matter couldn't be read
+        pending = [""]  # Directories still to walk, relative to dir_path
+        while pending:
+            relative_directory = pending.pop()
+            with os.scandir(os.path.join(dir_path, relative_directory)) as entries:
+                for entry in entries:
+                    relative = os.path.join(relative_directory, entry.name)
+                    if entry.is_dir():
+                        pending.append(relative)
+                    elif entry.name == TEMPLATE_NAME:
+                        templates[os.path.dirname(entry.path)] = entry.path
+                    elif entry.is_file() and entry.name.endswith(".md"):
+                        stat = entry.stat()
+                        output, url = output_path(relative, dest_dir_path, pretty_urls)
+                        try:
+                            if not headers:
+                                metadata, title = None, None
+                            elif cache is not None:
+                                metadata, title = cache.read(entry.path, stat)
+                            else:
+                                metadata, title = read_metadata(entry.path)
+                        except ValueError as e:
+                            logger.error("%s", e)
+                            failures.append(entry.path)
+                            continue
+                        pages.append(
+                            Page(
+                                entry.path,
+                                output,
+                                url,
+                                title,
+                                stat.st_mtime_ns,
+                                stat.st_size,
+                                metadata,
+                            )
+                        )
+        if failures:
+            raise ValueError(
+                f"{len(failures)} of {len(pages) + len(failures)} pages have invalid front matter"
+            )
+        pages.sort(key=lambda page: page.source)
+        return cls(pages, templates, dir_path)
+
+    def __len__(self):
+        return len(self.pages)
+
+    def __iter__(self):
+        return iter(self.pages)
+
+    def template_for(self, source, default):
+        """Returns the template of the page at source: the TEMPLATE_NAME closest to it in the content directories above it, or default if there is none"""
+        directory = os.path.dirname(source)
+        while directory:
+            template = self.templates.get(directory)
+            if template is not None:
+                return template
+            if directory == self.root:
+                break
+            directory = os.path.dirname(directory)
+        return default
+
+    def find(self, url):
+        """Returns the page served at a root-relative url, or None. "/blog/tom", "/blog/tom/" and "/blog/tom/index.html" all find the same page"""
+        url = url.split("#")[0].split("?")[0]
+        if url.endswith("/index.html"):
+            url = url[: -len("index.html")]
+        page = self.by_url.get(url)
+        if page is None and not url.endswith("/"):
+            page = self.by_url.get(f"{url}/")
+        return page
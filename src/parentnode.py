@@ -1,26 +1,53 @@
 from htmlnode import HTMLNode
 from leafnode import LeafNode
 
+_END = object()  # Returned by next() once a node's children run out; unlike None, it can't be a child itself
+
 
 class ParentNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self, tag=None, children=None, props=None):
-        super().__init__(tag, children, props)
-        self.tag = tag
-        self.children = children
-        self.props = props
-        self.value = None
-
-    def to_html(self):
-        """Returns a string of HTML formatted text for every child LeafNode."""
+        super().__init__(tag, None, children, props)
+
+    def check(self):
+        """Raises a ValueError if the node can't be rendered."""
         if self.tag is None:
             raise ValueError("tag cannot be None")
         if self.children is None:
             raise ValueError("children cannot be None")
 
-        return_str = ""
-        for child in self.children:
-            if isinstance(child, ParentNode):
-                return_str = return_str + child.to_html()
+    def to_html(self, resolve_url=None):
+        """Returns a string of HTML formatted text for every child LeafNode. resolve_url is handed down to every child."""
+        return "".join(self.iter_html(resolve_url))
+
+    def iter_html(self, resolve_url=None):
+        """Yields the HTML for this node and all of its descendants in document order, one tag or leaf at a time. Walks the tree with an explicit stack rather than recursing, so deep trees are fine and nothing is copied."""
+        self.check()
+        yield f"<{self.tag}>"
+        # Each open ParentNode keeps an iterator over its remaining children and its closing tag on the stack
+        stack = [(iter(self.children), f"</{self.tag}>")]
+        while stack:
+            children, closing_tag = stack[-1]
+            child = next(children, _END)
+            if child is _END:
+                stack.pop()
+                yield closing_tag
+            elif isinstance(child, ParentNode):
+                child.check()
+                yield f"<{child.tag}>"
+                stack.append((iter(child.children), f"</{child.tag}>"))
+            elif isinstance(child, LeafNode):
+                yield child.to_html(resolve_url)
+
+    def iter_leaves(self):
+        """Yields every LeafNode under this node in document order, walking the tree with a stack like iter_html() does. Children that are None are skipped."""
+        stack = [iter(self.children)]
+        while stack:
+            child = next(stack[-1], _END)
+            if child is _END:
+                stack.pop()
+            elif isinstance(child, ParentNode):
+                stack.append(iter(child.children))
             elif isinstance(child, LeafNode):
-                return_str = return_str + child.to_html()
-        return f"<{self.tag}>{return_str}</{self.tag}>"
+                yield child
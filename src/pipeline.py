@@ -0,0 +1,152 @@
+import logging
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from frontmatter import document_title, read_header, split_front_matter
+from linkgraph import LinkRecorder
+from md_to_html import blocks_to_html_node, markdown_to_html_node, read_blocks
+
+STREAMING_THRESHOLD = 16 * 1024 * 1024  # Sources bigger than this many bytes are rendered block by block rather than read whole
+
+logger = logging.getLogger(__name__)
+
+
+def read_source(path):
+    """Returns the markdown of a source, or None if it is too big to read whole and should be streamed with stream_page()"""
+    with open(path) as f:
+        if os.fstat(f.fileno()).st_size > STREAMING_THRESHOLD:
+            return None
+        return f.read()
+
+
+def stream_page(source, template, destination):
+    """Renders a page a block at a time: each block is read, parsed and written out before the next one is read, so memory is bounded by the largest block rather than the whole file. The tree is never complete, so it isn't cached. Returns the page's links"""
+    with open(source) as f:
+        # Only the header is read up front; the body is then read from where it starts
+        metadata, first_line = read_header(f)
+        title = document_title(metadata, first_line)
+        recorder = LinkRecorder(template.resolve_url)
+        with open(destination, "w") as d:
+            template.bind(recorder).write(
+                d, Title=title, Content=blocks_to_html_node(read_blocks(f))
+            )
+    return recorder.links
+
+
+def write_text(path, text):
+    """Writes a whole page with a single write call"""
+    with open(path, "w") as f:
+        f.write(text)
+
+
+def render_markdown(markdown, template, ast_cache=None):
+    """Returns the finished page for a document as one string, ready to be written in one go, along with its links"""
+    metadata, markdown = split_front_matter(markdown)
+    if ast_cache is not None:
+        md = ast_cache.parse(markdown)
+    else:
+        md = markdown_to_html_node(markdown)
+    recorder = LinkRecorder(template.resolve_url)
+    page = template.bind(recorder).render(
+        Title=document_title(metadata, markdown), Content=md
+    )
+    return page, recorder.links
+
+
+def render_pages_pipelined(
+    pages, template, jobs=1, ast_cache=None, io_threads=8, depth=32
+):
+    """Renders every (source, destination) pair like render_pages(), but as three overlapping stages: sources are read ahead on io_threads threads (except huge ones, which are streamed with stream_page()), pages are rendered (on a pool of jobs processes if more than one), and finished pages are written out on io_threads threads. No stage runs more than depth pages ahead of the next, which bounds memory. Every failing page is reported before the build is aborted. Returns the links of every page, keyed by source"""
+    failures = []
+    links = {}
+    pending = iter(pages)
+    reads = deque()  # (source, destination, future text) in page order
+    renders = deque()  # (source, destination, future page), only used with a process pool
+    writes = deque()  # (source, future)
+
+    def fail(source, e):
+        failures.append(source)
+        logger.error("Failed to generate page from %s: %r", source, e)
+
+    def prefetch():
+        """Keeps depth reads in flight"""
+        while len(reads) < depth:
+            page = next(pending, None)
+            if page is None:
+                return
+            source, destination = page
+            reads.append((source, destination, readers.submit(read_source, source)))
+
+    def write(source, destination, rendered):
+        page, links[source] = rendered
+        writes.append((source, writers.submit(write_text, destination, page)))
+        while len(writes) > depth:
+            finish(*writes.popleft())
+
+    def finish(source, future):
+        try:
+            future.result()
+        except Exception as e:
+            fail(source, e)
+
+    def finish_render():
+        source, destination, future = renders.popleft()
+        try:
+            rendered = future.result()
+        except Exception as e:
+            fail(source, e)
+            return
+        write(source, destination, rendered)
+
+    renderers = ProcessPoolExecutor(max_workers=jobs) if jobs > 1 else None
+    with ThreadPoolExecutor(io_threads) as readers, ThreadPoolExecutor(
+        io_threads
+    ) as writers:
+        try:
+            prefetch()
+            while reads:
+                source, destination, read = reads.popleft()
+                prefetch()
+                logger.info(
+                    "Generating page from %s to %s using %s",
+                    source,
+                    destination,
+                    template.path,
+                )
+                try:
+                    markdown = read.result()
+                except Exception as e:
+                    fail(source, e)
+                    continue
+                if markdown is None:
+                    # Sources too big to read whole are streamed straight through
+                    try:
+                        links[source] = stream_page(source, template, destination)
+                    except Exception as e:
+                        fail(source, e)
+                    continue
+                if renderers is not None:
+                    future = renderers.submit(
+                        render_markdown, markdown, template, ast_cache
+                    )
+                    renders.append((source, destination, future))
+                    while len(renders) > depth:
+                        finish_render()
+                    continue
+                try:
+                    rendered = render_markdown(markdown, template, ast_cache)
+                except Exception as e:
+                    fail(source, e)
+                    continue
+                write(source, destination, rendered)
+            while renders:
+                finish_render()
+            while writes:
+                finish(*writes.popleft())
+        finally:
+            if renderers is not None:
+                renderers.shutdown()
+    if failures:
+        raise RuntimeError(f"{len(failures)} of {len(pages)} pages failed to generate")
+    return links
@@ -0,0 +1,137 @@
+import gzip
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import brotli
+except ImportError:  # Optional; without it only .gz siblings are written
+    brotli = None
+
+# Outputs worth compressing; images and fonts are compressed already
+COMPRESSIBLE_EXTENSIONS = (".html", ".css", ".js", ".svg", ".xml", ".json", ".txt")
+MIN_COMPRESS_SIZE = 256  # Smaller files gain nothing from compression
+# Elements whose whitespace is significant, kept exactly as they are
+PRESERVED_HTML_PATTERN = re.compile(
+    r"(<(pre|textarea|script|style)\b.*?</\2\s*>)", re.DOTALL | re.IGNORECASE
+)
+HTML_COMMENT_PATTERN = re.compile(r"<!--(?!\[if).*?-->", re.DOTALL)
+WHITESPACE_PATTERN = re.compile(r"\s+")
+# Strings, which are kept as they are, comments, semicolons closing a block, and runs of whitespace
+CSS_TOKEN_PATTERN = re.compile(
+    r"""("(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')|(/\*.*?\*/)|(;(?=\s*\}))|(\s+)""",
+    re.DOTALL,
+)
+CSS_TIGHT_BEFORE = "{};,>:("  # Whitespace after these characters can go
+CSS_TIGHT_AFTER = "{};,>)"  # Whitespace before these characters can go
+
+
+def compression_formats():
+    """Returns the extensions of the compressed siblings written for each output, best supported first"""
+    return (".br", ".gz") if brotli is not None else (".gz",)
+
+
+def minify_html(html):
+    """Collapses every run of whitespace into one space and drops comments, except inside pre, textarea, script and style elements"""
+    pieces = []
+    position = 0
+    for match in PRESERVED_HTML_PATTERN.finditer(html):
+        pieces.append(collapse_html(html[position : match.start()]))
+        pieces.append(match[0])
+        position = match.end()
+    pieces.append(collapse_html(html[position:]))
+    return "".join(pieces).strip()
+
+
+def collapse_html(html):
+    return WHITESPACE_PATTERN.sub(" ", HTML_COMMENT_PATTERN.sub("", html))
+
+
+def minify_css(css):
+    """Drops comments, the whitespace that doesn't change what the stylesheet means, and the last semicolon of each block. Strings are left alone"""
+    pieces = []
+    position = 0
+    last = ""  # The last character written
+    for match in CSS_TOKEN_PATTERN.finditer(css):
+        text = css[position : match.start()]
+        if text:
+            pieces.append(text)
+            last = text[-1]
+        position = match.end()
+        if match[1] is not None:
+            pieces.append(match[1])
+            last = match[1][-1]
+        elif match[4] is not None:
+            following = css[position : position + 1]
+            if last and following and last not in CSS_TIGHT_BEFORE:
+                if following not in CSS_TIGHT_AFTER:
+                    pieces.append(" ")
+                    last = " "
+    pieces.append(css[position:])
+    return "".join(pieces).strip()
+
+
+MINIFIERS = {".html": minify_html, ".css": minify_css}
+
+
+def compress_data(data, extension):
+    """Returns data compressed at maximum compression for the given sibling extension. The gzip header carries no timestamp, so the same input always gives the same bytes"""
+    if extension == ".br":
+        return brotli.compress(data, quality=11)
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def write_atomically(path, data):
+    """Swaps a new file into place rather than writing into the existing one, which may be a hard link to a static source"""
+    temp_path = f"{path}.{threading.get_ident()}.tmp"
+    try:
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def process_output(path, minify=False, formats=()):
+    """Minifies an output in place if asked to and it has a minifier, then writes a compressed sibling for each format"""
+    with open(path, "rb") as f:
+        data = f.read()
+    minifier = MINIFIERS.get(os.path.splitext(path)[1]) if minify else None
+    if minifier is not None:
+        minified = minifier(data.decode()).encode()
+        if minified != data:
+            write_atomically(path, minified)
+            data = minified
+    for extension in formats:
+        write_atomically(f"{path}{extension}", compress_data(data, extension))
+
+
+def precompress_outputs(paths, manifest=None, minify=False, compress=True, threads=8):
+    """Minifies (with minify) and compresses (with compress) every output in paths with a suitable extension, on a pool of threads. With a BuildManifest, outputs whose contents, settings and siblings are the same as in the last build are skipped. Returns (processed, skipped) counts"""
+    formats = compression_formats() if compress else ()
+    settings = {"minify": minify, "formats": list(formats)}
+    candidates = [path for path in paths if path.endswith(COMPRESSIBLE_EXTENSIONS)]
+    processed = skipped = 0
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        futures = {}
+        for path in candidates:
+            stat = os.stat(path)
+            # Small files gain nothing from compression, so they are only minified
+            small = stat.st_size < MIN_COMPRESS_SIZE
+            path_formats = () if small else formats
+            siblings = [f"{path}{extension}" for extension in path_formats]
+            if manifest is not None and manifest.unchanged(
+                path, siblings, stat, **settings
+            ):
+                skipped += 1
+                continue
+            futures[path] = pool.submit(process_output, path, minify, path_formats)
+        for path, future in futures.items():
+            future.result()
+            processed += 1
+            if manifest is not None:
+                # Minifying rewrote the output, so what the manifest saw of it is out of date
+                manifest.refresh(path)
+    return processed, skipped
@@ -0,0 +1,153 @@
+import hashlib
+import json
+import os
+import re
+from collections import Counter
+
+from cachefile import load_versioned, save_versioned
+from frontmatter import read_header, split_front_matter
+from md_to_html import blocks_to_html_node, markdown_to_html_node, read_blocks
+from pipeline import read_source
+
+SEARCH_INDEX_VERSION = 1
+TOKEN_PATTERN = re.compile(r"\w+")
+TAG_PATTERN = re.compile(r"<[^>]*>")  # Markup some leaves carry as their value, like the <pre><code> of code blocks
+MIN_TOKEN_LENGTH = 2  # Shorter tokens match too much to be worth indexing
+TITLE_BOOST = 5  # Every occurrence of a term in the title weighs this many occurrences in the text
+SHARD_PREFIX_LENGTH = 2  # Terms are split into shards by their first characters, so clients only load the shards their query needs
+
+
+def tokenize(text):
+    """Returns the lowercased words of text that are long enough to index"""
+    return [
+        token
+        for token in TOKEN_PATTERN.findall(text.lower())
+        if len(token) >= MIN_TOKEN_LENGTH
+    ]
+
+
+def node_text(node):
+    """Yields the text of every leaf under a ParentNode in document order (see ParentNode.iter_leaves()), without any markup. Images have no text of their own"""
+    for leaf in node.iter_leaves():
+        if leaf.tag != "img" and leaf.value:
+            yield TAG_PATTERN.sub(" ", leaf.value)
+
+
+def document_terms(title, node):
+    """Returns the weight of every term of a document: how often it occurs in the text, plus TITLE_BOOST for each time it occurs in the title"""
+    terms = Counter()
+    for text in node_text(node):
+        terms.update(tokenize(text))
+    for token in tokenize(title or ""):
+        terms[token] += TITLE_BOOST
+    return dict(terms)
+
+
+def read_terms(source, title, ast_cache=None):
+    """Returns the terms of the page at source (see document_terms()). The document is parsed like it is for rendering, through the AstCache if one is passed, so pages rendered in this build come straight out of it. Huge sources are read block by block"""
+    markdown = read_source(source)
+    if markdown is None:
+        with open(source) as f:
+            read_header(f)
+            return document_terms(title, blocks_to_html_node(read_blocks(f)))
+    _, body = split_front_matter(markdown)
+    if ast_cache is not None:
+        node = ast_cache.parse(body)
+    else:
+        node = markdown_to_html_node(body)
+    return document_terms(title, node)
+
+
+def shard_name(term):
+    """Returns the shard a term is stored in: its first SHARD_PREFIX_LENGTH characters"""
+    return term[:SHARD_PREFIX_LENGTH]
+
+
+class SearchIndex:
+    def __init__(self, path, documents=None):
+        self.path = path  # Where the terms of every page are kept between builds
+        self.documents = documents or {}  # {source: {"hash": content hash, "url": ..., "title": ..., "terms": {term: weight}}}
+
+    @classmethod
+    def load(cls, path):
+        """Reads the terms of the last build from disk. A missing, unreadable or outdated file yields an empty index, so every page is tokenized again"""
+        data = load_versioned(path, SEARCH_INDEX_VERSION)
+        if data is None:
+            return cls(path)
+        return cls(path, data.get("documents", {}))
+
+    def save(self):
+        """Writes the terms of every page to disk, replacing the previous file atomically"""
+        save_versioned(
+            self.path, SEARCH_INDEX_VERSION, {"documents": self.documents}
+        )
+
+    def update(self, index, manifest, ast_cache=None):
+        """Brings the terms up to date with every page of a PageIndex but drafts. Only pages whose content hash (as recorded in the BuildManifest) changed are tokenized again; pages that are gone are dropped. Returns how many pages were tokenized"""
+        documents = {}
+        tokenized = 0
+        for page in index:
+            if page.metadata.get("draft"):
+                continue
+            digest = manifest.fingerprint(page.source)
+            document = self.documents.get(page.source)
+            if document is None or document["hash"] != digest:
+                terms = read_terms(page.source, page.title, ast_cache)
+                document = {"hash": digest, "terms": terms}
+                tokenized += 1
+            # The url can change without the page changing, with --no-pretty-urls
+            documents[page.source] = {**document, "url": page.url, "title": page.title}
+        self.documents = documents
+        return tokenized
+
+    def files(self, resolve_url=None):
+        """Returns the files of the prebuilt index as {name: JSON text}: "documents.json", which lists [url, title] for every document id, and one "<prefix>.json" shard per term prefix. A shard maps each of its terms to a flat list of postings, [document id, weight, ...], sorted by id, each id stored as the difference from the one before to keep it small"""
+        postings = {}
+        documents = []
+        for source in sorted(self.documents):
+            document = self.documents[source]
+            url = document["url"]
+            if resolve_url is not None:
+                url = resolve_url(url)
+            for term, weight in document["terms"].items():
+                postings.setdefault(term, []).append((len(documents), weight))
+            documents.append([url, document["title"]])
+        shards = {}
+        for term in sorted(postings):
+            flat = []
+            previous = 0
+            for document_id, weight in postings[term]:
+                flat += [document_id - previous, weight]
+                previous = document_id
+            shards.setdefault(shard_name(term), {})[term] = flat
+        files = {
+            "documents.json": {
+                "version": SEARCH_INDEX_VERSION,
+                "prefix_length": SHARD_PREFIX_LENGTH,
+                "title_boost": TITLE_BOOST,
+                "documents": documents,
+            }
+        }
+        for name, terms in shards.items():
+            files[f"{name}.json"] = terms
+        return {
+            name: json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+            for name, data in files.items()
+        }
+
+    def write(self, directory, resolve_url=None, manifest=None):
+        """Writes the files of the prebuilt index (see files()) into directory. With a BuildManifest, files whose text is the same as in the last build are left alone, and shards that are gone are cleaned up as orphans. Returns how many files were written and how many were skipped"""
+        os.makedirs(directory, exist_ok=True)
+        written = skipped = 0
+        for name, text in self.files(resolve_url).items():
+            output = os.path.join(directory, name)
+            digest = hashlib.sha256(text.encode()).hexdigest()
+            if manifest is not None and manifest.generated(
+                f"search:{name}", output, hash=digest
+            ):
+                skipped += 1
+                continue
+            with open(output, "w", encoding="utf-8") as f:
+                f.write(text)
+            written += 1
+        return written, skipped
@@ -0,0 +1,217 @@
+import argparse
+import functools
+import os
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+from main import (
+    BuildOptions,
+    add_build_arguments,
+    build,
+    configure_logging,
+    rebuild,
+)
+
+WATCHED_PATHS = ["content", "static", "template.html"]
+RELOAD_PATH = "/__livereload"  # Server-sent events endpoint that tells open pages to reload
+RELOAD_SCRIPT = (
+    f'<script>new EventSource("{RELOAD_PATH}").onmessage = () => location.reload();'
+    "</script>"
+)
+
+
+def snapshot(paths):
+    """Returns {file path: (mtime, size)} for every file under the given files and directories"""
+    files = {}
+    pending = []
+    for path in paths:
+        if os.path.isdir(path):
+            pending.append(path)
+        elif os.path.isfile(path):
+            stat = os.stat(path)
+            files[path] = (stat.st_mtime_ns, stat.st_size)
+    # Walk the directories with a stack, using scandir so each entry costs a single stat
+    while pending:
+        with os.scandir(pending.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    pending.append(entry.path)
+                elif entry.is_file():
+                    stat = entry.stat()
+                    files[entry.path] = (stat.st_mtime_ns, stat.st_size)
+    return files
+
+
+class Watcher:
+    def __init__(self, paths):
+        self.paths = paths  # Files and directories to watch
+        self.files = snapshot(paths)  # What they looked like when last polled
+
+    def watch(self, paths):
+        """Watches paths from now on instead. Files that were watched already keep what they looked like when last polled, so changes made in between still show up; the rest are taken as they are now"""
+        self.paths = paths
+        self.files = {
+            path: self.files.get(path, state) for path, state in snapshot(paths).items()
+        }
+
+    def poll(self):
+        """Returns the set of files that were added, changed or deleted since the last poll"""
+        files = snapshot(self.paths)
+        changed = {
+            path
+            for path in files.keys() | self.files.keys()
+            if files.get(path) != self.files.get(path)
+        }
+        self.files = files
+        return changed
+
+
+class ReloadNotifier:
+    def __init__(self):
+        self.generation = 0  # Goes up by one every time the site is rebuilt
+        self.condition = threading.Condition()
+
+    def notify(self):
+        """Tells everyone waiting that the site was rebuilt"""
+        with self.condition:
+            self.generation += 1
+            self.condition.notify_all()
+
+    def wait(self, generation, timeout=None):
+        """Blocks until the site is rebuilt after the given generation or the timeout runs out, then returns the current generation"""
+        with self.condition:
+            self.condition.wait_for(lambda: self.generation != generation, timeout)
+            return self.generation
+
+
+def inject_reload_script(html):
+    """Adds the live reload script to a page, just before </body> if there is one"""
+    index = html.rfind("</body>")
+    if index == -1:
+        return html + RELOAD_SCRIPT
+    return html[:index] + RELOAD_SCRIPT + html[index:]
+
+
+class LiveReloadHandler(SimpleHTTPRequestHandler):
+    def do_GET(self):
+        """Serves docs like http.server does, except that pages get the live reload script and RELOAD_PATH streams reload events"""
+        if self.path == RELOAD_PATH:
+            return self.stream_reloads()
+        path = self.translate_path(self.path)
+        # Directories are served through their index.html once http.server has redirected them to end in a slash
+        if os.path.isdir(path) and self.path.split("?")[0].endswith("/"):
+            path = os.path.join(path, "index.html")
+        if path.endswith(".html") and os.path.isfile(path):
+            return self.send_page(path)
+        return super().do_GET()
+
+    def send_page(self, path):
+        with open(path) as f:
+            body = inject_reload_script(f.read()).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def stream_reloads(self):
+        """Holds the connection open and sends a "reload" event after every rebuild, with a comment every so often to notice closed tabs"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        notifier = self.server.notifier
+        generation = notifier.generation
+        try:
+            while True:
+                latest = notifier.wait(generation, timeout=15)
+                if latest != generation:
+                    self.wfile.write(b"data: reload\n\n")
+                    generation = latest
+                else:
+                    self.wfile.write(b": ping\n\n")
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            return
+
+    def log_message(self, format, *args):
+        """Keeps the reload stream's requests out of the log"""
+        if not self.path.startswith(RELOAD_PATH):
+            super().log_message(format, *args)
+
+
+def start_server(port, directory="docs"):
+    """Starts serving directory on a background thread and returns the server"""
+    handler = functools.partial(LiveReloadHandler, directory=directory)
+    httpd = ThreadingHTTPServer(("", port), handler)
+    httpd.daemon_threads = True
+    httpd.notifier = ReloadNotifier()
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd
+
+
+def watched_paths(state):
+    """Returns WATCHED_PATHS along with the partials the templates of a BuildState include, which can live outside of them"""
+    return WATCHED_PATHS + state.includes()
+
+
+def watch(httpd, options, state, interval=0.05):
+    """Polls the site's sources and, whenever something changes, rebuilds what it affects (see main.rebuild()) and reloads open pages. state is the BuildState of the build being served"""
+    watcher = Watcher(watched_paths(state))
+    changed = set()  # Files changed since the last good build
+    while True:
+        time.sleep(interval)
+        # A failed rebuild is only tried again once something else changes, hopefully the fix
+        new = watcher.poll()
+        if not new:
+            continue
+        changed |= new
+        start = time.perf_counter()
+        try:
+            state = rebuild(options, state, changed) or build(
+                options, state.manifest.successor()
+            )
+        except Exception as e:
+            # Keep serving the last good build until the sources are fixed; the files changed so far are rebuilt along with the fix
+            print(f"Rebuild failed: {e!r}")
+            continue
+        # Templates may include other partials now
+        watcher.watch(watched_paths(state))
+        httpd.notifier.notify()
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"Rebuilt {len(changed)} changed file(s) in {elapsed:.0f} ms")
+        changed = set()
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog="main.py serve", description="Builds the site and serves docs/"
+    )
+    parser.add_argument("basepath", nargs="?", default="/")
+    parser.add_argument("-p", "--port", type=int, default=8888)
+    parser.add_argument(
+        "-w",
+        "--watch",
+        action="store_true",
+        help="rebuild on changes to content, static, the template or its partials and reload open pages",
+    )
+    add_build_arguments(parser)
+    return parser.parse_args(argv)
+
+
+def main(argv):
+    args = parse_args(argv)
+    configure_logging(args.verbose)
+    options = BuildOptions.from_args(args)
+    state = build(options)
+    httpd = start_server(args.port)
+    print(f"Serving docs at http://localhost:{args.port}/")
+    try:
+        if args.watch:
+            watch(httpd, options, state)
+        else:
+            threading.Event().wait()
+    except KeyboardInterrupt:
+        httpd.shutdown()
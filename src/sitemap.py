@@ -0,0 +1,192 @@
+import datetime
+import email.utils
+import hashlib
+import os
+import threading
+from xml.sax.saxutils import escape, quoteattr
+
+from listings import page_date
+
+SITEMAP_LIMIT = 50000  # Most urls a single sitemap may list
+FEED_LIMIT = 20  # Newest pages listed in each feed
+SITEMAP_NAMESPACE = "http://www.sitemaps.org/schemas/sitemap/0.9"
+ATOM_NAMESPACE = "http://www.w3.org/2005/Atom"
+
+
+class StreamedOutput:
+    def __init__(self, path, manifest=None, key=None):
+        self.path = path  # Where the file ends up
+        self.manifest = manifest  # BuildManifest the file's hash is recorded in, if any
+        self.key = key or path  # Key the file is recorded under in the manifest
+        self.temp_path = f"{path}.{threading.get_ident()}.tmp"
+        self.changed = None  # Whether the file was replaced, once closed
+
+    def __enter__(self):
+        """Opens a temporary file next to path, which everything written goes into, hashed on the way"""
+        self.file = open(self.temp_path, "w", encoding="utf-8")
+        self.digest = hashlib.sha256()
+        return self
+
+    def write(self, text):
+        self.file.write(text)
+        self.digest.update(text.encode())
+
+    def __exit__(self, exc_type, exc, traceback):
+        """Swaps the new file into place, unless the manifest shows the last build wrote exactly the same bytes, in which case the existing file is left alone"""
+        self.file.close()
+        if exc_type is None:
+            self.changed = self.manifest is None or not self.manifest.generated(
+                self.key, self.path, hash=self.digest.hexdigest()
+            )
+        if self.changed:
+            os.replace(self.temp_path, self.path)
+        else:
+            os.remove(self.temp_path)
+        return False
+
+
+def page_datetime(page):
+    """Returns the date of a page's front matter as an aware datetime, in UTC unless it gives a timezone, or None if it has no date that can be read"""
+    date = page_date(page)
+    if date is None:
+        return None
+    try:
+        moment = datetime.datetime.fromisoformat(date)
+    except ValueError:
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=datetime.timezone.utc)
+    return moment
+
+
+def published_pages(index):
+    """Returns every page of a PageIndex but drafts, in index order"""
+    return [page for page in index if not page.metadata.get("draft")]
+
+
+def feed_pages(index, limit=FEED_LIMIT):
+    """Returns the newest limit pages that have a date, newest first. Pages from the same moment stay in index order, so the order never changes between builds"""
+    dated = [page for page in published_pages(index) if page_datetime(page)]
+    dated.sort(key=page_datetime, reverse=True)
+    return dated[:limit]
+
+
+class SiteFiles:
+    def __init__(self, directory, site_url, resolve_url, manifest=None):
+        self.directory = directory  # Where the files are written
+        self.site_url = site_url.rstrip("/")  # Scheme and host the site is served from, like "https://example.com"
+        self.resolve_url = resolve_url  # Puts root-relative urls under the basepath
+        self.manifest = manifest  # BuildManifest that tells which files are unchanged
+        self.written = 0
+        self.skipped = 0
+
+    def location(self, url):
+        """Returns the absolute url of a root-relative one"""
+        return f"{self.site_url}{self.resolve_url(url)}"
+
+    def open(self, name):
+        return StreamedOutput(
+            os.path.join(self.directory, name), self.manifest, f"site:{name}"
+        )
+
+    def count(self, output):
+        if output.changed:
+            self.written += 1
+        else:
+            self.skipped += 1
+
+    def write_sitemaps(self, pages, limit=SITEMAP_LIMIT):
+        """Writes the urls of pages into sitemaps of at most limit urls each, sitemap-1.xml, sitemap-2.xml, ..., one url at a time, then sitemap.xml, the sitemap index that lists them. Pages with a date get it as their lastmod"""
+        names = []
+        for start in range(0, len(pages), limit):
+            names.append(f"sitemap-{len(names) + 1}.xml")
+            with self.open(names[-1]) as out:
+                out.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+                out.write(f'<urlset xmlns="{SITEMAP_NAMESPACE}">\n')
+                for page in pages[start : start + limit]:
+                    out.write(f"<url><loc>{escape(self.location(page.url))}</loc>")
+                    date = page_datetime(page)
+                    if date is not None:
+                        out.write(f"<lastmod>{date.date().isoformat()}</lastmod>")
+                    out.write("</url>\n")
+                out.write("</urlset>\n")
+            self.count(out)
+        with self.open("sitemap.xml") as out:
+            out.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+            out.write(f'<sitemapindex xmlns="{SITEMAP_NAMESPACE}">\n')
+            for name in names:
+                location = escape(self.location(f"/{name}"))
+                out.write(f"<sitemap><loc>{location}</loc></sitemap>\n")
+            out.write("</sitemapindex>\n")
+        self.count(out)
+
+    def write_atom(self, title, pages):
+        """Writes feed.xml, an Atom feed of pages, which must all have a date"""
+        home = escape(self.location("/"))
+        with self.open("feed.xml") as out:
+            out.write('<?xml version="1.0" encoding="utf-8"?>\n')
+            out.write(f'<feed xmlns="{ATOM_NAMESPACE}">\n')
+            out.write(f"<title>{escape(title)}</title>\n")
+            out.write(f"<link href={quoteattr(self.location('/'))} />\n")
+            self_link = quoteattr(self.location("/feed.xml"))
+            out.write(f'<link rel="self" href={self_link} />\n')
+            out.write(f"<id>{home}</id>\n")
+            updated = page_datetime(pages[0]).isoformat()
+            out.write(f"<updated>{updated}</updated>\n")
+            out.write(f"<author><name>{escape(title)}</name></author>\n")
+            for page in pages:
+                location = self.location(page.url)
+                out.write("<entry>")
+                out.write(f"<title>{escape(page.title or page.url)}</title>")
+                out.write(f"<link href={quoteattr(location)} />")
+                out.write(f"<id>{escape(location)}</id>")
+                out.write(f"<updated>{page_datetime(page).isoformat()}</updated>")
+                summary = page.metadata.get("description")
+                if summary is not None:
+                    out.write(f"<summary>{escape(str(summary))}</summary>")
+                out.write("</entry>\n")
+            out.write("</feed>\n")
+        self.count(out)
+
+    def write_rss(self, title, pages):
+        """Writes rss.xml, an RSS 2.0 feed of pages, which must all have a date"""
+        with self.open("rss.xml") as out:
+            out.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+            out.write('<rss version="2.0"><channel>\n')
+            out.write(f"<title>{escape(title)}</title>\n")
+            out.write(f"<link>{escape(self.location('/'))}</link>\n")
+            out.write(f"<description>{escape(title)}</description>\n")
+            for page in pages:
+                location = escape(self.location(page.url))
+                published = email.utils.format_datetime(page_datetime(page))
+                out.write("<item>")
+                out.write(f"<title>{escape(page.title or page.url)}</title>")
+                out.write(f"<link>{location}</link>")
+                out.write(f'<guid isPermaLink="true">{location}</guid>')
+                out.write(f"<pubDate>{published}</pubDate>")
+                description = page.metadata.get("description")
+                if description is not None:
+                    out.write(f"<description>{escape(str(description))}</description>")
+                out.write("</item>\n")
+            out.write("</channel></rss>\n")
+        self.count(out)
+
+    def write_robots(self):
+        """Writes robots.txt, which lets every crawler in and points them at the sitemap index"""
+        with self.open("robots.txt") as out:
+            out.write("User-agent: *\nAllow: /\n")
+            out.write(f"Sitemap: {self.location('/sitemap.xml')}\n")
+        self.count(out)
+
+    def write_all(self, index, robots=True, limit=SITEMAP_LIMIT):
+        """Writes the sitemaps, the feeds and, with robots, robots.txt for every page of a PageIndex but drafts. The feeds are titled after the home page, and left out while no page has a date. Returns how many files were written and how many were left alone because they were unchanged"""
+        self.write_sitemaps(published_pages(index), limit)
+        pages = feed_pages(index)
+        if pages:
+            home = index.find("/")
+            title = home.title if home is not None and home.title else self.site_url
+            self.write_atom(title, pages)
+            self.write_rss(title, pages)
+        if robots:
+            self.write_robots()
+        return self.written, self.skipped
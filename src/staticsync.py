@@ -0,0 +1,76 @@
+import os
+import shutil
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows, where reflinks fall back to copies
+    fcntl = None
+
+SYNC_MODES = ("copy", "hardlink", "reflink")
+FICLONE = 0x40049409  # Linux ioctl that makes a copy-on-write clone of a whole file
+
+
+class SyncReport:
+    def __init__(self):
+        self.copied_files = 0
+        self.copied_bytes = 0
+        self.skipped_files = 0
+        self.skipped_bytes = 0
+        self.lock = threading.Lock()  # Files are copied from several threads at once
+
+    def copied(self, size):
+        with self.lock:
+            self.copied_files += 1
+            self.copied_bytes += size
+
+    def skipped(self, size):
+        with self.lock:
+            self.skipped_files += 1
+            self.skipped_bytes += size
+
+    def __repr__(self):
+        return (
+            f"copied {self.copied_files} files ({self.copied_bytes} bytes), "
+            f"skipped {self.skipped_files} files ({self.skipped_bytes} bytes)"
+        )
+
+
+def same_file_stat(path, stat):
+    """True if the file at path exists with the same size and mtime as stat, i.e. it's an up to date copy"""
+    try:
+        existing = os.stat(path)
+    except FileNotFoundError:
+        return False
+    return existing.st_size == stat.st_size and existing.st_mtime_ns == stat.st_mtime_ns
+
+
+def reflink(source, destination):
+    """Clones source into destination without copying any data, on filesystems that support it (btrfs, xfs, ...). Raises OSError when they don't"""
+    if fcntl is None:
+        raise OSError("reflinks are not supported on this platform")
+    with open(source, "rb") as src, open(destination, "wb") as dst:
+        fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+    shutil.copystat(source, destination)
+
+
+def sync_file(source, destination, mode="copy"):
+    """Puts a copy of source at destination, keeping its mtime so the next sync can tell it's up to date. hardlink and reflink fall back to a normal copy wherever they aren't possible. The file is swapped into place so a hard link never writes through to another file"""
+    temp_path = f"{destination}.{threading.get_ident()}.tmp"
+    try:
+        if mode == "hardlink":
+            try:
+                os.link(source, temp_path)
+            except OSError:
+                shutil.copy2(source, temp_path)
+        elif mode == "reflink":
+            try:
+                reflink(source, temp_path)
+            except OSError:
+                shutil.copy2(source, temp_path)
+        else:
+            shutil.copy2(source, temp_path)
+        os.replace(temp_path, destination)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
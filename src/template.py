@@ -0,0 +1,85 @@
+import copy
+import os
+import re
+
+SLOT_PATTERN = re.compile(r"\{\{ (\w+) \}\}")  # Matches "{{ Title }}", capturing "Title"
+URL_ATTRIBUTE_PATTERN = re.compile(r'\b(href|src)="([^"]*)"')
+INCLUDE_PATTERN = re.compile(r"\{\{> (\S+) \}\}")  # Matches "{{> header.html }}", capturing "header.html"
+
+
+def expand_includes(source, directory, includes, including=()):
+    """Replaces every "{{> path }}" in source with the contents of that file, read relative to directory, expanding the includes inside it too. Appends the path of every file read to includes"""
+
+    def include(match):
+        path = os.path.normpath(os.path.join(directory, match[1]))
+        if path in including:
+            raise ValueError(f"{path} includes itself")
+        with open(path) as f:
+            text = f.read()
+        includes.append(path)
+        return expand_includes(
+            text, os.path.dirname(path), includes, (*including, path)
+        )
+
+    return INCLUDE_PATTERN.sub(include, source)
+
+
+class Template:
+    def __init__(self, source, resolve_url=None, path=None, includes=()):
+        self.path = path  # Where the template was read from, for logging
+        self.includes = list(includes)  # Paths of the partials included into the template
+        self.resolve_url = resolve_url  # Applied to the template's own urls and to every page rendered with it
+        # Every href and src of the template itself, as written
+        self.links = [match[2] for match in URL_ATTRIBUTE_PATTERN.finditer(source)]
+        if resolve_url is not None:
+            # The template's urls only need resolving once, not once per page
+            source = URL_ATTRIBUTE_PATTERN.sub(
+                lambda match: f'{match[1]}="{resolve_url(match[2])}"', source
+            )
+        self.segments = []  # Literal text, with each slot's raw "{{ Name }}" text in between
+        self.slots = {}  # Slot name for every index into segments that holds a slot
+        position = 0
+        for match in SLOT_PATTERN.finditer(source):
+            self.segments.append(source[position : match.start()])
+            self.slots[len(self.segments)] = match[1]
+            self.segments.append(match[0])
+            position = match.end()
+        self.segments.append(source[position:])
+
+    @classmethod
+    def load(cls, path, resolve_url=None):
+        """Reads and compiles the template at path, along with the partials it includes."""
+        with open(path) as t:
+            source = t.read()
+        includes = []
+        source = expand_includes(
+            source, os.path.dirname(path), includes, (os.path.normpath(path),)
+        )
+        return cls(source, resolve_url, path, includes)
+
+    def bind(self, resolve_url):
+        """Returns a copy of the template that renders pages with a different resolve_url, such as a LinkRecorder wrapping this one. Nothing is compiled again and the template's own urls stay as they were resolved."""
+        bound = copy.copy(self)
+        bound.resolve_url = resolve_url
+        return bound
+
+    def iter_render(self, **values):
+        """Yields the page piece by piece, filling each slot with the value of the same name. A value can be a string or an HTMLNode, which is streamed with the template's resolve_url. Slots without a value are left as they are."""
+        for index, segment in enumerate(self.segments):
+            name = self.slots.get(index)
+            if name is None or name not in values:
+                yield segment
+            elif isinstance(values[name], str):
+                yield values[name]
+            else:
+                yield from values[name].iter_html(self.resolve_url)
+
+    def render(self, **values):
+        """Returns the whole page as a string, joined together in one pass."""
+        return "".join(self.iter_render(**values))
+
+    def write(self, fp, **values):
+        """Streams the page into a file object without building it as one string first."""
+        write = fp.write
+        for chunk in self.iter_render(**values):
+            write(chunk)
@@ -0,0 +1,70 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import astcache
+import md_to_html
+from astcache import AstCache
+from md_to_html import markdown_to_html_node, register_block_parser
+
+MARKDOWN = "# Title\n\nSome **bold** text and a [link](/blog)\n\n- one\n- two"
+
+
+class TestAstCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = AstCache(os.path.join(self.tmp.name, "ast"))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_parse_matches_parser(self):
+        expected = markdown_to_html_node(MARKDOWN).to_html()
+        self.assertEqual(self.cache.parse(MARKDOWN).to_html(), expected)
+        # The second time around the tree comes from disk
+        self.assertEqual(self.cache.parse(MARKDOWN).to_html(), expected)
+
+    def test_hit_skips_parsing(self):
+        self.cache.parse(MARKDOWN)
+        with mock.patch.object(astcache, "markdown_to_html_node") as parser:
+            self.cache.parse(MARKDOWN)
+        parser.assert_not_called()
+
+    def test_parser_version_in_key(self):
+        key = self.cache.key(MARKDOWN)
+        with mock.patch.object(astcache, "PARSER_VERSION", -1):
+            self.assertNotEqual(self.cache.key(MARKDOWN), key)
+
+    def test_block_parsers_in_key(self):
+        key = self.cache.key(MARKDOWN)
+        with mock.patch.dict(md_to_html.BLOCK_PARSERS):
+            register_block_parser("|", "table", bool, markdown_to_html_node)
+            self.assertNotEqual(self.cache.key(MARKDOWN), key)
+        self.assertEqual(self.cache.key(MARKDOWN), key)
+
+    def test_corrupt_entry_is_a_miss(self):
+        path = self.cache.path(self.cache.key(MARKDOWN))
+        os.makedirs(os.path.dirname(path))
+        with open(path, "wb") as f:
+            f.write(b"not a pickle")
+        self.assertEqual(
+            self.cache.parse(MARKDOWN).to_html(),
+            markdown_to_html_node(MARKDOWN).to_html(),
+        )
+
+    def test_prune_evicts_least_recently_used(self):
+        documents = [f"# Document {number}" for number in range(3)]
+        for number, markdown in enumerate(documents):
+            self.cache.parse(markdown)
+            path = self.cache.path(self.cache.key(markdown))
+            os.utime(path, ns=(number * 10**9, number * 10**9))
+        size = os.path.getsize(self.cache.path(self.cache.key(documents[0])))
+        self.cache.max_bytes = size * 2
+        self.assertEqual(self.cache.prune(), 1)
+        self.assertFalse(os.path.exists(self.cache.path(self.cache.key(documents[0]))))
+        self.assertTrue(os.path.exists(self.cache.path(self.cache.key(documents[2]))))
+
+
+if __name__ == "__main__":
+    unittest.main()
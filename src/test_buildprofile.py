@@ -0,0 +1,66 @@
+import os
+import tempfile
+import types
+import unittest
+from buildprofile import Profiler
+
+
+class TestProfiler(unittest.TestCase):
+    def test_phase_totals(self):
+        profiler = Profiler()
+        for _ in range(3):
+            with profiler.phase("read"):
+                pass
+        wall, cpu, calls = profiler.phases["read"]
+        self.assertEqual(calls, 3)
+        self.assertGreaterEqual(wall, 0)
+        self.assertGreaterEqual(cpu, 0)
+        self.assertEqual(len(profiler.events), 3)
+
+    def test_page_phases(self):
+        profiler = Profiler()
+        with profiler.page_phase("content/index.md"):
+            with profiler.phase("write"):
+                pass
+        with profiler.phase("finish"):
+            pass
+        self.assertEqual(set(profiler.pages["content/index.md"]), {"page", "write"})
+        self.assertEqual(profiler.events[-1]["cat"], "build")
+        self.assertEqual(profiler.events[0]["args"], {"page": "content/index.md"})
+
+    def test_instrument_restores(self):
+        module = types.SimpleNamespace(double=lambda x: x * 2)
+        original = module.double
+        profiler = Profiler()
+        with profiler.instrument(module, "double", "doubling"):
+            self.assertEqual(module.double(4), 8)
+        self.assertIs(module.double, original)
+        self.assertEqual(profiler.phases["doubling"][2], 1)
+
+    def test_merge_and_slowest(self):
+        profiler = Profiler()
+        for source, wall in [("a.md", 0.2), ("b.md", 0.5), ("c.md", 0.1)]:
+            worker = Profiler()
+            worker.page = source
+            worker.add("page", wall, wall)
+            profiler.merge(worker)
+        self.assertEqual(profiler.phases["page"][2], 3)
+        self.assertEqual(
+            [source for source, _ in profiler.slowest(2)], ["b.md", "a.md"]
+        )
+
+    def test_save(self):
+        profiler = Profiler()
+        with profiler.page_phase("a.md"):
+            pass
+        with tempfile.TemporaryDirectory() as directory:
+            profile_path, trace_path = profiler.save(directory)
+            self.assertTrue(os.path.isfile(profile_path))
+            self.assertTrue(os.path.isfile(trace_path))
+        trace = profiler.to_chrome_trace()
+        self.assertEqual(trace["traceEvents"][0]["ph"], "X")
+        self.assertEqual(profiler.to_json()["slowest"][0]["page"], "a.md")
+
+
+if __name__ == "__main__":
+    unittest.main()
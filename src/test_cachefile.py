@@ -0,0 +1,35 @@
+import os
+import tempfile
+import unittest
+from cachefile import load_versioned, save_versioned
+
+
+class TestCacheFile(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "cache", "links.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_save_and_load(self):
+        save_versioned(self.path, 2, {"links": {"b": [], "a": ["/"]}}, sort_keys=True)
+        self.assertEqual(
+            load_versioned(self.path, 2), {"version": 2, "links": {"a": ["/"], "b": []}}
+        )
+        with open(self.path) as f:
+            self.assertTrue(f.read().startswith('{"links": {"a"'))
+        self.assertEqual(os.listdir(os.path.dirname(self.path)), ["links.json"])
+
+    def test_missing_outdated_or_corrupt(self):
+        self.assertIsNone(load_versioned(self.path, 1))
+        save_versioned(self.path, 1, {})
+        self.assertIsNone(load_versioned(self.path, 2))
+        for text in ["not json", "[1]"]:
+            with open(self.path, "w") as f:
+                f.write(text)
+            self.assertIsNone(load_versioned(self.path, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import io
+import unittest
+from unittest import mock
+from frontmatter import document_title, read_header, split_front_matter
+
+YAML_DOCUMENT = """---
+title: Tom Bombadil
+date: 2024-01-05
+tags: [tolkien, lore]
+draft: false
+---
+
+# Tom
+
+Old Tom Bombadil was a merry fellow
+"""
+TOML_DOCUMENT = """+++
+title = "Tom Bombadil"
+tags = ["tolkien", "lore"]
++++
+# Tom
+"""
+
+
+class TestFrontMatter(unittest.TestCase):
+    def test_yaml(self):
+        metadata, body = split_front_matter(YAML_DOCUMENT)
+        self.assertEqual(metadata["title"], "Tom Bombadil")
+        self.assertEqual(str(metadata["date"]), "2024-01-05")
+        self.assertEqual(metadata["tags"], ["tolkien", "lore"])
+        self.assertIs(metadata["draft"], False)
+        self.assertEqual(body, "# Tom\n\nOld Tom Bombadil was a merry fellow\n")
+
+    def test_toml(self):
+        metadata, body = split_front_matter(TOML_DOCUMENT)
+        self.assertEqual(
+            metadata, {"title": "Tom Bombadil", "tags": ["tolkien", "lore"]}
+        )
+        self.assertEqual(body, "# Tom\n")
+
+    def test_without_pyyaml(self):
+        with mock.patch("frontmatter.yaml", None):
+            metadata, _ = split_front_matter(YAML_DOCUMENT)
+            self.assertEqual(
+                metadata,
+                {
+                    "title": "Tom Bombadil",
+                    "date": "2024-01-05",
+                    "tags": ["tolkien", "lore"],
+                    "draft": False,
+                },
+            )
+            with self.assertRaises(ValueError):
+                split_front_matter("---\ntitle:\n  nested: value\n---\n# Tom")
+
+    def test_no_front_matter(self):
+        for markdown in ["# Tom\n\n---\n", "---\nnever closed\n\n# Tom", ""]:
+            self.assertEqual(split_front_matter(markdown), ({}, markdown))
+
+    def test_invalid_front_matter(self):
+        for markdown in ["---\n[unclosed\n---\n", "---\n- a list\n---\n"]:
+            with self.assertRaises(ValueError):
+                split_front_matter(markdown)
+
+    def test_read_header_stops_at_the_body(self):
+        for markdown in [YAML_DOCUMENT, TOML_DOCUMENT, "# Tom\n\ntext", "---\n# Tom"]:
+            f = io.StringIO(markdown)
+            metadata, first_line = read_header(f)
+            expected_metadata, body = split_front_matter(markdown)
+            self.assertEqual(metadata, expected_metadata)
+            self.assertEqual(first_line, io.StringIO(body).readline())
+            self.assertEqual(f.read(), body)
+
+    def test_document_title(self):
+        self.assertEqual(document_title({"title": 1954}, "# Tom"), "1954")
+        self.assertEqual(document_title({}, "# Tom\r\nOld Tom"), "Tom")
+        with self.assertRaises(Exception):
+            document_title({}, "Old Tom")
+
+
+if __name__ == "__main__":
+    unittest.main()
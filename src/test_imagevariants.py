@@ -0,0 +1,101 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+import imagevariants
+from imagevariants import ImageCache, variant_name
+from assetmap import AssetMap
+from main import copy_static, generate_image_variants
+from manifest import BuildManifest
+from urlresolver import UrlResolver
+
+
+@unittest.skipUnless(imagevariants.available(), "Pillow is not installed")
+class TestImageVariants(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.static = os.path.join(self.tmp.name, "static")
+        self.docs = os.path.join(self.tmp.name, "docs")
+        os.makedirs(os.path.join(self.static, "images"))
+        os.makedirs(self.docs)
+        image = imagevariants.Image.new("RGB", (400, 200), "green")
+        image.save(os.path.join(self.static, "images", "tom.png"))
+        with open(os.path.join(self.static, "index.css"), "w") as f:
+            f.write("body {}")
+        self.cache_dir = os.path.join(self.tmp.name, "cache")
+        self.manifest = BuildManifest(os.path.join(self.tmp.name, "manifest.json"))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def build(self, widths=(100, 200, 800), assets=None):
+        """Copies static into docs and resizes its images, as a build would"""
+        self.manifest = self.manifest.successor()
+        copy_static(self.static, self.docs, self.manifest, assets=assets)
+        return generate_image_variants(
+            self.static,
+            self.docs,
+            self.manifest,
+            ImageCache(self.cache_dir, widths),
+            assets=assets,
+        )
+
+    def test_resizes_narrower_widths(self):
+        images, resized = self.build()
+        self.assertEqual(resized, 1)
+        self.assertEqual(
+            images,
+            {
+                "/images/tom.png": {
+                    "width": 400,
+                    "height": 200,
+                    "variants": [[100, 50], [200, 100]],
+                }
+            },
+        )
+        output = os.path.join(self.docs, "images", "tom-100w.png")
+        with imagevariants.Image.open(output) as image:
+            self.assertEqual(image.size, (100, 50))
+
+    def test_unchanged_images_are_not_reencoded(self):
+        self.build()
+        with mock.patch("imagevariants.resize_image") as resize:
+            images, resized = self.build()
+        resize.assert_not_called()
+        self.assertEqual(resized, 0)
+        self.assertEqual(len(images["/images/tom.png"]["variants"]), 2)
+        # Other settings make other derivatives
+        self.assertEqual(self.build((300,))[1], 1)
+        self.assertEqual(
+            self.manifest.orphans(),
+            [
+                os.path.join(self.docs, "images", "tom-100w.png"),
+                os.path.join(self.docs, "images", "tom-200w.png"),
+            ],
+        )
+
+
+    def test_fingerprinted_derivatives(self):
+        assets = AssetMap(os.path.join(self.tmp.name, "assets.json"))
+        images = self.build(assets=assets)[0]
+        small = assets.fingerprints["/images/tom-100w.png"]
+        self.assertRegex(small, r"^/images/tom-100w\.[0-9a-f]{8}\.png$")
+        for url in ["/images/tom-100w.png", small]:
+            self.assertTrue(os.path.isfile(os.path.join(self.docs, url[1:])))
+        resolve_url = UrlResolver("/", assets.fingerprints, images)
+        self.assertIn(f"{small} 100w", resolve_url.image_attributes("/images/tom.png"))
+        # Nothing is copied again while the derivatives are the same
+        with mock.patch("main.sync_file") as sync:
+            self.build(assets=assets)
+        sync.assert_not_called()
+
+
+class TestVariantName(unittest.TestCase):
+    def test_variant_name(self):
+        self.assertEqual(
+            variant_name("/images/rivendell.png", 480), "/images/rivendell-480w.png"
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
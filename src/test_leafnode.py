@@ -48,3 +48,8 @@ class TestLeafNode(unittest.TestCase):
         node = LeafNode(tag="a", value="Click me!")
         with self.assertRaises(ValueError, msg="link props cannot be None"):
             node.to_html()
+
+    def test_leaf_has_no_dict(self):
+        node = LeafNode(tag="b", value="Bold text!")
+        self.assertFalse(hasattr(node, "__dict__"))
+        self.assertEqual(len(node.children), 0)
@@ -0,0 +1,146 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+from linkgraph import BrokenLink, LinkGraph, LinkRecorder, internal_path
+from main import render_pages
+from md_to_html import markdown_to_html_node
+from pageindex import PageIndex
+from pipeline import render_pages_pipelined
+from template import Template
+from urlresolver import UrlResolver
+
+
+class TestLinkRecorder(unittest.TestCase):
+    def test_records_while_resolving(self):
+        recorder = LinkRecorder(UrlResolver("/base/"))
+        template = Template("{{ Content }}", UrlResolver("/base/")).bind(recorder)
+        html = template.render(
+            Content=markdown_to_html_node("[home](/) and ![tom](/images/tom.png)")
+        )
+        self.assertIn('<a href="/base/">home</a>', html)
+        self.assertIn('<img src="/base/images/tom.png" alt="tom" />', html)
+        self.assertEqual(recorder.links, ["/", "/images/tom.png"])
+
+    def test_template_links(self):
+        template = Template('<link href="/index.css" /><script src="app.js">')
+        self.assertEqual(template.links, ["/index.css", "app.js"])
+
+    def test_internal_path(self):
+        self.assertEqual(internal_path("/blog/tom#top"), "/blog/tom")
+        self.assertEqual(internal_path("tom.png", "/blog/tom/"), "/blog/tom/tom.png")
+        self.assertEqual(internal_path("/images/a%20b.png"), "/images/a b.png")
+        self.assertIsNone(internal_path("https://boot.dev/x"))
+        self.assertIsNone(internal_path("mailto:tom@example.com"))
+        self.assertIsNone(internal_path("#top"))
+
+
+class TestLinkGraph(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = self.tmp.name
+        self.content = os.path.join(root, "content")
+        self.docs = os.path.join(root, "docs")
+        self.template = Template("{{ Content }}", UrlResolver("/"))
+        files = {
+            "index.md": "# Home\n\n[Tom](/blog/tom) and [gone](/blog/gone)",
+            "blog/tom.md": "# Tom\n\n![tom](/images/tom.png) ![lost](lost.png) [home](/)",
+        }
+        for name, text in files.items():
+            path = os.path.join(self.content, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as f:
+                f.write(text)
+        os.makedirs(os.path.join(self.docs, "images"))
+        open(os.path.join(self.docs, "images", "tom.png"), "w").close()
+        self.index = PageIndex.scan(self.content, self.docs)
+        self.pages = [(page.source, page.output) for page in self.index]
+        for _, output in self.pages:
+            os.makedirs(os.path.dirname(output), exist_ok=True)
+        self.home = os.path.join(self.content, "index.md")
+        self.tom = os.path.join(self.content, "blog", "tom.md")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def graph(self, links):
+        graph = LinkGraph(os.path.join(self.tmp.name, "links.json"))
+        for source, page_links in links.items():
+            graph.record(source, page_links, self.index.by_source[source].url)
+        return graph
+
+    def test_check(self):
+        graph = self.graph(render_pages(self.pages, self.template))
+        self.assertEqual(
+            graph.check(self.index, self.docs),
+            [
+                BrokenLink(self.tom, "lost.png"),
+                BrokenLink(self.home, "/blog/gone"),
+            ],
+        )
+        broken = [repr(link) for link in graph.check(self.index, self.docs)]
+        self.assertEqual(
+            broken,
+            [
+                f"Missing image in {self.tom}: lost.png",
+                f"Broken link in {self.home}: /blog/gone",
+            ],
+        )
+
+    def test_only_changed_sources_are_checked(self):
+        graph = self.graph(render_pages(self.pages, self.template))
+        self.assertEqual(len(graph.check(self.index, self.docs, [])), 2)
+        gone = os.path.join(self.docs, "blog", "gone", "index.html")
+        os.makedirs(os.path.dirname(gone))
+        open(gone, "w").close()
+        # Nothing was recorded and no output changed, so the last results stand
+        with mock.patch("os.path.isfile") as isfile:
+            self.assertEqual(len(graph.check(self.index, self.docs, [])), 2)
+        isfile.assert_not_called()
+        self.assertEqual(
+            graph.check(self.index, self.docs, [gone]),
+            [BrokenLink(self.tom, "lost.png")],
+        )
+        tom_links = ["/images/tom.png", "lost.png", "/"]
+        self.assertFalse(graph.record(self.tom, tom_links, "/blog/tom/"))
+        self.assertTrue(graph.record(self.tom, ["/images/tom.png"], "/blog/tom/"))
+        self.assertEqual(graph.check(self.index, self.docs, []), [])
+
+    def test_generated_pages_are_not_broken(self):
+        graph = self.graph({self.home: ["/tags/lore/", "/tags/lore", "/tags/gone/"]})
+        os.makedirs(os.path.join(self.docs, "tags", "lore"))
+        open(os.path.join(self.docs, "tags", "lore", "index.html"), "w").close()
+        self.assertEqual(
+            graph.check(self.index, self.docs),
+            [BrokenLink(self.home, "/tags/gone/")],
+        )
+
+    def test_every_renderer_records_the_same_links(self):
+        serial = render_pages(self.pages, self.template)
+        self.assertEqual(serial, render_pages(self.pages, self.template, jobs=2))
+        self.assertEqual(
+            serial, render_pages_pipelined(self.pages, self.template, io_threads=2)
+        )
+
+    def test_referrers(self):
+        graph = self.graph(render_pages(self.pages, self.template))
+        self.assertEqual(graph.referrers("/images/tom.png"), [self.tom])
+        self.assertEqual(graph.referrers("/blog/tom/lost.png"), [self.tom])
+        self.assertEqual(graph.referrers("/blog/tom/index.html"), [self.home])
+        graph.retain([self.home])
+        self.assertEqual(graph.referrers("/images/tom.png"), [])
+
+    def test_save_and_load(self):
+        graph = self.graph(render_pages(self.pages, self.template))
+        graph.check(self.index, self.docs)
+        graph.save()
+        loaded = LinkGraph.load(graph.path)
+        self.assertEqual(loaded.links, graph.links)
+        self.assertEqual(
+            loaded.broken, {self.home: ["/blog/gone"], self.tom: ["lost.png"]}
+        )
+        self.assertEqual(LinkGraph.load(f"{graph.path}.missing").links, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+import os
+import tempfile
+import unittest
+from listings import group_pages, listing_node, section_url, slugify
+from main import generate_listings
+from manifest import BuildManifest
+from pageindex import PageIndex
+
+POSTS = {
+    "blog/tom.md": "date: 2024-03-01\ntags: [Lore, Tolkien]",
+    "blog/glorfindel.md": "date: 2023-07-11\ntags: lore",
+    "blog/majesty.md": "date: 2024-01-20",
+    "blog/undated.md": "tags: [lore]",
+    "blog/draft.md": "date: 2024-06-01\ndraft: true",
+    "about.md": "date: 2020-01-01",
+}
+
+
+class TestListings(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.content = os.path.join(self.tmp.name, "content")
+        self.docs = os.path.join(self.tmp.name, "docs")
+        self.template = os.path.join(self.tmp.name, "template.html")
+        with open(self.template, "w") as f:
+            f.write("<title>{{ Title }}</title>{{ Content }}")
+        for name, front_matter in POSTS.items():
+            self.write(name, front_matter)
+        self.manifest = BuildManifest(os.path.join(self.tmp.name, "manifest.json"))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, front_matter):
+        path = os.path.join(self.content, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        title = os.path.splitext(os.path.basename(name))[0].title()
+        with open(path, "w") as f:
+            f.write(f"---\n{front_matter}\n---\n# {title}\n\ntext")
+
+    def index(self):
+        return PageIndex.scan(self.content, self.docs)
+
+    def build(self, page_size=2, basepath="/"):
+        """Generates the list pages as the next build would and returns (rendered, skipped)"""
+        self.manifest = self.manifest.successor()
+        return generate_listings(
+            self.index(), self.template, self.docs, basepath, self.manifest, page_size
+        )
+
+    def test_group_pages(self):
+        collections = group_pages(self.index())
+        self.assertEqual(
+            sorted(collections),
+            ["/archive/2020/", "/archive/2023/", "/archive/2024/", "/blog/"]
+            + ["/tags/lore/", "/tags/tolkien/"],
+        )
+        titles = {
+            url: [page.title for page in collection.pages]
+            for url, collection in collections.items()
+        }
+        self.assertEqual(titles["/blog/"], ["Tom", "Majesty", "Glorfindel", "Undated"])
+        self.assertEqual(titles["/tags/lore/"], ["Tom", "Glorfindel", "Undated"])
+        self.assertEqual(titles["/archive/2024/"], ["Tom", "Majesty"])
+        self.assertEqual(collections["/tags/lore/"].title, "Tagged Lore")
+        self.assertEqual(
+            [(number, url) for number, url, _ in collections["/blog/"].paginate(3)],
+            [(1, "/blog/"), (2, "/blog/page/2/")],
+        )
+
+    def test_tags_with_the_same_slug(self):
+        self.write("blog/tom.md", 'date: 2024-03-01\ntags: [Lore, lore, C++, "C#"]')
+        self.write("blog/majesty.md", 'date: 2024-01-20\ntags: ["C#"]')
+        with self.assertLogs("listings", "WARNING") as logs:
+            collections = group_pages(self.index())
+        # Every page is listed once, under the first tag seen
+        titles = [page.title for page in collections["/tags/c/"].pages]
+        self.assertEqual(titles, ["Tom", "Majesty"])
+        self.assertEqual(collections["/tags/c/"].title, "Tagged C++")
+        self.assertEqual(
+            [page.title for page in collections["/tags/lore/"].pages],
+            ["Tom", "Glorfindel", "Undated"],
+        )
+        # Only tags that differ by more than case are warned about, once
+        self.assertEqual(
+            logs.output,
+            ["WARNING:listings:Tags 'C++' and 'C#' are both listed at /tags/c/"],
+        )
+
+    def test_listing_node(self):
+        collection = group_pages(self.index())["/tags/lore/"]
+        html = listing_node(collection, 2, collection.pages[2:], page_size=2).to_html()
+        self.assertEqual(
+            html,
+            '<div><h1>Tagged Lore</h1><ul><li><a href="/blog/undated/">Undated</a></li></ul>'
+            '<nav><a href="/tags/lore/">Newer</a></nav></div>',
+        )
+
+    def test_section_url(self):
+        self.assertEqual(section_url("/blog/tom/"), "/blog/")
+        self.assertEqual(section_url("/blog/tom.html"), "/blog/")
+        self.assertIsNone(section_url("/about/"))
+        self.assertIsNone(section_url("/"))
+        self.assertEqual(slugify("Middle Earth!"), "middle-earth")
+
+    def test_only_changed_memberships_are_rendered(self):
+        self.assertEqual(self.build(), (8, 0))
+        with open(os.path.join(self.docs, "blog", "page", "2", "index.html")) as f:
+            self.assertIn('<a href="/blog/glorfindel/">Glorfindel</a>', f.read())
+        self.assertEqual(self.build(), (0, 8))
+        # Tagging a post changes its tag's list pages, and nothing else
+        self.write("blog/majesty.md", "date: 2024-01-20\ntags: [tolkien]")
+        self.assertEqual(self.build(), (1, 7))
+        # A new post shifts the pages of its section and year from where it lands
+        self.write("blog/new.md", "date: 2023-12-01")
+        self.assertEqual(self.build(), (3, 6))
+        os.remove(os.path.join(self.content, "about.md"))
+        self.build()
+        self.assertEqual(
+            self.manifest.orphans(),
+            [os.path.join(self.docs, "archive", "2020", "index.html")],
+        )
+
+    def test_changed_basepath_is_rendered(self):
+        self.build(basepath="/a/")
+        self.assertEqual(self.build(basepath="/zzz/"), (8, 0))
+        with open(os.path.join(self.docs, "blog", "page", "2", "index.html")) as f:
+            self.assertIn('<a href="/zzz/blog/glorfindel/">', f.read())
+
+    def test_content_pages_win(self):
+        self.write("blog/index.md", "title: My blog")
+        self.build()
+        with open(os.path.join(self.docs, "tags", "lore", "index.html")) as f:
+            self.assertTrue(f.read().startswith("<title>Tagged Lore</title>"))
+        self.assertFalse(os.path.exists(os.path.join(self.docs, "blog", "index.html")))
+
+
+if __name__ == "__main__":
+    unittest.main()
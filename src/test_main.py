@@ -0,0 +1,377 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+from assetmap import AssetMap
+from buildprofile import Profiler
+from linkgraph import LinkGraph
+from main import (
+    BuildOptions,
+    BuildState,
+    build,
+    copy_static,
+    generate_page,
+    generate_pages_recursive,
+    make_output_directories,
+    rebuild,
+    render_pages,
+)
+from manifest import BuildManifest
+from pageindex import PageIndex
+from pipeline import stream_page
+from template import Template
+from urlresolver import UrlResolver
+
+
+class TestRenderPages(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.content = os.path.join(self.root, "content")
+        self.template = os.path.join(self.root, "template.html")
+        with open(self.template, "w") as t:
+            t.write('<title>{{ Title }}</title><link href="/index.css" />{{ Content }}')
+        for name in ["", "first", "second", "third"]:
+            os.makedirs(os.path.join(self.content, name), exist_ok=True)
+            with open(os.path.join(self.content, name, "index.md"), "w") as f:
+                f.write(f"# Page {name}\n\nSome **bold** text and a [link](/{name})")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def pages(self, dest):
+        """Returns a (source, destination) pair for every page, creating the destination directories"""
+        pages = [
+            (page.source, page.output)
+            for page in PageIndex.scan(self.content, dest, headers=False)
+        ]
+        make_output_directories(pages)
+        return pages
+
+    def build(self, dest, jobs):
+        """Renders the whole content directory into dest and returns every output file's contents"""
+        pages = self.pages(dest)
+        template = Template.load(self.template, UrlResolver("/base/"))
+        render_pages(pages, template, jobs)
+        outputs = {}
+        for source, destination in pages:
+            with open(destination) as f:
+                outputs[os.path.relpath(destination, dest)] = f.read()
+        return outputs
+
+    def test_output_directories(self):
+        dest = os.path.join(self.root, "docs")
+        pages = self.pages(dest)
+        self.assertEqual(len(pages), 4)
+        self.assertIn(
+            (f"{self.content}/first/index.md", f"{dest}/first/index.html"), pages
+        )
+        self.assertTrue(os.path.isdir(os.path.join(dest, "second")))
+
+    def test_parallel_output_is_identical(self):
+        serial = self.build(os.path.join(self.root, "serial"), jobs=1)
+        parallel = self.build(os.path.join(self.root, "parallel"), jobs=2)
+        self.assertEqual(serial, parallel)
+        self.assertIn('<a href="/base/first">link</a>', serial["first/index.html"])
+
+    def test_profiled_output_is_identical(self):
+        serial = self.build(os.path.join(self.root, "serial"), jobs=1)
+        dest = os.path.join(self.root, "profiled")
+        pages = self.pages(dest)
+        profiler = Profiler()
+        template = Template.load(self.template, UrlResolver("/base/"))
+        render_pages(pages, template, 1, None, profiler)
+        for source, destination in pages:
+            with open(destination) as f:
+                self.assertEqual(f.read(), serial[os.path.relpath(destination, dest)])
+        self.assertEqual(len(profiler.pages), 4)
+        self.assertEqual(profiler.phases["inline parsing"][2], 8)
+
+    def test_profiled_huge_pages_are_streamed(self):
+        serial = self.build(os.path.join(self.root, "serial"), jobs=1)
+        dest = os.path.join(self.root, "profiled")
+        pages = self.pages(dest)
+        profiler = Profiler()
+        template = Template.load(self.template, UrlResolver("/base/"))
+        with mock.patch("pipeline.STREAMING_THRESHOLD", 0):
+            with mock.patch("main.stream_page", wraps=stream_page) as stream:
+                render_pages(pages, template, 1, None, profiler)
+        self.assertEqual(stream.call_count, 4)
+        for source, destination in pages:
+            with open(destination) as f:
+                self.assertEqual(f.read(), serial[os.path.relpath(destination, dest)])
+        self.assertEqual(profiler.phases["stream"][2], 4)
+        self.assertNotIn("to_html", profiler.phases)
+
+    def test_parallel_failure_is_reported(self):
+        with open(os.path.join(self.content, "second", "index.md"), "w") as f:
+            f.write("No title here")
+        with self.assertRaises(RuntimeError, msg="1 of 4 pages failed to generate"):
+            self.build(os.path.join(self.root, "docs"), jobs=2)
+
+
+class TestDependencies(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.content = os.path.join(self.root, "content")
+        self.static = os.path.join(self.root, "static")
+        self.docs = os.path.join(self.root, "docs")
+        self.template = os.path.join(self.root, "template.html")
+        files = {
+            "template.html": "{{ Content }}",
+            "content/index.md": "# Home",
+            "content/blog/template.html": "{{> footer.html }}{{ Content }}",
+            "content/blog/footer.html": "<footer></footer>",
+            "content/blog/tom.md": "# Tom\n\n![tom](/images/tom.png)",
+            "content/blog/glorfindel.md": "# Glorfindel",
+            "static/images/tom.png": "png",
+        }
+        for name, text in files.items():
+            path = os.path.join(self.root, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as f:
+                f.write(text)
+        self.manifest = BuildManifest(os.path.join(self.root, "manifest.json"))
+        self.link_graph = LinkGraph(os.path.join(self.root, "links.json"))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def build(self, assets=None):
+        """Builds the site into docs and returns the sources of the pages that were rendered"""
+        self.manifest = self.manifest.successor()
+        copy_static(self.static, self.docs, self.manifest, assets=assets)
+        with mock.patch("main.generate_page", wraps=generate_page) as generate:
+            state = BuildState(
+                self.manifest,
+                PageIndex.scan(self.content, self.docs),
+                self.link_graph,
+                assets,
+            )
+            generate_pages_recursive(
+                BuildOptions(fingerprint=assets is not None),
+                state,
+                self.template,
+                self.static,
+            )
+        return sorted(
+            os.path.relpath(call.args[0], self.content)
+            for call in generate.call_args_list
+        )
+
+    def touch(self, name, text):
+        with open(os.path.join(self.root, name), "a") as f:
+            f.write(text)
+
+    def test_changed_inputs_invalidate_their_dependents(self):
+        everything = ["blog/glorfindel.md", "blog/tom.md", "index.md"]
+        self.assertEqual(self.build(), everything)
+        self.assertEqual(self.build(), [])
+        self.touch("static/images/tom.png", "!")
+        self.assertEqual(self.build(), ["blog/tom.md"])
+        self.touch("content/blog/footer.html", "<p></p>")
+        self.assertEqual(self.build(), ["blog/glorfindel.md", "blog/tom.md"])
+        self.touch("template.html", " ")
+        self.assertEqual(self.build(), ["index.md"])
+        with open(os.path.join(self.docs, "blog", "tom", "index.html")) as f:
+            self.assertTrue(f.read().startswith("<footer></footer><p></p><div><h1>Tom"))
+        self.assertEqual(
+            self.manifest.successor().dependents(
+                os.path.join(self.static, "images", "tom.png")
+            ),
+            [os.path.join(self.content, "blog", "tom.md")],
+        )
+
+    def test_static_inputs_are_recorded_when_rendering(self):
+        self.touch(
+            "content/index.md", "\n\n![shire](/images/shire.png) [tom](/blog/tom)"
+        )
+        self.build()
+        shire = os.path.join(self.static, "images", "shire.png")
+        entry = self.manifest.current[os.path.join(self.content, "index.md")]
+        self.assertEqual(list(entry["deps"]["inputs"]), [self.template, shire])
+        # Unchanged pages are checked against the recorded paths, without resolving any link
+        with mock.patch("main.internal_path") as internal_path:
+            self.assertEqual(self.build(), [])
+        internal_path.assert_not_called()
+        # A missing image showing up counts as a change too
+        self.touch("static/images/shire.png", "png")
+        self.assertEqual(self.build(), ["index.md"])
+
+    def test_fingerprinted_assets(self):
+        with open(self.template, "w") as f:
+            f.write('<link href="/index.css" />{{ Content }}')
+        self.touch("static/index.css", "body {}")
+        os.makedirs(self.docs)
+        assets = AssetMap(os.path.join(self.root, "assets.json"))
+        self.assertEqual(len(self.build(assets)), 3)
+        css = assets.fingerprints["/index.css"]
+        with open(os.path.join(self.docs, "index.html")) as f:
+            self.assertEqual(f.read(), f'<link href="{css}" /><div><h1>Home</h1></div>')
+        with open(os.path.join(self.docs, "blog", "tom", "index.html")) as f:
+            self.assertIn(assets.fingerprints["/images/tom.png"], f.read())
+        # Every page rendered with the template links to the stylesheet
+        self.touch("static/index.css", "a {}")
+        self.assertEqual(self.build(assets), ["index.md"])
+        self.assertNotEqual(assets.fingerprints["/index.css"], css)
+        self.assertEqual(self.manifest.orphans(), [os.path.join(self.docs, css[1:])])
+
+
+class TestRebuild(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        files = {
+            "template.html": "{{ Content }}",
+            "content/index.md": "# Home",
+            "content/blog/template.html": "{{> footer.html }}{{ Content }}",
+            "content/blog/footer.html": "<footer></footer>",
+            "content/blog/tom.md": "# Tom\n\n![tom](/images/tom.png)",
+            "content/blog/glorfindel.md": "# Glorfindel",
+            "static/images/tom.png": "png",
+        }
+        for name, text in files.items():
+            path = os.path.join(self.tmp.name, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as f:
+                f.write(text)
+        # Builds work on content, static and docs in the working directory
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(self.tmp.name)
+        os.makedirs("docs")
+        self.options = BuildOptions()
+        self.state = build(self.options)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def rebuild(self, *names):
+        """Appends to the files at names and rebuilds from them; returns the sources of the pages that were rendered, or None if it took a full build"""
+        for name in names:
+            with open(name, "a") as f:
+                f.write("!")
+        with mock.patch("main.generate_page", wraps=generate_page) as generate:
+            state = rebuild(self.options, self.state, set(names))
+        if state is None:
+            return None
+        self.state = state
+        return sorted(call.args[0] for call in generate.call_args_list)
+
+    def read(self, name):
+        with open(os.path.join("docs", name)) as f:
+            return f.read()
+
+    def test_only_affected_pages_are_rendered(self):
+        tom = os.path.join("content", "blog", "tom.md")
+        glorfindel = os.path.join("content", "blog", "glorfindel.md")
+        self.assertEqual(self.rebuild(tom), [tom])
+        self.assertIn(" />!</p>", self.read("blog/tom/index.html"))
+        # Pages are found through the template, partials and static files they depend on
+        footer = os.path.join("content", "blog", "footer.html")
+        self.assertEqual(self.rebuild(footer), [glorfindel, tom])
+        self.assertIn("<footer></footer>!", self.read("blog/glorfindel/index.html"))
+        image = os.path.join("static", "images", "tom.png")
+        self.assertEqual(self.rebuild(image), [tom])
+        self.assertEqual(self.read("images/tom.png"), "png!")
+        self.assertEqual(self.rebuild("template.html"), ["content/index.md"])
+        # Templates that weren't compiled again keep their partials
+        self.assertEqual(self.state.includes(), [footer])
+        # What the rebuilds recorded leaves nothing for a full build to do
+        with mock.patch("main.generate_page", wraps=generate_page) as generate:
+            build(self.options)
+        generate.assert_not_called()
+
+    def test_changed_front_matter_is_read_again(self):
+        tom = os.path.join("content", "blog", "tom.md")
+        with open(tom, "w") as f:
+            f.write("---\ntitle: Tom Bombadil\n---\nHey dol")
+        self.rebuild(tom)
+        self.assertEqual(self.state.index.by_source[tom].title, "Tom Bombadil")
+
+    def test_toggling_fingerprints_renders_every_page(self):
+        fingerprinted = BuildOptions(fingerprint=True)
+        with mock.patch("main.generate_page", wraps=generate_page) as generate:
+            build(fingerprinted)
+        self.assertEqual(generate.call_count, 3)
+        self.assertRegex(self.read("blog/tom/index.html"), r"/images/tom\.\w{8}\.png")
+        with mock.patch("main.generate_page", wraps=generate_page) as generate:
+            build(self.options)
+        self.assertEqual(generate.call_count, 3)
+        self.assertIn('src="/images/tom.png"', self.read("blog/tom/index.html"))
+
+    def test_added_or_deleted_files_take_a_full_build(self):
+        self.assertIsNone(self.rebuild(os.path.join("content", "blog", "new.md")))
+        os.remove(os.path.join("static", "images", "tom.png"))
+        self.assertIsNone(rebuild(self.options, self.state, {"static/images/tom.png"}))
+
+
+class TestCopyStatic(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.static = os.path.join(self.tmp.name, "static")
+        self.docs = os.path.join(self.tmp.name, "docs")
+        os.makedirs(os.path.join(self.static, "images"))
+        os.makedirs(self.docs)
+        with open(os.path.join(self.static, "index.css"), "w") as f:
+            f.write("body { color: red; }")
+        with open(os.path.join(self.static, "images", "tom.png"), "wb") as f:
+            f.write(b"\x89PNG" + bytes(1000))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_copy_then_skip(self):
+        report = copy_static(self.static, self.docs)
+        self.assertEqual((report.copied_files, report.copied_bytes), (2, 1024))
+        with open(os.path.join(self.docs, "images", "tom.png"), "rb") as f:
+            self.assertEqual(f.read(4), b"\x89PNG")
+        report = copy_static(self.static, self.docs)
+        self.assertEqual((report.copied_files, report.skipped_files), (0, 2))
+        self.assertEqual(report.skipped_bytes, 1024)
+
+    def test_changed_file_is_copied(self):
+        copy_static(self.static, self.docs)
+        with open(os.path.join(self.static, "index.css"), "w") as f:
+            f.write("body { color: blue; }")
+        report = copy_static(self.static, self.docs)
+        self.assertEqual((report.copied_files, report.skipped_files), (1, 1))
+        with open(os.path.join(self.docs, "index.css")) as f:
+            self.assertEqual(f.read(), "body { color: blue; }")
+
+    def test_fingerprint(self):
+        assets = AssetMap(os.path.join(self.tmp.name, "assets.json"))
+        report = copy_static(self.static, self.docs, assets=assets)
+        self.assertEqual(report.copied_files, 2)
+        css = assets.fingerprints["/index.css"]
+        self.assertRegex(css, r"^/index\.[0-9a-f]{8}\.css$")
+        self.assertRegex(
+            assets.fingerprints["/images/tom.png"], r"^/images/tom\.[0-9a-f]{8}\.png$"
+        )
+        for name in ["index.css", css[1:]]:
+            with open(os.path.join(self.docs, name)) as f:
+                self.assertEqual(f.read(), "body { color: red; }")
+        report = copy_static(self.static, self.docs, assets=assets)
+        self.assertEqual(report.skipped_files, 2)
+
+    def test_hardlink_mode(self):
+        copy_static(self.static, self.docs, mode="hardlink")
+        self.assertTrue(
+            os.path.samefile(
+                os.path.join(self.static, "index.css"),
+                os.path.join(self.docs, "index.css"),
+            )
+        )
+
+    def test_reflink_mode(self):
+        # Falls back to a copy on filesystems without reflinks
+        copy_static(self.static, self.docs, mode="reflink")
+        with open(os.path.join(self.docs, "index.css")) as f:
+            self.assertEqual(f.read(), "body { color: red; }")
+
+    def test_missing_source(self):
+        with self.assertRaises(ValueError, msg="Source does not exist"):
+            copy_static(os.path.join(self.tmp.name, "missing"), self.docs)
+
+
+if __name__ == "__main__":
+    unittest.main()
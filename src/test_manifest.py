@@ -0,0 +1,127 @@
+import os
+import tempfile
+import unittest
+from manifest import BuildManifest
+
+
+class TestBuildManifest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.manifest_path = os.path.join(self.root, "cache", "manifest.json")
+        self.source = os.path.join(self.root, "page.md")
+        self.output = os.path.join(self.root, "out", "page", "index.html")
+        with open(self.source, "w") as f:
+            f.write("# Hello")
+        os.makedirs(os.path.dirname(self.output))
+        with open(self.output, "w") as f:
+            f.write("<h1>Hello</h1>")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def rebuild(self):
+        """Saves the current manifest and loads it again, as the next build would"""
+        self.manifest.save()
+        self.manifest = BuildManifest.load(self.manifest_path)
+
+    def test_missing_manifest_is_empty(self):
+        manifest = BuildManifest.load(self.manifest_path)
+        self.assertTrue(manifest.is_empty())
+
+    def test_first_build_is_changed(self):
+        self.manifest = BuildManifest.load(self.manifest_path)
+        self.assertFalse(self.manifest.unchanged(self.source, self.output))
+
+    def test_noop_rebuild_is_unchanged(self):
+        self.manifest = BuildManifest.load(self.manifest_path)
+        self.manifest.unchanged(self.source, self.output, basepath="/")
+        self.rebuild()
+        self.assertFalse(self.manifest.is_empty())
+        self.assertTrue(self.manifest.unchanged(self.source, self.output, basepath="/"))
+
+    def test_edited_source_is_changed(self):
+        self.manifest = BuildManifest.load(self.manifest_path)
+        self.manifest.unchanged(self.source, self.output)
+        self.rebuild()
+        with open(self.source, "w") as f:
+            f.write("# Hello, world")
+        self.assertFalse(self.manifest.unchanged(self.source, self.output))
+
+    def test_changed_deps_are_changed(self):
+        self.manifest = BuildManifest.load(self.manifest_path)
+        self.manifest.unchanged(self.source, self.output, basepath="/")
+        self.rebuild()
+        self.assertFalse(
+            self.manifest.unchanged(self.source, self.output, basepath="/blog/")
+        )
+
+    def test_missing_output_is_changed(self):
+        self.manifest = BuildManifest.load(self.manifest_path)
+        self.manifest.unchanged(self.source, self.output)
+        self.rebuild()
+        os.remove(self.output)
+        self.assertFalse(self.manifest.unchanged(self.source, self.output))
+
+    def test_dependents(self):
+        self.manifest = BuildManifest.load(self.manifest_path)
+        template = os.path.join(self.root, "template.html")
+        with open(template, "w") as f:
+            f.write("{{ Content }}")
+        inputs = {template: self.manifest.fingerprint(template)}
+        self.manifest.unchanged(self.source, self.output, inputs=inputs)
+        self.rebuild()
+        self.assertEqual(self.manifest.dependents(template), [self.source])
+        self.assertEqual(self.manifest.dependents(self.output), [])
+
+    def test_carry_over(self):
+        self.manifest = BuildManifest.load(self.manifest_path)
+        template = os.path.join(self.root, "template.html")
+        with open(template, "w") as f:
+            f.write("{{ Content }}")
+        self.manifest.fingerprint(template)
+        self.manifest.unchanged(self.source, self.output, basepath="/")
+        self.manifest.unchanged(self.output, [f"{self.output}.gz"])
+        listing = os.path.join(self.root, "out", "blog", "index.html")
+        self.manifest.generated("listing:/blog/", listing, members=[])
+        self.rebuild()
+        self.manifest.carry_over(skip=[template])
+        # Post-processed outputs and generated ones are left to their own steps
+        self.assertEqual(list(self.manifest.current), [self.source])
+        self.manifest.unchanged(self.source, self.output, basepath="/blog/")
+        self.assertEqual(self.manifest.previous[self.source]["deps"], {"basepath": "/"})
+
+    def test_remove_orphans(self):
+        self.manifest = BuildManifest.load(self.manifest_path)
+        self.manifest.unchanged(self.source, self.output)
+        self.rebuild()
+        # The source was deleted, so nothing records its output this time around
+        out_root = os.path.join(self.root, "out")
+        self.assertEqual(self.manifest.orphans(), [self.output])
+        self.assertEqual(self.manifest.remove_orphans(out_root), [self.output])
+        self.assertFalse(os.path.exists(os.path.dirname(self.output)))
+        self.assertTrue(os.path.isdir(out_root))
+
+    def test_several_outputs(self):
+        self.manifest = BuildManifest.load(self.manifest_path)
+        sibling = f"{self.output}.gz"
+        open(sibling, "w").close()
+        self.manifest.unchanged(self.output, [sibling])
+        self.rebuild()
+        self.assertEqual(self.manifest.orphans(), [sibling])
+        self.assertTrue(self.manifest.unchanged(self.output, [sibling]))
+        os.remove(sibling)
+        self.assertFalse(self.manifest.unchanged(self.output, [sibling]))
+
+    def test_refresh(self):
+        self.manifest = BuildManifest.load(self.manifest_path)
+        self.manifest.unchanged(self.output, [], minify=True)
+        with open(self.output, "w") as f:
+            f.write("<h1>Hi</h1>")
+        self.manifest.refresh(self.output)
+        self.rebuild()
+        self.assertTrue(self.manifest.unchanged(self.output, [], minify=True))
+
+
+if __name__ == "__main__":
+    unittest.main()
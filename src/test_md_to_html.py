@@ -1,13 +1,25 @@
+import io
+import random
 import unittest
+from unittest import mock
+import md_to_html
+from leafnode import LeafNode
 from md_to_html import (
+    BlockType,
+    block_to_block_type,
+    blocks_to_html_node,
     extract_markdown_images,
     extract_markdown_links,
+    find_markdown_images,
+    find_markdown_links,
     markdown_to_html_node,
     split_nodes_delimiter,
     split_nodes_image,
     split_nodes_link,
     text_to_textnodes,
     markdown_to_blocks,
+    read_blocks,
+    register_block_parser,
 )
 from textnode import TextNode, TextType
 
@@ -246,6 +258,72 @@ class TestExtractMarkdownLinks(unittest.TestCase):
             ),
         )
 
+    def test_find_returns_spans_and_groups(self):
+        text = "![image](/a.png) then [link](/b) and [another](/c)"
+        images = find_markdown_images(text)
+        links = find_markdown_links(text)
+        self.assertEqual([image.span() for image in images], [(0, 16)])
+        self.assertEqual(images[0].groups(), ("image", "/a.png"))
+        self.assertEqual(
+            [(link.span(), link.groups()) for link in links],
+            [((22, 32), ("link", "/b")), ((37, 50), ("another", "/c"))],
+        )
+
+
+class TestBlockToBlockType(unittest.TestCase):
+    def test_block_types(self):
+        blocks = {
+            "# Heading": BlockType.HEADING,
+            "##### Small heading": BlockType.HEADING,
+            "####### Too many": BlockType.PARAGRAPH,
+            "#hashtag": BlockType.PARAGRAPH,
+            "```\ncode\n```": BlockType.CODE,
+            "> quote\n> more": BlockType.QUOTE,
+            "> quote\nnot quoted": BlockType.PARAGRAPH,
+            "- one\n- two": BlockType.UNORDERED_LIST,
+            "- one\ntwo": BlockType.PARAGRAPH,
+            "1. one\n2. two": BlockType.ORDERED_LIST,
+            "1984 was a year": BlockType.PARAGRAPH,
+            "Just text": BlockType.PARAGRAPH,
+        }
+        for block, block_type in blocks.items():
+            self.assertEqual(block_to_block_type(block), block_type, block)
+
+
+class TestRegisterBlockParser(unittest.TestCase):
+    def setUp(self):
+        # Registering builds new lists, so a shallow copy is enough to restore the registry
+        patcher = mock.patch.dict(md_to_html.BLOCK_PARSERS)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_new_block_type(self):
+        def is_rule(block):
+            return set(block) <= set("-*")
+
+        register_block_parser("-*", "hr", is_rule, lambda _: LeafNode(None, "<hr />"))
+        self.assertEqual(block_to_block_type("---"), "hr")
+        self.assertEqual(block_to_block_type("- one"), BlockType.UNORDERED_LIST)
+        self.assertEqual(block_to_block_type("*bold*"), BlockType.PARAGRAPH)
+        self.assertEqual(
+            markdown_to_html_node("***\n\n- one").to_html(),
+            "<div><hr /><ul><li>one</li></ul></div>",
+        )
+
+    def test_first_takes_over_built_in_blocks(self):
+        def fenced_code(block):
+            language, _, code = block.strip("`").partition("\n")
+            html = f'<pre><code class="language-{language}">{code}</code></pre>'
+            return LeafNode(None, html)
+
+        register_block_parser(
+            "`", "fenced", lambda block: block[3:4].isalpha(), fenced_code, first=True
+        )
+        self.assertEqual(
+            markdown_to_html_node("```python\nx = 1\n```\n\n```\ny\n```").to_html(),
+            '<div><pre><code class="language-python">x = 1\n</code></pre><pre><code>y\n</code></pre></div>',
+        )
+
 
 class TestSplitImages(unittest.TestCase):
     def test_split_images(self):
@@ -438,6 +516,31 @@ class TestTextToTextnodes(unittest.TestCase):
             ],
         )
 
+    def test_matches_split_nodes_chain(self):
+        # text_to_textnodes has to produce exactly what chaining the split_nodes_* functions does, quirks included
+        texts = [
+            "_a **b_ c** d_",
+            "! *****",
+            "a** ***",
+            "`a **b** c` and ![](/empty.png) and [](/empty)",
+            "![x](/y)[a](/b) **unclosed",
+            "[link](http://a_b_c) with `code` _and_ **bold**",
+        ]
+        for text in texts:
+            nodes = [TextNode(text, TextType.TEXT)]
+            nodes = split_nodes_delimiter(nodes, "**", TextType.BOLD)
+            nodes = split_nodes_delimiter(nodes, "_", TextType.ITALIC)
+            nodes = split_nodes_delimiter(nodes, "`", TextType.CODE)
+            nodes = split_nodes_link(split_nodes_image(nodes))
+            expected = [node for node in nodes if len(node.text) > 0]
+            self.assertEqual(text_to_textnodes(text), expected, text)
+
+    def test_many_spans_without_recursion(self):
+        text = "**bold** [link](/url) " * 20000
+        nodes = text_to_textnodes(text)
+        self.assertEqual(len(nodes), 80000)
+        self.assertEqual(nodes[-2], TextNode("link", TextType.LINKS, "/url"))
+
     def test_markdown_to_blocks(self):
         md = """This is **bolded** paragraph
 
@@ -456,6 +559,29 @@ This is the same paragraph on a new line
             ],
         )
 
+    def test_read_blocks_matches_split(self):
+        rng = random.Random(0)
+        pieces = ["a", "b c", "\n", "\n\n", "  ", "\t", "# h", "- i"]
+        for _ in range(2000):
+            md = "".join(rng.choice(pieces) for _ in range(rng.randint(0, 20)))
+            expected = [
+                block.strip() for block in md.split("\n\n") if block.strip()
+            ]
+            self.assertEqual(markdown_to_blocks(md), expected, repr(md))
+            for chunk_size in (1, 2, 3, 7):
+                blocks = list(read_blocks(io.StringIO(md), chunk_size))
+                self.assertEqual(blocks, expected, (repr(md), chunk_size))
+
+    def test_blocks_to_html_node_is_lazy(self):
+        md = "# Title\n\nSome **bold**\n\n- a list\n- of items\n\n> a quote"
+        blocks = read_blocks(io.StringIO(md), chunk_size=4)
+        node = blocks_to_html_node(blocks)
+        # Nothing has been read until the node is rendered
+        self.assertEqual(next(blocks), "# Title")
+        self.assertEqual(
+            node.to_html(), markdown_to_html_node(md.split("\n\n", 1)[1]).to_html()
+        )
+
     def test_paragraphs(self):
         md = """
 This is **bolded** paragraph
@@ -0,0 +1,159 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+import pageindex
+from pageindex import HeaderCache, PageIndex, output_path, read_metadata
+
+
+class TestPageIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.content = os.path.join(self.tmp.name, "content")
+        self.docs = os.path.join(self.tmp.name, "docs")
+        files = {
+            "index.md": "# Home\n\nWelcome",
+            "about.md": "# About us\n",
+            "blog/index.md": "# Blog",
+            "blog/first.md": "# First post\n\ntext",
+            "blog/second.md": "# Second post",
+            "blog/notes.txt": "not a page",
+        }
+        for name, text in files.items():
+            path = os.path.join(self.content, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as f:
+                f.write(text)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_output_path(self):
+        self.assertEqual(output_path("index.md", "docs"), ("docs/index.html", "/"))
+        self.assertEqual(
+            output_path("blog/index.md", "docs"), ("docs/blog/index.html", "/blog/")
+        )
+        self.assertEqual(
+            output_path("blog/first.md", "docs"),
+            ("docs/blog/first/index.html", "/blog/first/"),
+        )
+        self.assertEqual(
+            output_path("blog/first.md", "docs", pretty_urls=False),
+            ("docs/blog/first.html", "/blog/first.html"),
+        )
+
+    def test_scan(self):
+        index = PageIndex.scan(self.content, self.docs)
+        self.assertEqual(len(index), 5)
+        self.assertEqual(
+            [page.source for page in index],
+            sorted(page.source for page in index),
+        )
+        page = index.by_source[os.path.join(self.content, "blog", "first.md")]
+        self.assertEqual(page.output, os.path.join(self.docs, "blog/first/index.html"))
+        self.assertEqual(page.url, "/blog/first/")
+        self.assertEqual(page.title, "First post")
+        self.assertEqual(page.mtime_ns, os.stat(page.source).st_mtime_ns)
+        # Nothing is written while indexing
+        self.assertFalse(os.path.exists(self.docs))
+
+    def test_same_output_is_an_error(self):
+        about = os.path.join(self.content, "about", "index.md")
+        os.makedirs(os.path.dirname(about))
+        with open(about, "w") as f:
+            f.write("# About the Shire")
+        with self.assertRaises(ValueError) as error:
+            PageIndex.scan(self.content, self.docs)
+        self.assertEqual(
+            str(error.exception),
+            f"{os.path.join(self.content, 'about.md')} and {about} would both be written"
+            f" to {os.path.join(self.docs, 'about', 'index.html')}",
+        )
+        # Without pretty urls they don't collide
+        self.assertEqual(len(PageIndex.scan(self.content, self.docs, False)), 6)
+
+    def test_template_for(self):
+        with open(os.path.join(self.content, "blog", "template.html"), "w") as f:
+            f.write("{{ Content }}")
+        index = PageIndex.scan(self.content, self.docs)
+        blog_template = os.path.join(self.content, "blog", "template.html")
+        blog = os.path.join(self.content, "blog")
+        self.assertEqual(index.templates, {blog: blog_template})
+        first = os.path.join(self.content, "blog", "first.md")
+        self.assertEqual(index.template_for(first, "template.html"), blog_template)
+        home = os.path.join(self.content, "index.md")
+        self.assertEqual(index.template_for(home, "template.html"), "template.html")
+
+    def test_find(self):
+        index = PageIndex.scan(self.content, self.docs)
+        self.assertEqual(index.find("/about").title, "About us")
+        self.assertEqual(index.find("/about/").title, "About us")
+        self.assertEqual(index.find("/blog/index.html#top").title, "Blog")
+        self.assertEqual(index.find("/").title, "Home")
+        self.assertIsNone(index.find("/missing"))
+
+    def test_read_metadata(self):
+        path = os.path.join(self.content, "blog", "third.md")
+        with open(path, "w") as f:
+            f.write("---\ntags: [lore]\n---\n# Third post\n\n[")
+        self.assertEqual(read_metadata(path), ({"tags": ["lore"]}, "Third post"))
+        with open(path, "w") as f:
+            f.write("No heading\n# Later")
+        self.assertEqual(read_metadata(path), ({}, None))
+        with open(path, "w") as f:
+            f.write("---\ntitle: Titled\ndate: 2024-01-05\n---\nNo heading")
+        index = PageIndex.scan(self.content, self.docs)
+        page = index.by_source[path]
+        self.assertEqual(page.title, "Titled")
+        self.assertEqual(str(page.metadata["date"]), "2024-01-05")
+        self.assertEqual(index.find("/").metadata, {})
+
+    def test_invalid_front_matter_names_the_file(self):
+        broken = []
+        for name in ["blog/first.md", "blog/second.md"]:
+            broken.append(os.path.join(self.content, name))
+            with open(broken[-1], "w") as f:
+                f.write("---\ntitle: [unclosed\n---\ntext")
+        with self.assertLogs("pageindex", "ERROR") as logs:
+            with self.assertRaises(ValueError) as error:
+                PageIndex.scan(self.content, self.docs)
+        self.assertEqual(str(error.exception), "2 of 5 pages have invalid front matter")
+        self.assertEqual(
+            sorted(line.split(": ")[0] for line in logs.output),
+            [f"ERROR:pageindex:{path}" for path in broken],
+        )
+        with self.assertRaisesRegex(ValueError, f"^{broken[0]}: invalid front matter"):
+            read_metadata(broken[0])
+
+    def test_header_cache(self):
+        path = os.path.join(self.content, "blog", "first.md")
+        with open(path, "w") as f:
+            f.write("---\ntitle: First\ndate: 2024-01-05T10:30:00+02:00\n")
+            f.write("tags: [lore]\nseen: !!set {a}\n---\ntext")
+        cache_path = os.path.join(self.tmp.name, "headers.json")
+        cache = HeaderCache.load(cache_path)
+        uncached = PageIndex.scan(self.content, self.docs, cache=cache)
+        cache.save()
+        with mock.patch.object(pageindex, "read_metadata", wraps=read_metadata) as read:
+            cache = HeaderCache.load(cache_path)
+            index = PageIndex.scan(self.content, self.docs, cache=cache)
+        for page, expected in zip(index, uncached):
+            self.assertEqual(
+                (page.title, page.metadata), (expected.title, expected.metadata)
+            )
+        self.assertEqual(
+            index.by_source[path].metadata["date"].utcoffset().seconds, 2 * 60 * 60
+        )
+        # Only the page whose front matter JSON can't hold was read again
+        read.assert_called_once_with(path)
+        os.remove(os.path.join(self.content, "about.md"))
+        with open(os.path.join(self.content, "index.md"), "a") as f:
+            f.write("\n\nmore")
+        cache = HeaderCache.load(cache_path)
+        PageIndex.scan(self.content, self.docs, cache=cache)
+        self.assertEqual(len(cache.current), 3)
+        self.assertNotEqual(cache.current, cache.previous)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,3 +1,4 @@
+import io
 import unittest
 from parentnode import ParentNode
 from leafnode import LeafNode
@@ -66,3 +67,60 @@ class TestParentNode(unittest.TestCase):
         node = ParentNode("p", [ParentNode(children=[LeafNode("b", "Bold text")])])
         with self.assertRaises(ValueError, msg="tag cannot be None"):
             node.to_html()
+
+    def test_to_html_resolves_urls(self):
+        node = ParentNode(
+            "p",
+            [
+                LeafNode("a", "Home", {"href": "/"}),
+                ParentNode(
+                    "b", [LeafNode("img", "", {"src": "/tom.png", "alt": "Tom"})]
+                ),
+            ],
+        )
+        self.assertEqual(
+            node.to_html(lambda url: f"/base{url}"),
+            '<p><a href="/base/">Home</a><b><img src="/base/tom.png" alt="Tom" /></b></p>',
+        )
+
+    def test_iter_html_chunks(self):
+        node = ParentNode(
+            "p", [LeafNode("b", "Bold text"), ParentNode("i", [LeafNode(None, "x")])]
+        )
+        self.assertEqual(
+            list(node.iter_html()),
+            ["<p>", "<b>Bold text</b>", "<i>", "x", "</i>", "</p>"],
+        )
+
+    def test_none_child_is_skipped(self):
+        node = ParentNode("p", [None, LeafNode("b", "x"), None, LeafNode(None, "y")])
+        self.assertEqual(node.to_html(), "<p><b>x</b>y</p>")
+        self.assertEqual(list(node.iter_html()), ["<p>", "<b>x</b>", "y", "</p>"])
+
+    def test_iter_leaves(self):
+        b, x, y = LeafNode("b", "Bold"), LeafNode(None, "x"), LeafNode(None, "y")
+        node = ParentNode("p", [b, None, ParentNode("i", [x, None]), y])
+        self.assertEqual(list(node.iter_leaves()), [b, x, y])
+
+    def test_write_html(self):
+        node = ParentNode("div", [LeafNode("a", "Home", {"href": "/"})])
+        fp = io.StringIO()
+        node.write_html(fp, lambda url: f"/base{url}")
+        self.assertEqual(fp.getvalue(), '<div><a href="/base/">Home</a></div>')
+
+    def test_to_html_deeply_nested(self):
+        node = LeafNode(None, "deep")
+        for _ in range(10000):
+            node = ParentNode("span", [node])
+        html = node.to_html()
+        self.assertTrue(html.startswith("<span><span>"))
+        self.assertEqual(len(html), 10000 * len("<span></span>") + len("deep"))
+
+    def test_parent_attributes(self):
+        child_node = LeafNode("span", "child")
+        node = ParentNode("div", [child_node], {"class": "post"})
+        self.assertEqual(node.tag, "div")
+        self.assertIsNone(node.value)
+        self.assertEqual(node.children, [child_node])
+        self.assertEqual(node.props, {"class": "post"})
+        self.assertFalse(hasattr(node, "__dict__"))
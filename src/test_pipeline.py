@@ -0,0 +1,101 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+from main import make_output_directories, render_pages
+from md_to_html import blocks_to_html_node
+from pageindex import PageIndex
+from pipeline import render_pages_pipelined
+from template import Template
+from urlresolver import UrlResolver
+
+
+class TestRenderPagesPipelined(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.content = os.path.join(self.root, "content")
+        self.template = Template(
+            '<title>{{ Title }}</title><link href="/index.css" />{{ Content }}',
+            UrlResolver("/base/"),
+            "template.html",
+        )
+        for number in range(10):
+            directory = os.path.join(self.content, f"post{number}")
+            os.makedirs(directory)
+            with open(os.path.join(directory, "index.md"), "w") as f:
+                f.write(f"# Post {number}\n\n_Some_ text with a [link](/post{number})")
+        # Every renderer strips front matter and takes the title from it
+        with open(os.path.join(self.content, "post1", "index.md"), "r+") as f:
+            markdown = f.read()
+            f.seek(0)
+            f.write(f"---\ntitle: Front matter\ntags: [a, b]\n---\n\n{markdown}")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def pages(self, dest):
+        """Returns a (source, destination) pair for every page, creating the destination directories"""
+        pages = [
+            (page.source, page.output)
+            for page in PageIndex.scan(self.content, dest, headers=False)
+        ]
+        make_output_directories(pages)
+        return pages
+
+    def outputs(self, dest):
+        outputs = {}
+        for directory, _, files in os.walk(dest):
+            for name in files:
+                path = os.path.join(directory, name)
+                with open(path) as f:
+                    outputs[os.path.relpath(path, dest)] = f.read()
+        return outputs
+
+    def test_matches_render_pages(self):
+        expected_dest = os.path.join(self.root, "expected")
+        render_pages(self.pages(expected_dest), self.template)
+        dest = os.path.join(self.root, "pipelined")
+        # A small depth makes every stage fill up and wait on the next one
+        render_pages_pipelined(self.pages(dest), self.template, io_threads=2, depth=3)
+        self.assertEqual(self.outputs(dest), self.outputs(expected_dest))
+        self.assertEqual(len(self.outputs(dest)), 10)
+        self.assertEqual(
+            self.outputs(dest)[os.path.join("post1", "index.html")],
+            '<title>Front matter</title><link href="/base/index.css" />'
+            '<div><h1>Post 1</h1><p><i>Some</i> text with a <a href="/base/post1">link</a></p></div>',
+        )
+
+    def test_huge_sources_are_streamed(self):
+        expected_dest = os.path.join(self.root, "expected")
+        render_pages(self.pages(expected_dest), self.template)
+        # With no threshold every source counts as huge
+        with mock.patch("pipeline.STREAMING_THRESHOLD", 0):
+            for jobs, name in [(1, "serial"), (2, "pipelined")]:
+                dest = os.path.join(self.root, name)
+                pages = self.pages(dest)
+                with mock.patch(
+                    "pipeline.blocks_to_html_node", wraps=blocks_to_html_node
+                ) as stream:
+                    if name == "serial":
+                        links = render_pages(pages, self.template)
+                    else:
+                        links = render_pages_pipelined(pages, self.template)
+                self.assertEqual(stream.call_count, 10)
+                self.assertEqual(self.outputs(dest), self.outputs(expected_dest))
+                self.assertEqual(links[pages[0][0]], ["/post0"])
+
+    def test_failures_are_reported(self):
+        with open(os.path.join(self.content, "post3", "index.md"), "w") as f:
+            f.write("No title here")
+        os.remove(os.path.join(self.content, "post5", "index.md"))
+        dest = os.path.join(self.root, "docs")
+        pages = self.pages(dest)
+        pages.append((os.path.join(self.content, "post5", "index.md"), "x"))
+        with self.assertRaises(RuntimeError, msg="2 of 10 pages failed to generate"):
+            render_pages_pipelined(pages, self.template, io_threads=2, depth=2)
+        self.assertTrue(os.path.exists(os.path.join(dest, "post9", "index.html")))
+
+
+if __name__ == "__main__":
+    unittest.main()
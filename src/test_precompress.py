@@ -0,0 +1,82 @@
+import gzip
+import os
+import tempfile
+import unittest
+from manifest import BuildManifest
+from precompress import minify_css, minify_html, precompress_outputs
+
+
+class TestMinify(unittest.TestCase):
+    def test_minify_html(self):
+        html = "<div>\n  <p>Hello   <b>there</b></p>\n  <!-- note -->\n</div>\n"
+        self.assertEqual(minify_html(html), "<div> <p>Hello <b>there</b></p> </div>")
+
+    def test_minify_html_keeps_preformatted_text(self):
+        html = "<p>a\n\nb</p>\n<pre><code>def f():\n    return 1\n</code></pre>\n"
+        self.assertEqual(
+            minify_html(html),
+            "<p>a b</p> <pre><code>def f():\n    return 1\n</code></pre>",
+        )
+
+    def test_minify_css(self):
+        css = "/* theme */\nbody {\n  color: #fff;\n  margin: 0 auto;\n}\n\na > b, i { content: \"a  ;  b\"; }\n"
+        self.assertEqual(
+            minify_css(css), 'body{color:#fff;margin:0 auto}a>b,i{content:"a  ;  b"}'
+        )
+
+
+class TestPrecompressOutputs(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.page = os.path.join(self.root, "index.html")
+        self.small = os.path.join(self.root, "small.css")
+        self.image = os.path.join(self.root, "tom.png")
+        with open(self.page, "w") as f:
+            f.write("<p>\n  Hello\n</p>\n" * 100)
+        with open(self.small, "w") as f:
+            f.write("a {\n  color: red;\n}\n")
+        open(self.image, "w").close()
+        self.paths = [self.page, self.small, self.image]
+        self.manifest_path = os.path.join(self.root, "manifest.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_compresses_text_outputs(self):
+        self.assertEqual(precompress_outputs(self.paths), (2, 0))
+        with gzip.open(f"{self.page}.gz", "rb") as f, open(self.page, "rb") as g:
+            self.assertEqual(f.read(), g.read())
+        # Too small to be worth compressing, and an image
+        self.assertFalse(os.path.exists(f"{self.small}.gz"))
+        self.assertFalse(os.path.exists(f"{self.image}.gz"))
+
+    def test_minify(self):
+        precompress_outputs(self.paths, minify=True, compress=False)
+        with open(self.small) as f:
+            self.assertEqual(f.read(), "a{color:red}")
+        self.assertFalse(os.path.exists(f"{self.page}.gz"))
+
+    def test_leaves_linked_files_alone(self):
+        source = os.path.join(self.root, "source.css")
+        os.link(self.small, source)
+        precompress_outputs([self.small], minify=True)
+        with open(source) as f:
+            self.assertEqual(f.read(), "a {\n  color: red;\n}\n")
+
+    def test_skips_unchanged_outputs(self):
+        manifest = BuildManifest.load(self.manifest_path)
+        self.assertEqual(precompress_outputs(self.paths, manifest, minify=True), (2, 0))
+        manifest.save()
+        manifest = BuildManifest.load(self.manifest_path)
+        self.assertEqual(precompress_outputs(self.paths, manifest, minify=True), (0, 2))
+        self.assertEqual(manifest.orphans(), [])
+        # Different settings mean different outputs
+        manifest = manifest.successor()
+        processed = precompress_outputs(self.paths, manifest, compress=False)
+        self.assertEqual(processed, (2, 0))
+        self.assertEqual(manifest.orphans(), [f"{self.page}.gz"])
+
+
+if __name__ == "__main__":
+    unittest.main()
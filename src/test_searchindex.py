@@ -0,0 +1,115 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+import searchindex
+from manifest import BuildManifest
+from leafnode import LeafNode
+from md_to_html import markdown_to_html_node
+from parentnode import ParentNode
+from pageindex import PageIndex
+from searchindex import SearchIndex, document_terms, node_text, read_terms, tokenize
+from urlresolver import UrlResolver
+
+
+class TestTerms(unittest.TestCase):
+    def test_tokenize(self):
+        self.assertEqual(
+            tokenize("Old Tom's a merry fellow, 1954!"),
+            ["old", "tom", "merry", "fellow", "1954"],
+        )
+
+    def test_document_terms(self):
+        node = markdown_to_html_node(
+            "# Tom\n\nTom is **merry** ![tom image](/tom.png)\n\n```\nmerry code\n```"
+        )
+        self.assertEqual(
+            document_terms("Tom Bombadil", node),
+            {"tom": 7, "is": 1, "merry": 2, "code": 1, "bombadil": 5},
+        )
+
+    def test_none_child_is_skipped(self):
+        children = [None, LeafNode("b", "merry"), None, LeafNode(None, "Tom")]
+        node = ParentNode("p", children)
+        self.assertEqual(list(node_text(node)), ["merry", "Tom"])
+
+
+class TestSearchIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.content = os.path.join(self.tmp.name, "content")
+        self.docs = os.path.join(self.tmp.name, "docs")
+        self.write("index.md", "# Home\n\nThe Shire")
+        self.write("blog/tom.md", "---\ntitle: Tom\n---\nTom walks in the Old Forest")
+        self.write("blog/draft.md", "---\ndraft: true\n---\n# Secret")
+        self.path = os.path.join(self.tmp.name, "search.json")
+        self.manifest = BuildManifest(os.path.join(self.tmp.name, "manifest.json"))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, text):
+        path = os.path.join(self.content, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(text)
+
+    def build(self):
+        """Updates and writes the search index as the next build would; returns (tokenized, written, skipped)"""
+        self.manifest = self.manifest.successor()
+        search_index = SearchIndex.load(self.path)
+        tokenized = search_index.update(
+            PageIndex.scan(self.content, self.docs), self.manifest
+        )
+        written, skipped = search_index.write(
+            os.path.join(self.docs, "search"), UrlResolver("/base/"), self.manifest
+        )
+        search_index.save()
+        return tokenized, written, skipped
+
+    def read(self, name):
+        with open(os.path.join(self.docs, "search", name)) as f:
+            return json.load(f)
+
+    def test_files(self):
+        self.build()
+        self.assertEqual(
+            self.read("documents.json")["documents"],
+            [["/base/blog/tom/", "Tom"], ["/base/", "Home"]],
+        )
+        # Document ids are stored as gaps: "the" is in documents 0 and 1
+        self.assertEqual(self.read("th.json"), {"the": [0, 1, 1, 1]})
+        self.assertEqual(self.read("ho.json"), {"home": [1, 6]})
+        self.assertEqual(self.read("to.json"), {"tom": [0, 6]})
+        self.assertFalse(os.path.exists(os.path.join(self.docs, "search", "se.json")))
+
+    def test_only_changed_pages_are_tokenized(self):
+        self.assertEqual(self.build()[0], 2)
+        with mock.patch("searchindex.read_terms", wraps=read_terms) as read:
+            self.assertEqual(self.build(), (0, 0, 9))
+            self.write("blog/tom.md", "---\ntitle: Tom\n---\nTom sings")
+            # Only the shards of terms that came or went, or moved between pages, change
+            self.assertEqual(self.build(), (1, 2, 4))
+        self.assertEqual(read.call_count, 1)
+        self.assertEqual(
+            self.manifest.orphans(),
+            [
+                os.path.join(self.docs, "search", name)
+                for name in ["fo.json", "in.json", "ol.json", "wa.json"]
+            ],
+        )
+
+    def test_terms_of_huge_pages_are_streamed(self):
+        source = os.path.join(self.content, "blog", "tom.md")
+        expected = read_terms(source, "Tom")
+        with mock.patch("pipeline.STREAMING_THRESHOLD", 0):
+            with mock.patch(
+                "searchindex.blocks_to_html_node", wraps=searchindex.blocks_to_html_node
+            ) as stream:
+                self.assertEqual(read_terms(source, "Tom"), expected)
+        stream.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
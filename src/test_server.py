@@ -0,0 +1,125 @@
+import contextlib
+import io
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from main import BuildState
+from server import (
+    ReloadNotifier,
+    Watcher,
+    inject_reload_script,
+    watch,
+    watched_paths,
+    RELOAD_SCRIPT,
+    WATCHED_PATHS,
+)
+from template import Template
+
+
+class TestWatcher(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.page = os.path.join(self.root, "content", "index.md")
+        os.makedirs(os.path.dirname(self.page))
+        with open(self.page, "w") as f:
+            f.write("# Home")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_nothing_changed(self):
+        watcher = Watcher([os.path.join(self.root, "content")])
+        self.assertEqual(watcher.poll(), set())
+
+    def test_added_changed_and_deleted(self):
+        watcher = Watcher([os.path.join(self.root, "content")])
+        added = os.path.join(self.root, "content", "blog", "index.md")
+        os.makedirs(os.path.dirname(added))
+        with open(added, "w") as f:
+            f.write("# Blog")
+        with open(self.page, "w") as f:
+            f.write("# Home, edited")
+        self.assertEqual(watcher.poll(), {added, self.page})
+        os.remove(added)
+        self.assertEqual(watcher.poll(), {added})
+
+    def test_single_file(self):
+        watcher = Watcher([self.page])
+        os.remove(self.page)
+        self.assertEqual(watcher.poll(), {self.page})
+
+    def test_watch_other_paths(self):
+        header = os.path.join(self.root, "partials", "header.html")
+        os.makedirs(os.path.dirname(header))
+        with open(header, "w") as f:
+            f.write("<header></header>")
+        watcher = Watcher([self.page])
+        with open(self.page, "w") as f:
+            f.write("# Home, edited")
+        watcher.watch([self.page, header])
+        # The page changed while it was watched; the header is new to the watcher
+        self.assertEqual(watcher.poll(), {self.page})
+        with open(header, "w") as f:
+            f.write("<header>Home</header>")
+        self.assertEqual(watcher.poll(), {header})
+
+    def test_watched_paths_include_partials(self):
+        template = os.path.join(self.root, "template.html")
+        header = os.path.join(self.root, "partials", "header.html")
+        os.makedirs(os.path.dirname(header))
+        with open(template, "w") as f:
+            f.write("{{> partials/header.html }}{{ Content }}")
+        with open(header, "w") as f:
+            f.write("<header></header>")
+        templates = {template: Template.load(template)}
+        state = BuildState(None, None, None, templates=templates)
+        self.assertEqual(watched_paths(state), WATCHED_PATHS + [header])
+
+
+class TestWatch(unittest.TestCase):
+    def test_failed_rebuild_waits_for_another_change(self):
+        polls = [{"content/a.md"}, set(), set(), {"content/b.md"}, set()]
+        watcher = mock.Mock(poll=mock.Mock(side_effect=polls))
+        rebuild = mock.Mock(side_effect=[ValueError("no title"), mock.Mock()])
+        with mock.patch.multiple(
+            "server",
+            Watcher=mock.Mock(return_value=watcher),
+            watched_paths=mock.Mock(return_value=[]),
+            rebuild=rebuild,
+            build=mock.DEFAULT,
+        ), contextlib.redirect_stdout(io.StringIO()):
+            with self.assertRaises(StopIteration):
+                watch(mock.Mock(), None, mock.Mock(), interval=0)
+        self.assertEqual(rebuild.call_count, 2)
+        # The file that broke the build is rebuilt along with the fix
+        self.assertEqual(rebuild.call_args.args[2], {"content/a.md", "content/b.md"})
+
+
+class TestLiveReload(unittest.TestCase):
+    def test_inject_before_body(self):
+        self.assertEqual(
+            inject_reload_script("<body><p>Hi</p></body>"),
+            f"<body><p>Hi</p>{RELOAD_SCRIPT}</body>",
+        )
+
+    def test_inject_without_body(self):
+        self.assertEqual(inject_reload_script("<p>Hi</p>"), f"<p>Hi</p>{RELOAD_SCRIPT}")
+
+    def test_notifier_wakes_waiters(self):
+        notifier = ReloadNotifier()
+        results = []
+        waiter = threading.Thread(target=lambda: results.append(notifier.wait(0, 5)))
+        waiter.start()
+        notifier.notify()
+        waiter.join()
+        self.assertEqual(results, [1])
+
+    def test_notifier_timeout(self):
+        self.assertEqual(ReloadNotifier().wait(0, timeout=0.01), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
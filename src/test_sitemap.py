@@ -0,0 +1,117 @@
+import os
+import tempfile
+import unittest
+from manifest import BuildManifest
+from pageindex import PageIndex
+from sitemap import SiteFiles, feed_pages
+from urlresolver import UrlResolver
+
+PAGES = {
+    "index.md": "title: Home",
+    "blog/tom.md": "title: Tom & Goldberry\ndate: 2024-03-01\ndescription: <Old> Tom",
+    "blog/glorfindel.md": "title: Glorfindel\ndate: 2023-07-11",
+    "blog/majesty.md": "title: Majesty\ndate: 2024-03-01T12:00:00+02:00",
+    "blog/draft.md": "title: Draft\ndate: 2025-01-01\ndraft: true",
+    "contact.md": "title: Contact",
+}
+
+
+class TestSiteFiles(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.content = os.path.join(self.tmp.name, "content")
+        self.docs = os.path.join(self.tmp.name, "docs")
+        os.makedirs(self.docs)
+        for name, front_matter in PAGES.items():
+            path = os.path.join(self.content, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as f:
+                f.write(f"---\n{front_matter}\n---\ntext")
+        self.manifest = BuildManifest(os.path.join(self.tmp.name, "manifest.json"))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def build(self, limit=2):
+        """Writes the site files as the next build would and returns (written, skipped)"""
+        self.manifest = self.manifest.successor()
+        site_files = SiteFiles(
+            self.docs, "https://example.com/", UrlResolver("/base/"), self.manifest
+        )
+        return site_files.write_all(
+            PageIndex.scan(self.content, self.docs), limit=limit
+        )
+
+    def read(self, name):
+        with open(os.path.join(self.docs, name)) as f:
+            return f.read()
+
+    def test_sitemaps_are_split(self):
+        self.build()
+        self.assertEqual(
+            self.read("sitemap.xml").splitlines()[2:5],
+            [
+                f"<sitemap><loc>https://example.com/base/sitemap-{number}.xml</loc></sitemap>"
+                for number in [1, 2, 3]
+            ],
+        )
+        self.assertEqual(
+            self.read("sitemap-1.xml").splitlines()[2:4],
+            [
+                "<url><loc>https://example.com/base/blog/glorfindel/</loc><lastmod>2023-07-11</lastmod></url>",
+                "<url><loc>https://example.com/base/blog/majesty/</loc><lastmod>2024-03-01</lastmod></url>",
+            ],
+        )
+        self.assertIn(
+            "<loc>https://example.com/base/</loc>", self.read("sitemap-3.xml")
+        )
+        self.assertNotIn("draft", self.read("sitemap-2.xml"))
+        self.assertEqual(
+            self.read("robots.txt"),
+            "User-agent: *\nAllow: /\nSitemap: https://example.com/base/sitemap.xml\n",
+        )
+
+    def test_feeds(self):
+        pages = feed_pages(PageIndex.scan(self.content, self.docs))
+        self.assertEqual(
+            [page.title for page in pages],
+            ["Majesty", "Tom & Goldberry", "Glorfindel"],
+        )
+        self.build()
+        atom = self.read("feed.xml")
+        self.assertIn("<title>Home</title>", atom)
+        self.assertIn("<updated>2024-03-01T12:00:00+02:00</updated>", atom)
+        self.assertIn(
+            "<entry><title>Tom &amp; Goldberry</title>"
+            '<link href="https://example.com/base/blog/tom/" />',
+            atom,
+        )
+        self.assertIn("<summary>&lt;Old&gt; Tom</summary>", atom)
+        self.assertIn(
+            "<pubDate>Fri, 01 Mar 2024 12:00:00 +0200</pubDate>", self.read("rss.xml")
+        )
+
+    def test_unchanged_files_are_left_alone(self):
+        self.assertEqual(self.build(), (7, 0))
+        stat = os.stat(os.path.join(self.docs, "sitemap-1.xml"))
+        self.assertEqual(self.build(), (0, 7))
+        self.assertEqual(
+            os.stat(os.path.join(self.docs, "sitemap-1.xml")).st_ino, stat.st_ino
+        )
+        os.remove(os.path.join(self.content, "contact.md"))
+        # The home page moves up into sitemap-2, and sitemap-3 is gone from the index
+        self.assertEqual(self.build(), (2, 4))
+        self.assertEqual(
+            self.manifest.orphans(), [os.path.join(self.docs, "sitemap-3.xml")]
+        )
+        self.assertEqual(self.build(limit=10), (2, 3))
+        self.assertEqual(
+            self.manifest.orphans(), [os.path.join(self.docs, "sitemap-2.xml")]
+        )
+        self.assertEqual(
+            [name for name in os.listdir(self.docs) if name.endswith(".tmp")], []
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,136 @@
+import io
+import os
+import tempfile
+import unittest
+from leafnode import LeafNode
+from linkgraph import LinkRecorder
+from md_to_html import markdown_to_html_node
+from parentnode import ParentNode
+from template import Template
+from urlresolver import UrlResolver
+
+
+class TestTemplate(unittest.TestCase):
+    def test_render_slots(self):
+        template = Template(
+            "<title>{{ Title }}</title><article>{{ Content }}</article>"
+        )
+        self.assertEqual(
+            template.render(Title="Hello", Content="<p>World</p>"),
+            "<title>Hello</title><article><p>World</p></article>",
+        )
+
+    def test_render_is_repeatable(self):
+        template = Template("<h1>{{ Title }}</h1>")
+        self.assertEqual(template.render(Title="One"), "<h1>One</h1>")
+        self.assertEqual(template.render(Title="Two"), "<h1>Two</h1>")
+
+    def test_missing_slot_is_left_alone(self):
+        template = Template("<h1>{{ Title }}</h1>{{ Footer }}")
+        self.assertEqual(template.render(Title="Hi"), "<h1>Hi</h1>{{ Footer }}")
+
+    def test_values_are_not_rescanned(self):
+        template = Template("<h1>{{ Title }}</h1>{{ Content }}")
+        self.assertEqual(
+            template.render(Title="{{ Content }}", Content="body"),
+            "<h1>{{ Content }}</h1>body",
+        )
+
+    def test_template_urls_resolved_once(self):
+        template = Template(
+            '<link href="/index.css" /><a href="https://boot.dev">{{ Content }}</a>',
+            UrlResolver("/blog/"),
+        )
+        self.assertEqual(
+            template.render(Content='<a href="/not/rewritten">'),
+            '<link href="/blog/index.css" /><a href="https://boot.dev"><a href="/not/rewritten"></a>',
+        )
+
+    def test_write_streams_nodes(self):
+        template = Template(
+            '<link href="/index.css" />{{ Content }}', UrlResolver("/blog/")
+        )
+        node = ParentNode("p", [LeafNode("a", "Tom", {"href": "/tom"})])
+        fp = io.StringIO()
+        template.write(fp, Content=node)
+        self.assertEqual(
+            fp.getvalue(),
+            '<link href="/blog/index.css" /><p><a href="/blog/tom">Tom</a></p>',
+        )
+
+    def test_load_expands_includes(self):
+        with tempfile.TemporaryDirectory() as root:
+            files = {
+                "template.html": "{{> partials/head.html }}{{ Content }}",
+                "partials/head.html": '<link href="/index.css" />{{> nav.html }}',
+                "partials/nav.html": '<a href="/">{{ Title }}</a>',
+            }
+            for name, text in files.items():
+                path = os.path.join(root, name)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, "w") as f:
+                    f.write(text)
+            template = Template.load(
+                os.path.join(root, "template.html"), UrlResolver("/blog/")
+            )
+            self.assertEqual(
+                template.render(Title="Home", Content="<p>Hi</p>"),
+                '<link href="/blog/index.css" /><a href="/blog/">Home</a><p>Hi</p>',
+            )
+            self.assertEqual(
+                template.includes,
+                [
+                    os.path.join(root, "partials", "head.html"),
+                    os.path.join(root, "partials", "nav.html"),
+                ],
+            )
+            self.assertEqual(template.links, ["/index.css", "/"])
+
+    def test_include_cycle(self):
+        with tempfile.TemporaryDirectory() as root:
+            path = os.path.join(root, "template.html")
+            with open(path, "w") as f:
+                f.write("{{> template.html }}")
+            with self.assertRaises(ValueError):
+                Template.load(path)
+
+
+class TestUrlResolver(unittest.TestCase):
+    def test_root_relative(self):
+        self.assertEqual(
+            UrlResolver("/base/")("/images/tom.png"), "/base/images/tom.png"
+        )
+
+    def test_default_basepath(self):
+        self.assertEqual(UrlResolver()("/contact"), "/contact")
+
+    def test_fingerprinted_asset(self):
+        resolve_url = UrlResolver("/base/", {"/index.css": "/index.3f2a9c1b.css"})
+        self.assertEqual(resolve_url("/index.css"), "/base/index.3f2a9c1b.css")
+        self.assertEqual(resolve_url("/index.css?v=1"), "/base/index.3f2a9c1b.css?v=1")
+        self.assertEqual(resolve_url("/contact#top"), "/base/contact#top")
+
+    def test_image_attributes(self):
+        images = {"/tom.png": {"width": 900, "height": 600, "variants": [[480, 320]]}}
+        resolve_url = UrlResolver("/base/", images=images)
+        self.assertEqual(
+            resolve_url.image_attributes("/tom.png"),
+            ' width="900" height="600"'
+            ' srcset="/base/tom-480w.png 480w, /base/tom.png 900w"',
+        )
+        self.assertEqual(resolve_url.image_attributes("/rivendell.png"), "")
+        node = markdown_to_html_node("![tom](/tom.png)")
+        self.assertEqual(
+            node.to_html(LinkRecorder(resolve_url)),
+            '<div><p><img src="/base/tom.png" alt="tom" width="900" height="600"'
+            ' srcset="/base/tom-480w.png 480w, /base/tom.png 900w" /></p></div>',
+        )
+
+    def test_absolute_url_untouched(self):
+        self.assertEqual(
+            UrlResolver("/base/")("https://boot.dev"), "https://boot.dev"
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
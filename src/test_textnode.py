@@ -24,6 +24,10 @@ class TestTextNode(unittest.TestCase):
         node2 = TextNode("This is a text node", TextType.BOLD, None)
         self.assertEqual(node, node2)
 
+    def test_no_dict(self):
+        node = TextNode("This is a text node", TextType.BOLD)
+        self.assertFalse(hasattr(node, "__dict__"))
+
     def test_uneq_url_none(self):
         none_url = TextNode("This is a text node", TextType.BOLD)
         has_url = TextNode("This is a text node", TextType.BOLD, "https://boot.dev")
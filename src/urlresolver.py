@@ -0,0 +1,33 @@
+from imagevariants import variant_name
+
+
+class UrlResolver:
+    def __init__(self, basepath="/", assets=None, images=None):
+        self.basepath = basepath  # Prefix the site is served under, always ending in "/"
+        self.assets = assets or {}  # Fingerprinted url of every asset, keyed by its plain url (see AssetMap)
+        self.images = images or {}  # Size and derivatives of every resized image, keyed by its plain url (see ImageCache.resize())
+
+    def __call__(self, url):
+        """Rewrites a root-relative url ("/images/tom.png") to live under the basepath, pointing it at the asset's fingerprinted name if it has one. Any other url is returned untouched."""
+        if url is not None and url.startswith("/"):
+            if self.assets:
+                # Only the path is fingerprinted; a query or fragment is kept as it was
+                path = url.split("?", 1)[0].split("#", 1)[0]
+                url = self.assets.get(path, path) + url[len(path) :]
+            return f"{self.basepath}{url[1:]}"
+        return url
+
+    def image_attributes(self, url):
+        """Returns the width, height and srcset attributes of the image at url, before it is resolved, as HTML. Returns "" for images without derivatives."""
+        image = self.images.get(url)
+        if image is None:
+            return ""
+        candidates = [
+            f"{self(variant_name(url, width))} {width}w"
+            for width, _ in image["variants"]
+        ]
+        candidates.append(f"{self(url)} {image['width']}w")
+        return (
+            f' width="{image["width"]}" height="{image["height"]}"'
+            f' srcset="{", ".join(candidates)}"'
+        )